@@ -17,19 +17,59 @@ def create_app(test_config=None):
     if test_config is not None:
         app.config.update(test_config)
     
+    # 集中配置日誌（異步寫出的結構化日誌，每個請求帶有請求ID）
+    from app.utils.logging_setup import init_logging
+    init_logging(app)
+    
+    # 請求計數、延遲直方圖和 /metrics 端點
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
+    # 分佈式追蹤（每個請求一個根 span，導出到文件或 OTLP 收集器）
+    from app.utils.tracing import init_tracing
+    init_tracing(app)
+
+    # 按需或按比例分析請求，輸出調用棧採樣（火焰圖）和 cProfile 文件
+    from app.utils.profiling import init_profiling
+    init_profiling(app)
+
+    # 統計每個請求執行的 MongoDB 命令數
+    from app.utils.mongo_monitor import init_mongo_monitoring
+    init_mongo_monitoring(app)
+    
     # 確保實例文件夾存在
     try:
         os.makedirs(app.instance_path)
     except OSError:
         pass
     
-    # 啟用CORS
-    CORS(app)
+    # 使用 orjson 序列化響應（原生處理 datetime、ObjectId 和 UUID）
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+    
+    # 啟用CORS（分頁和條件請求使用的響應頭需顯式暴露，瀏覽器中的前端才能讀取）
+    CORS(app, expose_headers=['X-Total-Count', 'X-Next-Cursor', 'ETag'])
+    
+    # 公開計劃響應緩存（檢查共享存儲是否可用）
+    from app.utils.response_cache import init_response_cache
+    init_response_cache(app)
+    
+    # 路由限流（檢查共享存儲是否可用）
+    from app.utils.rate_limit import init_rate_limit
+    init_rate_limit(app)
+    
+    # 按 Accept-Encoding 壓縮響應
+    from app.utils.compression import init_compression
+    init_compression(app)
     
     # 註冊API藍圖
     from app.api import api_bp
     app.register_blueprint(api_bp)
     
+    # 註冊CLI命令
+    from app.commands import register_commands
+    register_commands(app)
+    
     # 簡單的首頁路由
     @app.route('/')
     def index():
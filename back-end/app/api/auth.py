@@ -4,11 +4,27 @@ from datetime import datetime, timedelta
 from flask import request, jsonify, current_app
 import jwt
 from app.models.user import User
+from app.utils.auth_service import token_required
+from app.utils.password_hasher import PasswordHasherBusyError
+from app.utils.rate_limit import rate_limit
+from app.config.config import get_config
 from app.api import api_bp
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
+# 獲取配置
+config = get_config()
+
+def hasher_busy_response():
+    """密碼哈希隊列已滿時的回應"""
+    response = jsonify({
+        'success': False,
+        'message': '服務繁忙，請稍後再試'
+    })
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @api_bp.route('/auth/register', methods=['POST'])
 def register():
     """用戶註冊API"""
@@ -39,7 +55,10 @@ def register():
         }), 400
     
     # 創建用戶
-    user_id, error = User.create_user(email, password)
+    try:
+        user_id, error = User.create_user(email, password)
+    except PasswordHasherBusyError:
+        return hasher_busy_response()
     
     if error:
         return jsonify({
@@ -58,6 +77,7 @@ def register():
     }), 201
 
 @api_bp.route('/auth/login', methods=['POST'])
+@rate_limit('login', config.RATE_LIMIT_LOGIN)
 def login():
     """用戶登錄API"""
     data = request.get_json()
@@ -73,7 +93,10 @@ def login():
     password = data.get('password')
     
     # 驗證用戶
-    user = User.authenticate(email, password)
+    try:
+        user = User.authenticate(email, password)
+    except PasswordHasherBusyError:
+        return hasher_busy_response()
     
     if not user:
         return jsonify({
@@ -92,39 +115,11 @@ def login():
     }), 200
 
 @api_bp.route('/auth/profile', methods=['GET'])
+@token_required
 def get_profile():
     """獲取用戶資料API"""
-    # 從請求頭獲取令牌
-    auth_header = request.headers.get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return jsonify({
-            'success': False,
-            'message': '未提供有效的認證令牌'
-        }), 401
-    
-    token = auth_header.split(' ')[1]
-    
-    # 驗證令牌
-    try:
-        payload = jwt.decode(
-            token, 
-            current_app.config.get('SECRET_KEY', 'dev_key'),
-            algorithms=['HS256']
-        )
-        user_id = payload['sub']
-    except jwt.ExpiredSignatureError:
-        return jsonify({
-            'success': False,
-            'message': '認證令牌已過期'
-        }), 401
-    except jwt.InvalidTokenError:
-        return jsonify({
-            'success': False,
-            'message': '無效的認證令牌'
-        }), 401
-    
-    # 獲取用戶資料
-    user = User.find_by_id(user_id)
+    # 獲取用戶資料（短時間緩存，資料或密碼更新時失效）
+    user = User.find_profile_by_id(request.user_id)
     if not user:
         return jsonify({
             'success': False,
@@ -136,7 +131,7 @@ def get_profile():
         'user_id': str(user['_id']),
         'email': user['email'],
         'profile': user['profile'],
-        'created_at': user['created_at'].isoformat(),
+        'created_at': user['created_at'],
         'is_active': user['is_active']
     }
     
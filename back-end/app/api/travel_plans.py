@@ -2,56 +2,68 @@ import logging
 import json
 from datetime import datetime
 from bson.objectid import ObjectId
-from flask import request, jsonify, current_app
-import jwt
+from flask import request, jsonify
 from app.models.travel_plan import TravelPlan
+from app.models.db import READ_PROFILE_PRIMARY, READ_PROFILE_PUBLIC
 from app.api import api_bp
 from app.utils.gpt_service import generate_travel_plan as gpt_generate_travel_plan
 from app.utils.google_places_service import enrich_travel_plan, is_api_key_valid
+from app.utils.pagination import get_pagination_args, split_page, InvalidCursorError
+from app.utils.http_cache import (
+    CACHE_CONTROL_PUBLIC, compute_etag, compute_list_etag, is_not_modified,
+    set_cache_headers, not_modified_response
+)
+from app.utils.json_provider import stream_json
+from app.utils.auth_service import token_required, token_optional
+from app.utils.rate_limit import rate_limit, TOKEN_BUCKET
+from app.utils.metrics import stage_timer, check_metrics_access, GENERATIONS_IN_FLIGHT
+from app.config.config import get_config
+from app.utils.fieldsets import (
+    get_fieldset_args, parse_fields, build_projection, prune_fields, projection_includes, FieldsetError
+)
+from app.utils.response_cache import (
+    cached_response, response_cache, plan_namespace, PUBLIC_LIST_NAMESPACE
+)
 import re
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
-# 身份驗證裝飾器
-def token_required(f):
-    def decorated(*args, **kwargs):
-        # 從請求頭獲取令牌
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({
-                'success': False,
-                'message': '未提供有效的認證令牌'
-            }), 401
-        
-        token = auth_header.split(' ')[1]
-        
-        # 驗證令牌
-        try:
-            payload = jwt.decode(
-                token, 
-                current_app.config.get('SECRET_KEY', 'dev_key'),
-                algorithms=['HS256']
-            )
-            user_id = payload['sub']
-        except jwt.ExpiredSignatureError:
-            return jsonify({
-                'success': False,
-                'message': '認證令牌已過期'
-            }), 401
-        except jwt.InvalidTokenError:
-            return jsonify({
-                'success': False,
-                'message': '無效的認證令牌'
-            }), 401
-        
-        # 將用戶ID添加到請求中
-        request.user_id = user_id
-        return f(*args, **kwargs)
-    
-    # 保留原始函數名稱
-    decorated.__name__ = f.__name__
-    return decorated
+# 獲取配置
+config = get_config()
+
+# 批量讀取的計劃數量上限
+MAX_BATCH_PLAN_IDS = 100
+
+def activity_layout(plan):
+    """每天的活動數量和ID，用於調試日誌"""
+    return {
+        "days": [{"day": i+1, "activity_count": len(day.get("activities", [])), "activity_ids": [a.get("id") for a in day.get("activities", [])]} for i, day in enumerate(plan.get("days", []))]
+    }
+
+def get_plan_summary(plan):
+    """獲取計劃摘要，尚未回填摘要的舊計劃則按 days 即時計算（列表投影不含 days，需先調用 fill_missing_summaries）"""
+    summary = plan.get('summary')
+    if summary:
+        return summary
+    return TravelPlan.build_summary(plan.get('days'))
+
+def invalid_pagination_response(error):
+    """分頁參數無效時的回應"""
+    return jsonify({
+        'success': False,
+        'message': str(error) if isinstance(error, InvalidCursorError) else '無效的分頁參數'
+    }), 400
+
+def invalid_fieldset_response(error):
+    """欄位選擇參數無效時的回應"""
+    return jsonify({
+        'success': False,
+        'message': str(error)
+    }), 400
+
+# 列表分頁（游標和 ETag）需要讀取的欄位
+LIST_REQUIRED_FIELDS = ('created_at', 'updated_at')
 
 @api_bp.route('/travel-plans', methods=['GET'])
 @token_required
@@ -59,55 +71,85 @@ def get_travel_plans():
     """獲取用戶的旅行計劃列表"""
     user_id = request.user_id
     
-    # 獲取分頁參數
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 10))
-    skip = (page - 1) * limit
+    # 獲取分頁參數（支持 page/limit 以及 cursor 游標分頁）
+    try:
+        pagination = get_pagination_args(request.args)
+    except ValueError as e:
+        return invalid_pagination_response(e)
+    limit = pagination['limit']
+    
+    # 欄位選擇（fields / exclude）會編譯為數據庫投影
+    try:
+        fieldset = get_fieldset_args(request.args)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
+    selected = fieldset['fields'] or fieldset['exclude']
     
     # 檢查是否需要包含活動數據
     include_activities = request.args.get('include_activities', 'false').lower() == 'true'
-    logger.info(f"獲取旅行計劃列表 - 用戶: {user_id}, 包含活動: {include_activities}")
-    
-    # 查詢用戶的旅行計劃
-    plans = TravelPlan.find_by_user(user_id, limit=limit, skip=skip)
+    logger.info("獲取旅行計劃列表 - 用戶: %s, 包含活動: %s, 欄位: %s", user_id, include_activities, fieldset)
     
-    # 格式化計劃數據
-    formatted_plans = []
-    for plan in plans:
+    # 查詢用戶的旅行計劃（多取一筆以判斷是否有下一頁；不需要活動時只讀取摘要欄位）
+    # 讀取行程時先只讀取版本信息，完整文檔在響應時才從游標逐個讀取
+    if selected:
+        projection = build_projection(**fieldset, required=LIST_REQUIRED_FIELDS)
+    else:
+        projection = None if include_activities else TravelPlan.LIST_PROJECTION
+    include_days = projection_includes(projection, 'days')
+    page_projection = TravelPlan.VERSION_PROJECTION if include_days else projection
+    plans = TravelPlan.find_by_user(user_id, limit=limit + 1, skip=pagination['skip'],
+                                    cursor=pagination['cursor'], projection=page_projection)
+    plans, next_cursor = split_page(plans, limit)
+    total_plans = TravelPlan.count_user_plans(user_id)
+    
+    # 頁面內容未變化時直接返回 304，跳過格式化
+    # （列表只比較 ETag：刪除或移出頁面的計劃不會反映在最大修改時間上）
+    etag = compute_list_etag(plans, total_plans, next_cursor)
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+    
+    if include_days:
+        plans = TravelPlan.iter_by_ids([plan['_id'] for plan in plans], projection, READ_PROFILE_PRIMARY)
+    elif not selected:
+        plans = TravelPlan.fill_missing_summaries(plans, READ_PROFILE_PRIMARY)
+    
+    def format_plan(plan):
+        """格式化單個計劃"""
+        if selected:
+            return format_plan_document(plan, ('id',), fieldset, LIST_REQUIRED_FIELDS)
+        
         formatted_plan = {
-            'id': str(plan['_id']),  # 使用'id'而不是'plan_id'，保持與前端一致
+            'id': plan['_id'],  # 使用'id'而不是'plan_id'，保持與前端一致
             'title': plan['title'],
             'destination': plan['destination'],
             'start_date': plan['start_date'],
             'end_date': plan['end_date'],
-            'created_at': plan['created_at'].isoformat(),
-            'updated_at': plan['updated_at'].isoformat(),
+            'created_at': plan['created_at'],
+            'updated_at': plan['updated_at'],
             'is_public': plan['is_public'],
             'budget': plan.get('budget', '0'),
             'travelers': plan.get('travelers', 1)
         }
         
+        # 使用寫入時生成的摘要
+        summary = get_plan_summary(plan)
+        formatted_plan['summary'] = summary
+        if summary['cover_image']:
+            formatted_plan['cover_image'] = summary['cover_image']
+        
         # 如果請求需要包含活動數據
         if include_activities and 'days' in plan:
             formatted_plan['days'] = plan['days']
-            logger.info(f"旅行計劃 {formatted_plan['id']} 包含 {len(plan['days'])} 天的行程")
-            
-            # 計算活動數量和照片數量進行日誌記錄
-            total_activities = 0
-            activities_with_photos = 0
-            
-            for day in plan['days']:
-                if 'activities' in day:
-                    total_activities += len(day['activities'])
-                    for activity in day['activities']:
-                        if 'photos' in activity and activity['photos']:
-                            activities_with_photos += 1
-            
-            logger.info(f"旅行計劃 {formatted_plan['id']} 共有 {total_activities} 個活動，其中 {activities_with_photos} 個有照片")
+            logger.info("旅行計劃 %s 共 %s 天，%s 個活動，%s 張照片", formatted_plan['id'], summary['day_count'], summary['activity_count'], summary['photo_count'])
         
-        formatted_plans.append(formatted_plan)
-    
-    return jsonify(formatted_plans), 200
+        return formatted_plan
+    
+    # 回應主體保持為陣列（邊讀取邊輸出），分頁資訊通過響應頭返回
+    response = stream_json(format_plan(plan) for plan in plans)
+    response.headers['X-Total-Count'] = str(total_plans)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return set_cache_headers(response, etag), 200
 
 @api_bp.route('/travel-plans/<plan_id>', methods=['GET'])
 @token_required
@@ -115,29 +157,56 @@ def get_travel_plan(plan_id):
     """獲取特定旅行計劃的詳情"""
     user_id = request.user_id
     
-    # 查詢旅行計劃
-    plan = TravelPlan.find_by_id(plan_id)
+    try:
+        fieldset = get_fieldset_args(request.args)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
     
-    if not plan:
+    # 先只讀取版本信息（擁有者可能剛修改過計劃，從主節點讀取）
+    meta = TravelPlan.find_meta(plan_id, read_profile=READ_PROFILE_PRIMARY)
+    
+    if not meta:
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃'
         }), 404
     
     # 檢查權限（只有計劃擁有者或公開計劃可以查看）
-    if str(plan['user_id']) != user_id and not plan['is_public']:
+    if str(meta['user_id']) != user_id and not meta['is_public']:
         return jsonify({
             'success': False,
             'message': '無權查看此旅行計劃'
         }), 403
     
+    # 客戶端緩存仍然有效時直接返回 304，無需讀取 days
+    etag = compute_etag(request.full_path, plan_id, meta.get('updated_at'), meta.get('version'))
+    if is_not_modified(etag, meta.get('updated_at')):
+        return not_modified_response(etag, meta.get('updated_at'))
+    
+    plan = find_plan_with_fieldset(plan_id, fieldset, DETAIL_REQUIRED_FIELDS, READ_PROFILE_PRIMARY)
+    if not plan:
+        return jsonify({
+            'success': False,
+            'message': '找不到旅行計劃'
+        }), 404
+    
+    etag = compute_etag(request.full_path, plan_id, plan['updated_at'], plan.get('version'))
+    last_modified = plan['updated_at']
+    
+    if fieldset['fields'] or fieldset['exclude']:
+        response = jsonify({
+            'success': True,
+            'plan': format_plan_document(plan, ('plan_id',), fieldset, DETAIL_REQUIRED_FIELDS)
+        })
+        return set_cache_headers(response, etag, last_modified), 200
+    
     # 格式化計劃數據
     formatted_plan = {
-        'plan_id': str(plan['_id']),
-        'user_id': str(plan['user_id']),
+        'plan_id': plan['_id'],
+        'user_id': plan['user_id'],
         'title': plan['title'],
-        'created_at': plan['created_at'].isoformat(),
-        'updated_at': plan['updated_at'].isoformat(),
+        'created_at': plan['created_at'],
+        'updated_at': plan['updated_at'],
         'is_public': plan['is_public'],
         'version': plan['version'],
         'destination': plan['destination'],
@@ -149,11 +218,108 @@ def get_travel_plan(plan_id):
     }
     
     # 記錄日誌，確認欄位存在
-    logger.info(f"旅行計劃詳情 - ID: {plan_id}, 預算: {formatted_plan['budget']}, 人數: {formatted_plan['travelers']}")
+    logger.info("旅行計劃詳情 - ID: %s, 預算: %s, 人數: %s", plan_id, formatted_plan['budget'], formatted_plan['travelers'])
     
-    return jsonify({
+    response = jsonify({
         'success': True,
         'plan': formatted_plan
+    })
+    return set_cache_headers(response, etag, last_modified), 200
+
+# 計劃詳情（權限檢查和 ETag）需要讀取的欄位
+DETAIL_REQUIRED_FIELDS = ('is_public', 'updated_at', 'version')
+
+def find_plan_with_fieldset(plan_id, fieldset, required, read_profile):
+    """按欄位選擇讀取計劃；未選擇欄位時讀取完整文檔"""
+    projection = build_projection(**fieldset, required=required)
+    if projection is None:
+        return TravelPlan.find_by_id(plan_id, read_profile=read_profile)
+    # 部分文檔不能經過 find_by_id 的活動ID修復（會用不完整的行程覆蓋原文檔）
+    plans = TravelPlan.find_by_ids([plan_id], projection=projection, read_profile=read_profile)
+    return plans[0] if plans else None
+
+def format_plan_document(plan, id_keys=('plan_id',), fieldset=None, required=()):
+    """
+    將（可能經過投影的）計劃文檔轉換為響應字典（ObjectId 和 datetime 由 JSON 提供者序列化）
+
+    Args:
+        plan: 計劃文檔
+        id_keys: 輸出計劃ID使用的鍵名
+        fieldset: get_fieldset_args 的結果，用於移除只為服務端處理讀取的欄位
+        required: 額外讀取的欄位
+    """
+    if fieldset:
+        prune_fields(plan, fieldset['fields'], fieldset['exclude'], required)
+    formatted_plan = {key: plan['_id'] for key in id_keys}
+    for key, value in plan.items():
+        if key not in ('_id', 'search_tokens'):
+            formatted_plan[key] = value
+    return formatted_plan
+
+# 批量讀取的權限檢查需要讀取的欄位
+BATCH_REQUIRED_FIELDS = ('user_id', 'is_public')
+
+@api_bp.route('/travel-plans/batch', methods=['POST'])
+@token_optional
+def batch_get_travel_plans():
+    """
+    批量獲取旅行計劃
+    
+    預期的JSON格式:
+    {
+        "ids": ["計劃ID1", "計劃ID2"],
+        "fields": ["title", "destination", "days.activities.name"],  // 可選
+        "exclude": ["days"]  // 可選，不能與 fields 同時使用
+    }
+    
+    匿名請求只能讀取公開計劃；登入用戶還可以讀取自己的計劃。
+    """
+    user_id = request.user_id
+    data = request.get_json(silent=True) or {}
+    
+    plan_ids = data.get('ids')
+    if not isinstance(plan_ids, list) or not plan_ids:
+        return jsonify({
+            'success': False,
+            'message': '缺少必要欄位：ids'
+        }), 400
+    
+    # 去重並保持請求順序
+    plan_ids = list(dict.fromkeys(str(plan_id) for plan_id in plan_ids))
+    if len(plan_ids) > MAX_BATCH_PLAN_IDS:
+        return jsonify({
+            'success': False,
+            'message': f'一次最多只能獲取 {MAX_BATCH_PLAN_IDS} 個計劃'
+        }), 400
+    
+    # 欄位投影（權限檢查所需的欄位總是讀取，返回前再移除）
+    try:
+        fieldset = get_fieldset_args(data)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
+    projection = build_projection(**fieldset, required=BATCH_REQUIRED_FIELDS)
+    
+    read_profile = READ_PROFILE_PRIMARY if user_id else READ_PROFILE_PUBLIC
+    plans = TravelPlan.find_by_ids(plan_ids, projection=projection, read_profile=read_profile)
+    
+    found = {}
+    forbidden = []
+    for plan in plans:
+        plan_key = str(plan['_id'])
+        if str(plan.get('user_id')) != user_id and not plan.get('is_public'):
+            forbidden.append(plan_key)
+            continue
+        
+        found[plan_key] = format_plan_document(plan, ('plan_id',), fieldset, BATCH_REQUIRED_FIELDS)
+    
+    not_found = [plan_id for plan_id in plan_ids if plan_id not in found and plan_id not in forbidden]
+    logger.info("批量獲取旅行計劃 - 請求: %s, 返回: %s, 無權限: %s, 不存在: %s", len(plan_ids), len(found), len(forbidden), len(not_found))
+    
+    return jsonify({
+        'success': True,
+        'plans': found,
+        'forbidden': forbidden,
+        'not_found': not_found
     }), 200
 
 @api_bp.route('/travel-plans', methods=['POST'])
@@ -231,6 +397,64 @@ def update_travel_plan(plan_id):
         'message': '旅行計劃更新成功'
     }), 200
 
+@api_bp.route('/travel-plans/<plan_id>', methods=['PATCH'])
+@token_required
+def patch_travel_plan(plan_id):
+    """
+    以一次原子寫入批量修改旅行計劃
+    
+    預期的JSON格式:
+    {
+        "operations": [
+            {"op": "add_activity", "day_index": 0, "activity": {...}, "position": 1},
+            {"op": "update_activity", "activity_id": "...", "fields": {"time": "10:00"}},
+            {"op": "move_activity", "activity_id": "...", "to_day_index": 1, "position": 0},
+            {"op": "reorder_activities", "day_index": 0, "order": ["活動ID", ...]},
+            {"op": "delete_activity", "activity_id": "..."},
+            {"op": "add_day", "day": {"date": "2024-01-03", "activities": []}},
+            {"op": "delete_day", "day_index": 2},
+            {"op": "reorder_days", "order": [1, 0, 2]},
+            {"op": "update_plan", "fields": {"title": "新標題"}}
+        ]
+    }
+    
+    所有操作在同一份計劃上依序驗證，任一操作無效時不會寫入任何修改。
+    """
+    user_id = request.user_id
+    data = request.get_json(silent=True)
+    
+    if not data or 'operations' not in data:
+        return jsonify({
+            'success': False,
+            'message': '缺少必要欄位：operations'
+        }), 400
+    
+    success, result = TravelPlan.patch_plan(plan_id, user_id, data['operations'])
+    
+    if not success:
+        status_codes = {
+            'invalid_plan_id': 400,
+            'invalid_operation': 400,
+            'permission_denied': 403,
+            'plan_not_found': 404,
+            'conflict': 409
+        }
+        response = {
+            'success': False,
+            'message': result['message'],
+            'error_code': result['error_code']
+        }
+        if result.get('op_index') is not None:
+            response['op_index'] = result['op_index']
+        return jsonify(response), status_codes.get(result['error_code'], 400)
+    
+    return jsonify({
+        'success': True,
+        'message': '旅行計劃更新成功',
+        'results': result['results'],
+        'updated_at': result['updated_at']
+    }), 200
+
 @api_bp.route('/travel-plans/<plan_id>', methods=['DELETE'])
 @token_required
 def delete_travel_plan(plan_id):
@@ -251,72 +475,101 @@ def delete_travel_plan(plan_id):
         'message': '旅行計劃刪除成功'
     }), 200
 
+def public_list_fields(include_photos, include_activities):
+    """將公開列表的 include_photos / include_activities 參數轉換為欄位選擇"""
+    fields = list(TravelPlan.LIST_PROJECTION)
+    if include_photos or include_activities:
+        fields.extend(['days.date', 'days.activities.id', 'days.activities.name'])
+    if include_photos:
+        fields.append('days.activities.photos')
+    if include_activities:
+        fields.extend(['days.activities.location', 'days.activities.time'])
+    return fields
+
 @api_bp.route('/travel-plans/public', methods=['GET'])
+@cached_response(PUBLIC_LIST_NAMESPACE)
 def get_public_plans():
     """獲取公開的旅行計劃列表"""
-    # 獲取分頁參數
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 10))
-    skip = (page - 1) * limit
+    # 獲取分頁參數（支持 page/limit 以及 cursor 游標分頁）
+    try:
+        pagination = get_pagination_args(request.args)
+    except ValueError as e:
+        return invalid_pagination_response(e)
+    page = pagination['page']
+    limit = pagination['limit']
+    
+    # 欄位選擇（fields / exclude）會編譯為數據庫投影
+    try:
+        fieldset = get_fieldset_args(request.args)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
+    selected = fieldset['fields'] or fieldset['exclude']
     
-    # 獲取是否包含照片和活動資料的參數
+    # 獲取是否包含照片和活動資料的參數（未指定 fields 時使用）
     include_photos = request.args.get('include_photos', 'true').lower() == 'true'  # 默認值改為 true
     include_activities = request.args.get('include_activities', 'false').lower() == 'true'
     
-    logger.info(f"獲取公開旅行計劃列表 - 包含照片: {include_photos}, 包含活動: {include_activities}")
+    logger.info("獲取公開旅行計劃列表 - 包含照片: %s, 包含活動: %s, 欄位: %s", include_photos, include_activities, fieldset)
     
-    # 查詢公開的旅行計劃
-    plans = TravelPlan.find_public_plans(limit=limit, skip=skip)
-    
-    # 獲取查詢到的總計劃數
-    total_plans = len(plans)
-    logger.info(f"找到 {total_plans} 個公開旅行計劃")
-    
-    # 格式化計劃數據
-    formatted_plans = []
-    for plan in plans:
+    # 只投影卡片和所需活動欄位，避免讀取完整的行程文檔
+    if selected:
+        projection = build_projection(**fieldset, required=LIST_REQUIRED_FIELDS)
+    else:
+        projection = build_projection(public_list_fields(include_photos, include_activities))
+    
+    # 查詢公開的旅行計劃（多取一筆以判斷是否有下一頁）
+    # 需要行程資料時先只讀取版本信息，完整文檔在響應時才從游標逐個讀取
+    include_days = projection_includes(projection, 'days')
+    page_projection = TravelPlan.VERSION_PROJECTION if include_days else projection
+    plans = TravelPlan.find_public_plans(limit=limit + 1, skip=pagination['skip'],
+                                         cursor=pagination['cursor'], projection=page_projection)
+    plans, next_cursor = split_page(plans, limit)
+    
+    # 從緩存的計數器獲取公開計劃總數
+    total_plans = TravelPlan.count_public_plans()
+    logger.info("本頁找到 %s 個公開旅行計劃，總數: %s", len(plans), total_plans)
+    
+    # 頁面內容未變化時直接返回 304，跳過格式化
+    # （列表只比較 ETag：刪除或移出頁面的計劃不會反映在最大修改時間上）
+    etag = compute_list_etag(plans, total_plans, next_cursor)
+    if is_not_modified(etag):
+        return not_modified_response(etag, cache_control=CACHE_CONTROL_PUBLIC)
+    
+    if include_days:
+        plans = TravelPlan.iter_by_ids([plan['_id'] for plan in plans], projection, READ_PROFILE_PUBLIC)
+    elif not selected:
+        plans = TravelPlan.fill_missing_summaries(plans, READ_PROFILE_PUBLIC)
+    
+    def format_plan(plan):
+        """格式化單個計劃"""
+        if selected:
+            return format_plan_document(plan, ('id', 'plan_id'), fieldset, LIST_REQUIRED_FIELDS)
+        
         # 基本計劃資料
         formatted_plan = {
-            'id': str(plan['_id']),  # 使用 'id' 以保持與前端一致
-            'plan_id': str(plan['_id']),  # 保留 'plan_id' 以兼容舊代碼
+            'id': plan['_id'],  # 使用 'id' 以保持與前端一致
+            'plan_id': plan['_id'],  # 保留 'plan_id' 以兼容舊代碼
             'title': plan['title'],
             'destination': plan['destination'],
             'start_date': plan['start_date'],
             'end_date': plan['end_date'],
-            'created_at': plan['created_at'].isoformat(),
-            'updated_at': plan['updated_at'].isoformat(),
+            'created_at': plan['created_at'],
+            'updated_at': plan['updated_at'],
             'is_public': plan['is_public'],
             'budget': plan.get('budget', '0'),
             'travelers': plan.get('travelers', 1)
         }
         
-        # 提取首張照片並添加到計劃資料中
-        first_photo_url = None
-        if include_photos and 'days' in plan:
-            # 遍歷每一天尋找照片
-            for day in plan['days']:
-                if 'activities' in day and not first_photo_url:
-                    for activity in day['activities']:
-                        if 'photos' in activity and activity['photos']:
-                            # 找到第一張照片
-                            first_photo_url = activity['photos'][0]
-                            break
-                if first_photo_url:
-                    break
-                            
-            # 如果找到照片，添加到計劃對象
-            if first_photo_url:
-                formatted_plan['cover_image'] = first_photo_url
-                logger.info(f"為計劃 {formatted_plan['id']} 找到封面圖片")
+        # 封面圖片和統計來自寫入時生成的摘要
+        summary = get_plan_summary(plan)
+        formatted_plan['summary'] = summary
+        if include_photos and summary['cover_image']:
+            formatted_plan['cover_image'] = summary['cover_image']
         
         # 如果請求需要包含活動和照片資料
         if (include_activities or include_photos) and 'days' in plan:
             formatted_plan['days'] = []
             
-            # 記錄照片和活動的統計信息
-            total_activities = 0
-            activities_with_photos = 0
-            
             # 處理每一天的資料
             for day in plan['days']:
                 day_data = {'date': day.get('date', ''), 'activities': []}
@@ -347,65 +600,87 @@ def get_public_plans():
                             
                             # 添加照片資料
                             activity_data['photos'] = activity['photos']
-                            activities_with_photos += 1
                         
                         # 如果活動資料不為空，添加到當天的活動列表
                         if activity_data:
                             day_data['activities'].append(activity_data)
-                            total_activities += 1
                 
                 # 添加當天的資料到 days 陣列
                 if day_data['activities'] or include_activities:
                     formatted_plan['days'].append(day_data)
-            
-            logger.info(f"旅行計劃 {formatted_plan['id']} 包含 {total_activities} 個活動，其中 {activities_with_photos} 個有照片")
         
-        formatted_plans.append(formatted_plan)
+        return formatted_plan
     
-    # 返回結果
-    response = {
+    # 返回結果（計劃列表邊讀取邊輸出）
+    envelope = {
         'success': True,
-        'plans': formatted_plans,
         'page': page,
         'limit': limit,
-        'total': total_plans
+        'total': total_plans,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None
     }
-    
-    # 記錄返回結果
-    logger.info(f"公開旅行計劃 API 成功返回 {len(formatted_plans)} 個計劃")
-    
-    return jsonify(response), 200
+    response = stream_json((format_plan(plan) for plan in plans), envelope, items_key='plans')
+    return set_cache_headers(response, etag, cache_control=CACHE_CONTROL_PUBLIC), 200
 
 @api_bp.route('/plans/public/<plan_id>', methods=['GET'])
+@cached_response(plan_namespace)
 def get_public_plan(plan_id):
     """獲取特定公開旅行計劃的詳情，無需登入"""
-    logger.info(f"收到請求獲取公開旅行計劃 ID: {plan_id}")
+    logger.info("收到請求獲取公開旅行計劃 ID: %s", plan_id)
     
-    # 查詢旅行計劃
-    plan = TravelPlan.find_by_id(plan_id)
+    try:
+        fieldset = get_fieldset_args(request.args)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
     
-    if not plan:
-        logger.warning(f"找不到旅行計劃 ID: {plan_id}")
+    # 先只讀取版本信息（匿名讀取，允許從副本節點讀取）
+    meta = TravelPlan.find_meta(plan_id, read_profile=READ_PROFILE_PUBLIC)
+    
+    if not meta:
+        logger.warning("找不到旅行計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃'
         }), 404
     
     # 檢查計劃是否為公開
-    if not plan['is_public']:
-        logger.warning(f"嘗試訪問非公開計劃 ID: {plan_id}")
+    if not meta['is_public']:
+        logger.warning("嘗試訪問非公開計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '此旅行計劃不是公開的'
         }), 403
     
+    # 客戶端緩存仍然有效時直接返回 304，無需讀取 days
+    etag = compute_etag(request.full_path, plan_id, meta.get('updated_at'), meta.get('version'))
+    if is_not_modified(etag, meta.get('updated_at')):
+        return not_modified_response(etag, meta.get('updated_at'), CACHE_CONTROL_PUBLIC)
+    
+    plan = find_plan_with_fieldset(plan_id, fieldset, DETAIL_REQUIRED_FIELDS, READ_PROFILE_PUBLIC)
+    if not plan or not plan['is_public']:
+        return jsonify({
+            'success': False,
+            'message': '找不到旅行計劃'
+        }), 404
+    
+    etag = compute_etag(request.full_path, plan_id, plan['updated_at'], plan.get('version'))
+    last_modified = plan['updated_at']
+    
+    if fieldset['fields'] or fieldset['exclude']:
+        response = jsonify({
+            'success': True,
+            'plan': format_plan_document(plan, ('id',), fieldset, DETAIL_REQUIRED_FIELDS)
+        })
+        return set_cache_headers(response, etag, last_modified, CACHE_CONTROL_PUBLIC), 200
+    
     # 格式化計劃數據
     formatted_plan = {
-        'id': str(plan['_id']),
-        'user_id': str(plan['user_id']),
+        'id': plan['_id'],
+        'user_id': plan['user_id'],
         'title': plan['title'],
-        'created_at': plan['created_at'].isoformat(),
-        'updated_at': plan['updated_at'].isoformat(),
+        'created_at': plan['created_at'],
+        'updated_at': plan['updated_at'],
         'is_public': plan['is_public'],
         'version': plan['version'],
         'destination': plan['destination'],
@@ -416,50 +691,90 @@ def get_public_plan(plan_id):
         'days': plan['days']
     }
     
-    logger.info(f"成功獲取公開旅行計劃 ID: {plan_id}")
+    logger.info("成功獲取公開旅行計劃 ID: %s", plan_id)
     
-    return jsonify({
+    response = jsonify({
         'success': True,
         'plan': formatted_plan
+    })
+    return set_cache_headers(response, etag, last_modified, CACHE_CONTROL_PUBLIC), 200
+
+@api_bp.route('/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """獲取公開計劃響應緩存的命中統計（與 /metrics 相同的訪問限制）"""
+    check_metrics_access()
+    return jsonify({
+        'success': True,
+        'stats': response_cache.stats()
     }), 200
 
 @api_bp.route('/travel-plans/search', methods=['GET'])
 def search_travel_plans():
     """搜索旅行計劃"""
-    # 獲取搜索參數
-    query = request.args.get('q', '')
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 10))
-    skip = (page - 1) * limit
+    # 獲取搜索參數（查詢字串只會被切分為字面值詞元，不會作為正則表達式使用）
+    query = request.args.get('q', '').strip()
+    try:
+        pagination = get_pagination_args(request.args)
+    except ValueError as e:
+        return invalid_pagination_response(e)
+    page = pagination['page']
+    limit = pagination['limit']
     
-    # 搜索旅行計劃
-    plans = TravelPlan.search_plans(query, limit=limit, skip=skip)
+    try:
+        fieldset = get_fieldset_args(request.args)
+    except FieldsetError as e:
+        return invalid_fieldset_response(e)
+    selected = fieldset['fields'] or fieldset['exclude']
+    projection = build_projection(**fieldset, required=LIST_REQUIRED_FIELDS)
+    
+    # 搜索旅行計劃（按相關度排序，多取一筆以判斷是否有下一頁）
+    plans = TravelPlan.search_plans(query, limit=limit + 1, skip=pagination['skip'],
+                                    cursor=pagination['cursor'], projection=projection)
+    plans, next_cursor = split_page(plans, limit, score_field='search_score')
+    total_plans = TravelPlan.count_search_results(query)
+    
+    # 頁面內容未變化時直接返回 304，跳過格式化
+    # （列表只比較 ETag：刪除或移出頁面的計劃不會反映在最大修改時間上）
+    etag = compute_list_etag(plans, total_plans, next_cursor)
+    if is_not_modified(etag):
+        return not_modified_response(etag, cache_control=CACHE_CONTROL_PUBLIC)
     
     # 格式化計劃數據
     formatted_plans = []
     for plan in plans:
+        if selected:
+            score = plan.pop('search_score', 0)
+            formatted_plans.append({**format_plan_document(plan, ('plan_id',), fieldset, LIST_REQUIRED_FIELDS), 'score': score})
+            continue
+        
         formatted_plan = {
-            'plan_id': str(plan['_id']),
+            'plan_id': plan['_id'],
             'title': plan['title'],
             'destination': plan['destination'],
             'start_date': plan['start_date'],
             'end_date': plan['end_date'],
-            'created_at': plan['created_at'].isoformat(),
-            'updated_at': plan['updated_at'].isoformat()
+            'created_at': plan['created_at'],
+            'updated_at': plan['updated_at'],
+            'score': plan.get('search_score', 0)
         }
         formatted_plans.append(formatted_plan)
     
-    return jsonify({
+    response = jsonify({
         'success': True,
         'plans': formatted_plans,
         'page': page,
         'limit': limit,
-        'total': len(formatted_plans),
+        'total': total_plans,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
         'query': query
-    }), 200
+    })
+    return set_cache_headers(response, etag, cache_control=CACHE_CONTROL_PUBLIC), 200
 
 @api_bp.route('/travel-plans/generate', methods=['POST'])
 @token_required
+@rate_limit('generate', config.RATE_LIMIT_GENERATE, algorithm=TOKEN_BUCKET)
+@GENERATIONS_IN_FLIGHT.track_inprogress()
 def generate_travel_plan():
     """
     自動生成旅行計劃並存儲到數據庫
@@ -490,27 +805,29 @@ def generate_travel_plan():
     
     try:
         # 呼叫生成服務
-        plan_data = gpt_generate_travel_plan(
-            destination=data['destination'],
-            start_date=data['start_date'],
-            end_date=data['end_date'],
-            budget=data.get('budget', '30000'),
-            interests=data.get('interests', []),
-            itinerary_preference=data.get('preference', '輕鬆'),
-            travel_companions=data.get('companions', '個人')
-        )
+        with stage_timer('gpt_generation'):
+            plan_data = gpt_generate_travel_plan(
+                destination=data['destination'],
+                start_date=data['start_date'],
+                end_date=data['end_date'],
+                budget=data.get('budget', '30000'),
+                interests=data.get('interests', []),
+                itinerary_preference=data.get('preference', '輕鬆'),
+                travel_companions=data.get('companions', '個人')
+            )
         
         # 使用 Google Places API 豐富旅行計劃
         try:
             # 檢查 Google Places API 金鑰是否有效
             if is_api_key_valid():
-                logger.info(f"開始使用 Google Places API 豐富旅行計劃: {data['destination']}")
-                plan_data = enrich_travel_plan(plan_data)
+                logger.info("開始使用 Google Places API 豐富旅行計劃: %s", data['destination'])
+                with stage_timer('places_enrichment'):
+                    plan_data = enrich_travel_plan(plan_data)
                 logger.info("Google Places API 豐富旅行計劃完成")
             else:
                 logger.warning("Google Places API 金鑰無效，將使用原始計劃")
         except Exception as e:
-            logger.warning(f"豐富旅行計劃時發生錯誤，將使用原始計劃: {str(e)}")
+            logger.warning("豐富旅行計劃時發生錯誤，將使用原始計劃: %s", e)
         
         # 確保計劃有user_id (這可能已經在gpt_service.py中設置了，但為確保安全再次設置)
         plan_data['user_id'] = user_id
@@ -520,7 +837,7 @@ def generate_travel_plan():
         plan_data['travelers'] = data.get('travelers', 1)  # 使用請求中的人數，默認為1人
         
         # 記錄將要保存的預算和人數
-        logger.info(f"準備保存旅行計劃 - 目的地: {data['destination']}, 預算: {plan_data['budget']}, 人數: {plan_data['travelers']}")
+        logger.info("準備保存旅行計劃 - 目的地: %s, 預算: %s, 人數: %s", data['destination'], plan_data['budget'], plan_data['travelers'])
         
         # 存儲到數據庫
         plan_id, error = TravelPlan.create_plan(user_id, plan_data)
@@ -537,7 +854,7 @@ def generate_travel_plan():
         }), 201
         
     except Exception as e:
-        logger.error(f"生成旅行計劃時發生錯誤: {str(e)}")
+        logger.error("生成旅行計劃時發生錯誤: %s", e)
         return jsonify({
             'success': False,
             'message': f'生成計劃時發生錯誤: {str(e)}'
@@ -571,7 +888,7 @@ def add_activity(plan_id):
     data = request.get_json()
     
     # 記錄API調用
-    logger.info(f"[POST] /travel-plans/{plan_id}/activities - 用戶: {user_id}")
+    logger.info("[POST] /travel-plans/%s/activities - 用戶: %s", plan_id, user_id)
     
     # 檢查必要字段
     if not data or 'day_index' not in data or 'activity' not in data:
@@ -584,7 +901,7 @@ def add_activity(plan_id):
     # 獲取旅行計劃
     plan = TravelPlan.find_by_id(plan_id)
     if not plan:
-        logger.error(f"[add_activity] 找不到旅行計劃 ID: {plan_id}")
+        logger.error("[add_activity] 找不到旅行計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃'
@@ -592,7 +909,7 @@ def add_activity(plan_id):
     
     # 檢查權限
     if str(plan['user_id']) != user_id:
-        logger.warning(f"[add_activity] 用戶 {user_id} 無權修改計劃 {plan_id}")
+        logger.warning("[add_activity] 用戶 %s 無權修改計劃 %s", user_id, plan_id)
         return jsonify({
             'success': False,
             'message': '無權修改此旅行計劃'
@@ -604,7 +921,7 @@ def add_activity(plan_id):
     
     # 驗證日期索引是否有效
     if day_index < 0 or day_index >= len(plan['days']):
-        logger.error(f"[add_activity] 無效的日期索引: {day_index}，有效範圍: 0-{len(plan['days'])-1}")
+        logger.error("[add_activity] 無效的日期索引: %s，有效範圍: 0-%s", day_index, len(plan['days'])-1)
         return jsonify({
             'success': False,
             'message': f'無效的日期索引: {day_index}，有效範圍: 0-{len(plan["days"])-1}'
@@ -614,7 +931,7 @@ def add_activity(plan_id):
     if 'id' not in activity or not activity['id'] or activity['id'] == 'undefined':
         import uuid
         activity['id'] = str(uuid.uuid4())
-        logger.info(f"[add_activity] 為新活動生成UUID: {activity['id']}")
+        logger.info("[add_activity] 為新活動生成UUID: %s", activity['id'])
     
     # 檢查活動ID是否為有效的UUID格式
     if not re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', activity['id'], re.I):
@@ -622,15 +939,15 @@ def add_activity(plan_id):
         import uuid
         original_id = activity['id']
         activity['id'] = str(uuid.uuid4())
-        logger.info(f"[add_activity] 活動ID不是有效的UUID格式，已將 {original_id} 替換為 {activity['id']}")
+        logger.info("[add_activity] 活動ID不是有效的UUID格式，已將 %s 替換為 %s", original_id, activity['id'])
     
     # 添加活動到指定天數
-    logger.info(f"[add_activity] 添加活動到第 {day_index+1} 天: {activity['name']}, ID: {activity['id']}")
+    logger.info("[add_activity] 添加活動到第 %s 天: %s, ID: %s", day_index+1, activity['name'], activity['id'])
     plan['days'][day_index]['activities'].append(activity)
     
     # 確保不包含 _id 欄位，避免 MongoDB 錯誤
     if "_id" in plan:
-        logger.info(f"[add_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
+        logger.info("[add_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
         plan_copy = plan.copy()
         del plan_copy["_id"]
     else:
@@ -640,7 +957,7 @@ def add_activity(plan_id):
     success, error = TravelPlan.update_plan(plan_id, plan_copy, user_id)
     
     if not success:
-        logger.error(f"[add_activity] 更新旅行計劃失敗: {error}")
+        logger.error("[add_activity] 更新旅行計劃失敗: %s", error)
         return jsonify({
             'success': False,
             'message': error
@@ -671,7 +988,7 @@ def update_activity(plan_id, activity_id):
     data = request.get_json()
     
     # 記錄API調用
-    logger.info(f"[PUT] /travel-plans/{plan_id}/activities/{activity_id} - 用戶: {user_id}")
+    logger.info("[PUT] /travel-plans/%s/activities/%s - 用戶: %s", plan_id, activity_id, user_id)
     
     # 檢查必要字段
     if not data or 'activity' not in data:
@@ -684,7 +1001,7 @@ def update_activity(plan_id, activity_id):
     # 獲取旅行計劃
     plan = TravelPlan.find_by_id(plan_id)
     if not plan:
-        logger.error(f"[update_activity] 找不到旅行計劃 ID: {plan_id}")
+        logger.error("[update_activity] 找不到旅行計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃'
@@ -692,7 +1009,7 @@ def update_activity(plan_id, activity_id):
     
     # 檢查權限
     if str(plan['user_id']) != user_id:
-        logger.warning(f"[update_activity] 用戶 {user_id} 無權修改計劃 {plan_id}")
+        logger.warning("[update_activity] 用戶 %s 無權修改計劃 %s", user_id, plan_id)
         return jsonify({
             'success': False,
             'message': '無權修改此旅行計劃'
@@ -709,7 +1026,7 @@ def update_activity(plan_id, activity_id):
         day_idx = int(index_match.group(1))
         act_idx = int(index_match.group(2))
         
-        logger.info(f"[update_activity] 檢測到索引格式: 天數索引={day_idx}, 活動索引={act_idx}")
+        logger.info("[update_activity] 檢測到索引格式: 天數索引=%s, 活動索引=%s", day_idx, act_idx)
         
         # 檢查索引是否有效
         if 0 <= day_idx < len(plan['days']):
@@ -717,11 +1034,11 @@ def update_activity(plan_id, activity_id):
                 activity_found = True
                 source_day_index = day_idx
                 source_activity_index = act_idx
-                logger.info(f"[update_activity] 通過索引找到活動: 天數索引={day_idx}, 活動索引={act_idx}")
+                logger.info("[update_activity] 通過索引找到活動: 天數索引=%s, 活動索引=%s", day_idx, act_idx)
             else:
-                logger.warning(f"[update_activity] 在第 {day_idx+1} 天中找不到索引為 {act_idx} 的活動")
+                logger.warning("[update_activity] 在第 %s 天中找不到索引為 %s 的活動", day_idx+1, act_idx)
         else:
-            logger.warning(f"[update_activity] 無效的天數索引: {day_idx}, 有效範圍: 0-{len(plan['days'])-1}")
+            logger.warning("[update_activity] 無效的天數索引: %s, 有效範圍: 0-%s", day_idx, len(plan['days'])-1)
     else:
         # 在所有天數中查找指定活動
         for day_i, day in enumerate(plan['days']):
@@ -731,11 +1048,11 @@ def update_activity(plan_id, activity_id):
                         activity_found = True
                         source_day_index = day_i
                         source_activity_index = act_i
-                        logger.info(f"[update_activity] 通過ID找到活動: ID={activity_id}, 天數索引={day_i}, 活動索引={act_i}")
+                        logger.info("[update_activity] 通過ID找到活動: ID=%s, 天數索引=%s, 活動索引=%s", activity_id, day_i, act_i)
                         break
     
     if not activity_found:
-        logger.warning(f"[update_activity] 找不到ID為 {activity_id} 的活動")
+        logger.warning("[update_activity] 找不到ID為 %s 的活動", activity_id)
         return jsonify({
             'success': False,
             'message': f'找不到ID為 {activity_id} 的活動'
@@ -748,9 +1065,9 @@ def update_activity(plan_id, activity_id):
     if not 'id' in updated_activity or not updated_activity['id'] or updated_activity['id'] == 'undefined':
         import uuid
         updated_activity['id'] = str(uuid.uuid4())
-        logger.info(f"[update_activity] 為更新的活動生成新UUID: {updated_activity['id']}")
+        logger.info("[update_activity] 為更新的活動生成新UUID: %s", updated_activity['id'])
     elif updated_activity.get('id') != activity_id:
-        logger.warning(f"[update_activity] 活動ID不一致，使用原ID: {activity_id}，而非: {updated_activity.get('id')}")
+        logger.warning("[update_activity] 活動ID不一致，使用原ID: %s，而非: %s", activity_id, updated_activity.get('id'))
         updated_activity['id'] = activity_id
     
     # 檢查是否需要移動到其他天
@@ -758,7 +1075,7 @@ def update_activity(plan_id, activity_id):
     
     # 驗證目標日期索引是否有效
     if target_day_index < 0 or target_day_index >= len(plan['days']):
-        logger.error(f"[update_activity] 無效的目標日期索引: {target_day_index}，有效範圍: 0-{len(plan['days'])-1}")
+        logger.error("[update_activity] 無效的目標日期索引: %s，有效範圍: 0-%s", target_day_index, len(plan['days'])-1)
         return jsonify({
             'success': False,
             'message': f'無效的目標日期索引: {target_day_index}，有效範圍: 0-{len(plan["days"])-1}'
@@ -770,41 +1087,41 @@ def update_activity(plan_id, activity_id):
         removed_activity = plan['days'][source_day_index]['activities'].pop(source_activity_index)
         # 添加到目標天數
         plan['days'][target_day_index]['activities'].append(updated_activity)
-        logger.info(f"[update_activity] 活動 {updated_activity['id']} 從第 {source_day_index+1} 天移動到第 {target_day_index+1} 天")
+        logger.info("[update_activity] 活動 %s 從第 %s 天移動到第 %s 天", updated_activity['id'], source_day_index+1, target_day_index+1)
     else:
         # 在原天數中更新活動
         plan['days'][source_day_index]['activities'][source_activity_index] = updated_activity
-        logger.info(f"[update_activity] 在第 {source_day_index+1} 天更新活動 {updated_activity['id']}")
+        logger.info("[update_activity] 在第 %s 天更新活動 %s", source_day_index+1, updated_activity['id'])
     
     # 確保不包含 _id 欄位，避免 MongoDB 錯誤
     if "_id" in plan:
-        logger.info(f"[update_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
+        logger.info("[update_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
         plan_copy = plan.copy()
         del plan_copy["_id"]
         
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId):
             plan_copy["user_id"] = plan["user_id"]  # 保持原始的 ObjectId 類型
-            logger.info(f"[update_activity] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+            logger.info("[update_activity] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
     else:
         plan_copy = plan
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId) and "user_id" in plan_copy:
             if not isinstance(plan_copy["user_id"], ObjectId):
                 plan_copy["user_id"] = plan["user_id"]
-                logger.info(f"[update_activity] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+                logger.info("[update_activity] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
     
     # 更新旅行計劃
     success, error = TravelPlan.update_plan(plan_id, plan_copy, user_id)
     
     if not success:
-        logger.error(f"[update_activity] 更新旅行計劃失敗: {error}")
+        logger.error("[update_activity] 更新旅行計劃失敗: %s", error)
         return jsonify({
             'success': False,
             'message': error
         }), 400
     
-    logger.info(f"[update_activity] 成功更新活動 {updated_activity['id']}")
+    logger.info("[update_activity] 成功更新活動 %s", updated_activity['id'])
     return jsonify({
         'success': True,
         'message': '活動更新成功',
@@ -824,11 +1141,11 @@ def delete_activity(plan_id, activity_id):
     user_id = request.user_id
     
     # 記錄API調用
-    logger.info(f"[DELETE] /travel-plans/{plan_id}/activities/{activity_id} - 用戶: {user_id}")
+    logger.info("[DELETE] /travel-plans/%s/activities/%s - 用戶: %s", plan_id, activity_id, user_id)
     
     # 檢查參數有效性
     if not activity_id or activity_id == 'undefined':
-        logger.error(f"[delete_activity] 請求刪除活動時提供了無效的活動ID: {activity_id}")
+        logger.error("[delete_activity] 請求刪除活動時提供了無效的活動ID: %s", activity_id)
         return jsonify({
             'success': False,
             'message': '無效的活動ID',
@@ -837,7 +1154,7 @@ def delete_activity(plan_id, activity_id):
     
     # 檢查計劃ID有效性
     if not plan_id or plan_id == 'undefined':
-        logger.error(f"[delete_activity] 請求刪除活動時提供了無效的計劃ID: {plan_id}")
+        logger.error("[delete_activity] 請求刪除活動時提供了無效的計劃ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '無效的計劃ID',
@@ -847,26 +1164,24 @@ def delete_activity(plan_id, activity_id):
     # 獲取旅行計劃
     plan = TravelPlan.find_by_id(plan_id)
     if not plan:
-        logger.error(f"[delete_activity] 找不到旅行計劃 ID: {plan_id}")
+        logger.error("[delete_activity] 找不到旅行計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃',
             'error_code': 'plan_not_found'
         }), 404
     
-    # 保存修改前的計劃副本用於記錄差異
-    original_plan = {
-        "days": [{"day": i+1, "activity_count": len(day.get("activities", [])), "activity_ids": [a.get("id") for a in day.get("activities", [])]} for i, day in enumerate(plan.get("days", []))]
-    }
+    # 保存修改前的活動分佈用於記錄差異（僅在 DEBUG 級別時構建）
+    original_plan = activity_layout(plan) if logger.isEnabledFor(logging.DEBUG) else None
     
     # 詳細檢查權限
     plan_user_id = plan.get('user_id', '')
     plan_user_id_str = str(plan_user_id)
-    logger.info(f"[delete_activity] 計劃擁有者ID: {plan_user_id_str}, 當前用戶ID: {user_id}")
+    logger.info("[delete_activity] 計劃擁有者ID: %s, 當前用戶ID: %s", plan_user_id_str, user_id)
     
     if plan_user_id_str != user_id:
-        logger.warning(f"[delete_activity] 權限錯誤: 用戶 {user_id} 無權刪除計劃 {plan_id} 中的活動")
-        logger.warning(f"[delete_activity] 權限詳情: 計劃擁有者={plan_user_id_str}, 請求用戶={user_id}, ID是否匹配={plan_user_id_str == user_id}")
+        logger.warning("[delete_activity] 權限錯誤: 用戶 %s 無權刪除計劃 %s 中的活動", user_id, plan_id)
+        logger.warning("[delete_activity] 權限詳情: 計劃擁有者=%s, 請求用戶=%s, ID是否匹配=%s", plan_user_id_str, user_id, plan_user_id_str == user_id)
         return jsonify({
             'success': False,
             'message': '您沒有權限修改此旅行計劃',
@@ -885,7 +1200,7 @@ def delete_activity(plan_id, activity_id):
         day_idx = int(index_match.group(1))
         act_idx = int(index_match.group(2))
         
-        logger.info(f"[delete_activity] 檢測到索引格式: 天數索引={day_idx}, 活動索引={act_idx}")
+        logger.info("[delete_activity] 檢測到索引格式: 天數索引=%s, 活動索引=%s", day_idx, act_idx)
         
         # 檢查索引是否有效
         if 0 <= day_idx < len(plan['days']):
@@ -895,18 +1210,18 @@ def delete_activity(plan_id, activity_id):
                 activity_found = True
                 activity_day_index = day_idx
                 activity_index = act_idx
-                logger.info(f"[delete_activity] 已從第 {day_idx+1} 天刪除索引為 {act_idx} 的活動")
+                logger.info("[delete_activity] 已從第 %s 天刪除索引為 %s 的活動", day_idx+1, act_idx)
             else:
-                logger.warning(f"[delete_activity] 在第 {day_idx+1} 天中找不到索引為 {act_idx} 的活動")
+                logger.warning("[delete_activity] 在第 %s 天中找不到索引為 %s 的活動", day_idx+1, act_idx)
         else:
-            logger.warning(f"[delete_activity] 無效的天數索引: {day_idx}, 有效範圍: 0-{len(plan['days'])-1}")
+            logger.warning("[delete_activity] 無效的天數索引: %s, 有效範圍: 0-%s", day_idx, len(plan['days'])-1)
     else:
         # 檢查是否為UUID格式
         is_uuid_format = re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', activity_id, re.I)
         if is_uuid_format:
-            logger.info(f"[delete_activity] 檢測到UUID格式的活動ID: {activity_id}")
+            logger.info("[delete_activity] 檢測到UUID格式的活動ID: %s", activity_id)
         else:
-            logger.info(f"[delete_activity] 非UUID格式的活動ID: {activity_id}，將嘗試按名稱匹配")
+            logger.info("[delete_activity] 非UUID格式的活動ID: %s，將嘗試按名稱匹配", activity_id)
         
         # 嘗試依據ID或名稱查找活動
         for day_i, day in enumerate(plan['days']):
@@ -918,7 +1233,7 @@ def delete_activity(plan_id, activity_id):
                         activity_found = True
                         activity_day_index = day_i
                         activity_index = act_i
-                        logger.info(f"[delete_activity] 已從第 {day_i+1} 天刪除ID為 {activity_id} 的活動")
+                        logger.info("[delete_activity] 已從第 %s 天刪除ID為 %s 的活動", day_i+1, activity_id)
                         break
                     # 如果沒有ID匹配，嘗試按名稱匹配
                     elif not is_uuid_format and act.get('name') == activity_id:
@@ -926,48 +1241,44 @@ def delete_activity(plan_id, activity_id):
                         activity_found = True
                         activity_day_index = day_i
                         activity_index = act_i
-                        logger.info(f"[delete_activity] 已從第 {day_i+1} 天刪除名稱為 '{activity_id}' 的活動")
+                        logger.info("[delete_activity] 已從第 %s 天刪除名稱為 '%s' 的活動", day_i+1, activity_id)
                         break
     
     if not activity_found:
-        logger.warning(f"[delete_activity] 找不到ID為 {activity_id} 的活動，無法刪除")
+        logger.warning("[delete_activity] 找不到ID為 %s 的活動，無法刪除", activity_id)
         return jsonify({
             'success': False,
             'message': f'找不到ID為 {activity_id} 的活動'
         }), 404
     
-    # 更新旅行計劃前的計劃狀態
-    modified_plan = {
-        "days": [{"day": i+1, "activity_count": len(day.get("activities", [])), "activity_ids": [a.get("id") for a in day.get("activities", [])]} for i, day in enumerate(plan.get("days", []))]
-    }
-    
     # 記錄計劃活動變更的詳細信息
-    logger.info(f"[delete_activity] 計劃 {plan_id} 修改前狀態: {original_plan}")
-    logger.info(f"[delete_activity] 計劃 {plan_id} 修改後狀態: {modified_plan}")
+    if original_plan is not None:
+        logger.debug("[delete_activity] 計劃 %s 修改前狀態: %s", plan_id, original_plan)
+        logger.debug("[delete_activity] 計劃 %s 修改後狀態: %s", plan_id, activity_layout(plan))
     
     # 確保不包含 _id 欄位，避免 MongoDB 錯誤
     if "_id" in plan:
-        logger.info(f"[delete_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
+        logger.info("[delete_activity] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
         plan_copy = plan.copy()
         del plan_copy["_id"]
         
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId):
             plan_copy["user_id"] = plan["user_id"]  # 保持原始的 ObjectId 類型
-            logger.info(f"[delete_activity] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+            logger.info("[delete_activity] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
     else:
         plan_copy = plan
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId) and "user_id" in plan_copy:
             if not isinstance(plan_copy["user_id"], ObjectId):
                 plan_copy["user_id"] = plan["user_id"]
-                logger.info(f"[delete_activity] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+                logger.info("[delete_activity] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
         
     # 更新旅行計劃
     success, error = TravelPlan.update_plan(plan_id, plan_copy, user_id)
     
     if not success:
-        logger.error(f"[delete_activity] 更新旅行計劃時發生錯誤: {error}")
+        logger.error("[delete_activity] 更新旅行計劃時發生錯誤: %s", error)
         # 如果更新失敗，但我們確實找到並刪除了活動，這是一個奇怪的情況
         # 可能需要考慮回滾刪除操作
         return jsonify({
@@ -977,10 +1288,8 @@ def delete_activity(plan_id, activity_id):
     
     # 獲取更新後的計劃以確認刪除已應用到數據庫
     updated_plan = TravelPlan.find_by_id(plan_id)
-    updated_plan_summary = {
-        "days": [{"day": i+1, "activity_count": len(day.get("activities", [])), "activity_ids": [a.get("id") for a in day.get("activities", [])]} for i, day in enumerate(updated_plan.get("days", []))]
-    }
-    logger.info(f"[delete_activity] 計劃 {plan_id} 更新後數據庫狀態: {updated_plan_summary}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("[delete_activity] 計劃 %s 更新後數據庫狀態: %s", plan_id, activity_layout(updated_plan))
     
     # 驗證活動是否確實從數據庫中刪除
     is_activity_still_present = False
@@ -990,7 +1299,7 @@ def delete_activity(plan_id, activity_id):
             break
     
     if is_activity_still_present:
-        logger.error(f"[delete_activity] 警告：儘管操作成功，活動 {activity_id} 仍存在於數據庫中!")
+        logger.error("[delete_activity] 警告：儘管操作成功，活動 %s 仍存在於數據庫中!", activity_id)
     
     # 返回被刪除的活動信息，以便前端確認
     response_data = {
@@ -1008,7 +1317,7 @@ def delete_activity(plan_id, activity_id):
             'activity_index': activity_index
         }
     
-    logger.info(f"[delete_activity] 成功刪除活動並更新旅行計劃")
+    logger.info("[delete_activity] 成功刪除活動並更新旅行計劃")
     return jsonify(response_data), 200
 
 # 添加新的API路由，支持基於索引的活動刪除
@@ -1022,12 +1331,12 @@ def delete_activity_by_index(plan_id, day_index, activity_index):
     user_id = request.user_id
     
     # 記錄索引刪除請求
-    logger.info(f"收到基於索引的活動刪除請求: 計劃ID={plan_id}, 天數索引={day_index}, 活動索引={activity_index}")
+    logger.info("收到基於索引的活動刪除請求: 計劃ID=%s, 天數索引=%s, 活動索引=%s", plan_id, day_index, activity_index)
     
     # 獲取旅行計劃
     plan = TravelPlan.find_by_id(plan_id)
     if not plan:
-        logger.error(f"找不到旅行計劃 ID: {plan_id}")
+        logger.error("找不到旅行計劃 ID: %s", plan_id)
         return jsonify({
             'success': False,
             'message': '找不到旅行計劃'
@@ -1035,7 +1344,7 @@ def delete_activity_by_index(plan_id, day_index, activity_index):
     
     # 檢查權限
     if str(plan['user_id']) != user_id:
-        logger.warning(f"用戶 {user_id} 無權刪除計劃 {plan_id} 中的活動")
+        logger.warning("用戶 %s 無權刪除計劃 %s 中的活動", user_id, plan_id)
         return jsonify({
             'success': False,
             'message': '無權修改此旅行計劃',
@@ -1044,7 +1353,7 @@ def delete_activity_by_index(plan_id, day_index, activity_index):
     
     # 檢查索引是否有效
     if day_index < 0 or day_index >= len(plan['days']):
-        logger.error(f"無效的天數索引: {day_index}, 有效範圍為 0-{len(plan['days'])-1}")
+        logger.error("無效的天數索引: %s, 有效範圍為 0-%s", day_index, len(plan['days'])-1)
         return jsonify({
             'success': False,
             'message': f'無效的天數索引: {day_index}, 有效範圍為 0-{len(plan["days"])-1}'
@@ -1055,7 +1364,7 @@ def delete_activity_by_index(plan_id, day_index, activity_index):
         plan['days'][day_index]['activities'] = []
     
     if activity_index < 0 or activity_index >= len(plan['days'][day_index]['activities']):
-        logger.error(f"無效的活動索引: {activity_index}, 有效範圍為 0-{len(plan['days'][day_index]['activities'])-1}")
+        logger.error("無效的活動索引: %s, 有效範圍為 0-%s", activity_index, len(plan['days'][day_index]['activities'])-1)
         return jsonify({
             'success': False,
             'message': f'無效的活動索引: {activity_index}, 有效範圍為 0-{len(plan["days"][day_index]["activities"])-1}'
@@ -1063,31 +1372,31 @@ def delete_activity_by_index(plan_id, day_index, activity_index):
     
     # 刪除指定索引的活動
     deleted_activity = plan['days'][day_index]['activities'].pop(activity_index)
-    logger.info(f"已從計劃 {plan_id} 的第 {day_index+1} 天刪除索引為 {activity_index} 的活動")
+    logger.info("已從計劃 %s 的第 %s 天刪除索引為 %s 的活動", plan_id, day_index+1, activity_index)
     
     # 確保不包含 _id 欄位，避免 MongoDB 錯誤
     if "_id" in plan:
-        logger.info(f"[delete_activity_by_index] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
+        logger.info("[delete_activity_by_index] 從計劃數據中移除 _id 欄位，避免 MongoDB 錯誤")
         plan_copy = plan.copy()
         del plan_copy["_id"]
         
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId):
             plan_copy["user_id"] = plan["user_id"]  # 保持原始的 ObjectId 類型
-            logger.info(f"[delete_activity_by_index] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+            logger.info("[delete_activity_by_index] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
     else:
         plan_copy = plan
         # 確保 user_id 保持為 ObjectId 類型
         if "user_id" in plan and isinstance(plan["user_id"], ObjectId) and "user_id" in plan_copy:
             if not isinstance(plan_copy["user_id"], ObjectId):
                 plan_copy["user_id"] = plan["user_id"]
-                logger.info(f"[delete_activity_by_index] 確保 user_id 保持為 ObjectId 類型: {type(plan['user_id'])}")
+                logger.info("[delete_activity_by_index] 確保 user_id 保持為 ObjectId 類型: %s", type(plan['user_id']))
     
     # 更新旅行計劃
     success, error = TravelPlan.update_plan(plan_id, plan_copy, user_id)
     
     if not success:
-        logger.error(f"更新旅行計劃失敗: {error}")
+        logger.error("更新旅行計劃失敗: %s", error)
         return jsonify({
             'success': False,
             'message': error
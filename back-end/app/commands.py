@@ -0,0 +1,113 @@
+import logging
+import click
+from bson.objectid import ObjectId
+from pymongo import UpdateOne
+
+from app.models.travel_plan import TravelPlan
+from app.utils.bulk_transfer import export_plans, import_plans
+from app.utils.response_cache import response_cache
+from app.utils.places_disk_cache import places_disk_cache
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+@click.command('reindex-plans')
+@click.option('--batch-size', default=500, show_default=True, help='每批寫入的計劃數量')
+def reindex_plans_command(batch_size):
+    """重新計算所有旅行計劃的派生欄位（搜索詞元等）"""
+    collection = TravelPlan.get_collection()
+    projection = {field: 1 for field in TravelPlan.derived_source_fields}
+    cursor = collection.find({}, projection).batch_size(batch_size)
+
+    operations = []
+    updated = 0
+    for plan in cursor:
+        operations.append(UpdateOne({"_id": plan["_id"]}, {"$set": TravelPlan.derived_fields(plan)}))
+        if len(operations) >= batch_size:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+            operations = []
+
+    if operations:
+        updated += collection.bulk_write(operations, ordered=False).modified_count
+
+    # 摘要可能已變化，使緩存的公開響應失效（進程內緩存由各工作進程按 TTL 過期）
+    response_cache.invalidate_all()
+    click.echo(f'已重新計算 {updated} 個旅行計劃的派生欄位')
+
+@click.command('export-plans')
+@click.argument('output')
+@click.option('--batch-size', default=1000, show_default=True, help='每次從數據庫讀取的文檔數量')
+@click.option('--public-only', is_flag=True, help='只導出公開的旅行計劃')
+@click.option('--user-id', default=None, help='只導出指定用戶的旅行計劃')
+def export_plans_command(output, batch_size, public_only, user_id):
+    """將旅行計劃串流導出為 NDJSON（OUTPUT 以 .gz 結尾時壓縮）"""
+    query = {}
+    if public_only:
+        query["is_public"] = True
+    if user_id:
+        query["user_id"] = ObjectId(user_id)
+
+    stats = export_plans(
+        TravelPlan.get_collection(),
+        output,
+        query=query,
+        batch_size=batch_size,
+        progress=lambda count: click.echo(f'已導出 {count} 個計劃...', err=True)
+    )
+    click.echo(f"導出完成: {stats['exported']} 個計劃，耗時 {stats['elapsed_seconds']} 秒，"
+               f"{stats['docs_per_second']} 個/秒 → {stats['path']}")
+
+@click.command('import-plans')
+@click.argument('input_path')
+@click.option('--batch-size', default=1000, show_default=True, help='每批插入的文檔數量')
+@click.option('--checkpoint', default=None, help='檢查點文件路徑，中斷後可從該位置繼續')
+@click.option('--user-id', default=None, help='將導入的計劃歸屬到指定用戶')
+def import_plans_command(input_path, batch_size, checkpoint, user_id):
+    """從 NDJSON 文件批量導入旅行計劃"""
+    transform = None
+    if user_id:
+        owner_id = ObjectId(user_id)
+
+        def transform(doc):
+            doc["user_id"] = owner_id
+            return doc
+
+    stats = import_plans(
+        TravelPlan.get_collection(),
+        input_path,
+        batch_size=batch_size,
+        checkpoint_path=checkpoint,
+        transform=transform,
+        progress=lambda current: click.echo(
+            f"已插入 {current['inserted']}，跳過 {current['skipped']}，失敗 {current['failed']}...", err=True
+        )
+    )
+
+    # 導入繞過了增量計數，重置計數器使其在下次讀取時重新統計
+    TravelPlan.reset_counts()
+    response_cache.invalidate_all()
+
+    click.echo(f"導入完成: 插入 {stats['inserted']}，跳過 {stats['skipped']}，失敗 {stats['failed']}，"
+               f"耗時 {stats['elapsed_seconds']} 秒，{stats['docs_per_second']} 個/秒")
+    if stats['failed_lines']:
+        retry = '使用同一 --checkpoint 重新執行可重試這些行' if checkpoint else '指定 --checkpoint 可只重試失敗的行'
+        raise click.ClickException(f"{len(stats['failed_lines'])} 行插入失敗（行號 {stats['failed_lines'][:20]}），{retry}")
+
+@click.command('compact-places-cache')
+def compact_places_cache_command():
+    """立即清理 Places 磁盤緩存並顯示條目數和文件大小"""
+    if not places_disk_cache.enabled:
+        raise click.ClickException('未設置 PLACES_DISK_CACHE_PATH')
+    result = places_disk_cache.compact(force=True)
+    if result is None:
+        raise click.ClickException('清理失敗，詳見日誌')
+    stats = places_disk_cache.stats()
+    click.echo(f"清理完成: 過期 {result['expired']} 條，淘汰 {result['evicted']} 條；"
+               f"剩餘 {stats['entries']}，{stats['bytes']} 字節 → {stats['path']}")
+
+def register_commands(app):
+    """註冊 Flask CLI 命令"""
+    app.cli.add_command(reindex_plans_command)
+    app.cli.add_command(export_plans_command)
+    app.cli.add_command(import_plans_command)
+    app.cli.add_command(compact_places_cache_command)
@@ -12,10 +12,107 @@ class Config:
 
     # Google Places API設置
     GOOGLE_PLACES_API_KEY = os.getenv('GOOGLE_PLACES_API_KEY', '')
+    GOOGLE_PLACES_API_URL = os.getenv('GOOGLE_PLACES_API_URL', 'https://maps.googleapis.com/maps/api/place')
+
+    # Places 主機本地磁盤緩存（SQLite 文件，同一主機的工作進程共享並在重啟後保留；路徑為空表示不使用）
+    PLACES_DISK_CACHE_PATH = os.getenv('PLACES_DISK_CACHE_PATH', '')
+    PLACES_DISK_CACHE_TTL_SECONDS = int(os.getenv('PLACES_DISK_CACHE_TTL_SECONDS', '2592000'))  # 30 天
+    PLACES_DISK_CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv('PLACES_DISK_CACHE_NEGATIVE_TTL_SECONDS', '86400'))  # 無結果的查詢
+    PLACES_DISK_CACHE_MAX_ENTRIES = int(os.getenv('PLACES_DISK_CACHE_MAX_ENTRIES', '200000'))  # 0 表示不限制
+    PLACES_DISK_CACHE_COMPACT_SECONDS = int(os.getenv('PLACES_DISK_CACHE_COMPACT_SECONDS', '3600'))  # 0 表示不在後台清理
+    PLACES_DISK_CACHE_MMAP_BYTES = int(os.getenv('PLACES_DISK_CACHE_MMAP_BYTES', str(64 * 1024 * 1024)))
     
-    # MongoDB設置 (未來使用)
+    # MongoDB設置
     MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/travel_app')
+    MONGO_DB_NAME = os.getenv('MONGO_DB_NAME', 'travo')
+    MONGO_APPNAME = os.getenv('MONGO_APPNAME', 'travo-backend')
+    # 連接池大小應不小於每個工作進程的線程數
+    MONGO_MAX_POOL_SIZE = int(os.getenv('MONGO_MAX_POOL_SIZE', '20'))
+    MONGO_MIN_POOL_SIZE = int(os.getenv('MONGO_MIN_POOL_SIZE', '0'))
+    MONGO_MAX_IDLE_TIME_MS = int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '300000'))
+    MONGO_CONNECT_TIMEOUT_MS = int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000'))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+    MONGO_SOCKET_TIMEOUT_MS = int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '30000'))
+    # 匿名公開讀取（探索、搜索）的副本讀取設置
+    MONGO_PUBLIC_MAX_STALENESS_SECONDS = int(os.getenv('MONGO_PUBLIC_MAX_STALENESS_SECONDS', '90'))
+    MONGO_PUBLIC_READ_CONCERN = os.getenv('MONGO_PUBLIC_READ_CONCERN', 'local')
+    
+    # 計劃列表設置
+    PLAN_COUNT_REFRESH_SECONDS = int(os.getenv('PLAN_COUNT_REFRESH_SECONDS', '3600'))  # 計數器定期校正間隔
+    SEARCH_COUNT_CACHE_SECONDS = int(os.getenv('SEARCH_COUNT_CACHE_SECONDS', '60'))
+    SEARCH_COUNT_CACHE_SIZE = int(os.getenv('SEARCH_COUNT_CACHE_SIZE', '1000'))
+    
+    # 公開計劃響應緩存設置（未設置 Redis 地址時各工作進程使用進程內緩存）
+    RESPONSE_CACHE_ENABLED = os.getenv('RESPONSE_CACHE_ENABLED', 'True').lower() in ('true', '1', 't')
+    RESPONSE_CACHE_TTL_SECONDS = int(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '60'))
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '1000'))
+    RESPONSE_CACHE_REDIS_URL = os.getenv('RESPONSE_CACHE_REDIS_URL', '')
+    RESPONSE_CACHE_PREFIX = os.getenv('RESPONSE_CACHE_PREFIX', 'travo:responses')
+    
+    # 響應壓縮設置（安裝 brotli 套件後優先使用 br）
+    COMPRESSION_ENABLED = os.getenv('COMPRESSION_ENABLED', 'True').lower() in ('true', '1', 't')
+    COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '1024'))  # 小於此字節數的響應不壓縮
+    COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', '6'))
+    COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', '4'))
+    
+    # 認證緩存設置（用戶緩存為進程內緩存，多進程部署時資料更新最多延遲此秒數可見）
+    AUTH_TOKEN_CACHE_SECONDS = int(os.getenv('AUTH_TOKEN_CACHE_SECONDS', '300'))
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '10000'))
+    USER_CACHE_SECONDS = int(os.getenv('USER_CACHE_SECONDS', '60'))
+    USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', '10000'))
+    
+    # 密碼哈希設置（Werkzeug 方法字符串；方法或成本變更後，舊哈希在用戶下次登錄時自動升級）
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    PASSWORD_HASH_SALT_LENGTH = int(os.getenv('PASSWORD_HASH_SALT_LENGTH', '16'))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', '2'))  # 0 表示在請求線程中計算
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', '16'))  # 每個工作進程等待中的哈希任務上限
+    PASSWORD_HASH_TIMEOUT_SECONDS = float(os.getenv('PASSWORD_HASH_TIMEOUT_SECONDS', '10'))
     
+    # 限流設置（格式為 "次數/時間單位"，為空表示不限流；未設置 Redis 地址時各工作進程各自計數）
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'True').lower() in ('true', '1', 't')
+    RATE_LIMIT_GENERATE = os.getenv('RATE_LIMIT_GENERATE', '10/hour')
+    RATE_LIMIT_LOGIN = os.getenv('RATE_LIMIT_LOGIN', '10/minute')
+    RATE_LIMIT_REDIS_URL = os.getenv('RATE_LIMIT_REDIS_URL', '')
+    RATE_LIMIT_PREFIX = os.getenv('RATE_LIMIT_PREFIX', 'travo:ratelimit')
+    RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', '100000'))
+    RATE_LIMIT_TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', '0'))  # 前置反向代理層數
+    RATE_LIMIT_FAIL_OPEN = os.getenv('RATE_LIMIT_FAIL_OPEN', 'True').lower() in ('true', '1', 't')  # 共享存儲不可用時放行（false 時返回 503）
+    
+    # 日誌設置（LOG_SAMPLE_RATES 為 "日誌記錄器名稱模式=輸出比例"，只抽樣 INFO 及以下的記錄）
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')  # json 或 text
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))  # 隊列已滿時丟棄新記錄
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'app.*.activity=0.05')
+    
+    # MongoDB 命令監控（MONGO_SLOW_OP_MS 為 -1 時不記錄慢操作；MONGO_REQUEST_OPS_WARN 為 0 時不檢查命令數）
+    MONGO_SLOW_OP_MS = int(os.getenv('MONGO_SLOW_OP_MS', '100'))
+    MONGO_REQUEST_OPS_WARN = int(os.getenv('MONGO_REQUEST_OPS_WARN', '20'))
+    
+    # 指標設置（設置 METRICS_AUTH_TOKEN 後抓取 /metrics 需要 Bearer 令牌；
+    # 未設置時只接受本機請求，METRICS_PUBLIC 為 true 時才對外公開）
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'True').lower() in ('true', '1', 't')
+    METRICS_AUTH_TOKEN = os.getenv('METRICS_AUTH_TOKEN', '')
+    METRICS_PUBLIC = os.getenv('METRICS_PUBLIC', 'False').lower() in ('true', '1', 't')
+
+    # 追蹤設置（TRACING_EXPORTER 為 file 時寫入 OTLP/JSON 文件，為 otlp 時發送到 OTLP/HTTP 收集器）
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False').lower() in ('true', '1', 't')
+    TRACING_EXPORTER = os.getenv('TRACING_EXPORTER', 'file')
+    TRACING_FILE_PATH = os.getenv('TRACING_FILE_PATH', 'instance/traces.jsonl')
+    TRACING_OTLP_ENDPOINT = os.getenv('TRACING_OTLP_ENDPOINT', 'http://localhost:4318')
+    TRACING_EXPORT_TIMEOUT_SECONDS = float(os.getenv('TRACING_EXPORT_TIMEOUT_SECONDS', '5'))
+    TRACING_QUEUE_SIZE = int(os.getenv('TRACING_QUEUE_SIZE', '10000'))  # 隊列已滿時丟棄新的 span
+    TRACING_SAMPLE_RATE = float(os.getenv('TRACING_SAMPLE_RATE', '1.0'))
+    TRACING_SERVICE_NAME = os.getenv('TRACING_SERVICE_NAME', 'travo-api')
+
+    # 請求分析（按需分析需要 PROFILING_TOKEN；PROFILING_SAMPLE_RATE 大於 0 時持續採樣該比例的請求）
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('true', '1', 't')
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+    PROFILING_DIR = os.getenv('PROFILING_DIR', 'instance/profiles')
+    PROFILING_MODE = os.getenv('PROFILING_MODE', 'sample')  # sample 或 cprofile
+    PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', '5'))
+    PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+    PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', '500'))  # 0 表示不清理
+
     # 應用設置
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev_secret_key')
     DEBUG = os.getenv('DEBUG', 'True').lower() in ('true', '1', 't')
@@ -1,72 +1,195 @@
 import os
 import logging
+import threading
+import contextvars
+from contextlib import contextmanager
 from pymongo import MongoClient
+from pymongo.read_concern import ReadConcern
+from pymongo.read_preferences import Primary, SecondaryPreferred
 from dotenv import load_dotenv
 
+from app.config.config import get_config
+from app.utils.mongo_monitor import command_monitor
+
 # 設置日誌
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 # 加載環境變量
 load_dotenv()
 
+# 獲取配置
+config = get_config()
+
 # MongoDB連接字符串
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017')
 
+# 讀取配置檔名稱
+READ_PROFILE_PRIMARY = 'primary'
+READ_PROFILE_PUBLIC = 'public'
+
+# pymongo 要求 maxStalenessSeconds 不小於 90 秒（-1 表示不限制）
+MIN_MAX_STALENESS_SECONDS = 90
+
+def _public_max_staleness():
+    """獲取公開讀取允許的最大延遲秒數"""
+    staleness = config.MONGO_PUBLIC_MAX_STALENESS_SECONDS
+    if staleness != -1 and staleness < MIN_MAX_STALENESS_SECONDS:
+        logger.warning("MONGO_PUBLIC_MAX_STALENESS_SECONDS=%s 小於 %s，將使用 %s", staleness, MIN_MAX_STALENESS_SECONDS, MIN_MAX_STALENESS_SECONDS)
+        return MIN_MAX_STALENESS_SECONDS
+    return staleness
+
+# 各類讀取操作的讀偏好和讀關注設置
+# - primary: 擁有者讀取及寫入後的讀取，保證讀到自己剛寫入的數據
+# - public: 匿名的公開瀏覽和搜索，允許從副本節點讀取稍舊的數據
+READ_PROFILES = {
+    READ_PROFILE_PRIMARY: {
+        "read_preference": Primary(),
+        "read_concern": ReadConcern("local")
+    },
+    READ_PROFILE_PUBLIC: {
+        "read_preference": SecondaryPreferred(max_staleness=_public_max_staleness()),
+        "read_concern": ReadConcern(config.MONGO_PUBLIC_READ_CONCERN)
+    }
+}
+
+# 為 True 時 READ_PROFILE_PUBLIC 的讀取也改用主節點（見 primary_reads）
+_primary_reads = contextvars.ContextVar('primary_reads', default=False)
+
+@contextmanager
+def primary_reads():
+    """
+    在代碼塊內將公開讀取改為從主節點讀取
+
+    填充共享響應緩存時使用：副本可能落後於剛發生的寫入，
+    從副本讀到的舊內容會被緩存在失效後的新世代下。
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+def _mask_uri(uri):
+    """隱藏連接字符串中的密碼"""
+    if "@" not in uri:
+        return uri
+    credentials, host = uri.rsplit("@", 1)
+    scheme, _, auth = credentials.partition("://")
+    user = auth.split(":")[0]
+    return f"{scheme}://{user}:******@{host}"
+
 class Database:
-    """MongoDB數據庫連接管理類"""
-    
+    """
+    MongoDB數據庫連接管理類
+
+    客戶端在首次使用時才按進程創建：gunicorn fork 出的工作進程不會沿用
+    主進程的連接池和套接字，檢測到進程ID變化時會重新建立客戶端。
+    """
+
     _instance = None
     _client = None
     _db = None
-    
+    _pid = None
+    _lock = threading.Lock()
+
     @classmethod
     def get_instance(cls):
         """單例模式獲取數據庫實例"""
         if cls._instance is None:
             cls._instance = Database()
         return cls._instance
-    
-    def __init__(self):
-        """初始化數據庫連接"""
-        if Database._client is None:
+
+    @staticmethod
+    def client_options():
+        """從配置生成 MongoClient 的連接池和超時參數"""
+        return {
+            "maxPoolSize": config.MONGO_MAX_POOL_SIZE,
+            "minPoolSize": config.MONGO_MIN_POOL_SIZE,
+            "maxIdleTimeMS": config.MONGO_MAX_IDLE_TIME_MS,
+            "connectTimeoutMS": config.MONGO_CONNECT_TIMEOUT_MS,
+            "serverSelectionTimeoutMS": config.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            "socketTimeoutMS": config.MONGO_SOCKET_TIMEOUT_MS,
+            "appname": config.MONGO_APPNAME,
+            # 延遲到第一次操作時才連接，避免在 fork 前建立套接字
+            "connect": False,
+            # 按命令和集合記錄耗時
+            "event_listeners": [command_monitor]
+        }
+
+    @classmethod
+    def _ensure_client(cls):
+        """確保當前進程擁有自己的客戶端"""
+        pid = os.getpid()
+        if Database._client is not None and Database._pid == pid:
+            return
+
+        with cls._lock:
+            if Database._client is not None and Database._pid == pid:
+                return
+
+            if Database._client is not None:
+                # 從父進程繼承的客戶端不能安全使用，也不應在子進程中關閉
+                logger.info("檢測到進程 fork (父進程: %s, 當前: %s)，重新創建MongoDB客戶端", Database._pid, pid)
+                Database._client = None
+                Database._db = None
+
             try:
-                # 隱藏敏感信息
-                log_uri = MONGO_URI
-                if "mongodb+srv://" in log_uri:
-                    parts = log_uri.split("@")
-                    if len(parts) > 1:
-                        auth_part = parts[0].split(":")
-                        if len(auth_part) > 1:
-                            log_uri = f"{auth_part[0]}:******@{parts[1]}"
-                
-                logger.info(f"正在連接到MongoDB: {log_uri}")
-                Database._client = MongoClient(MONGO_URI)
-                Database._db = Database._client.travo
-                logger.info("MongoDB連接成功")
+                logger.info("正在連接到MongoDB: %s (pid: %s)", _mask_uri(MONGO_URI), pid)
+                Database._client = MongoClient(MONGO_URI, **cls.client_options())
+                Database._db = Database._client[config.MONGO_DB_NAME]
+                Database._pid = pid
+                logger.info("MongoDB客戶端已創建")
             except Exception as e:
-                logger.error(f"MongoDB連接失敗: {str(e)}")
+                logger.error("MongoDB連接失敗: %s", e)
                 raise
-    
+
     @property
     def db(self):
         """獲取數據庫對象"""
+        Database._ensure_client()
         return Database._db
-    
+
     @property
     def client(self):
         """獲取客戶端對象"""
+        Database._ensure_client()
         return Database._client
-    
+
+    @classmethod
+    def reset_after_fork(cls):
+        """在 fork 出的子進程中丟棄繼承的客戶端（下次使用時重新創建）"""
+        with cls._lock:
+            Database._client = None
+            Database._db = None
+            Database._pid = None
+
     def close(self):
         """關閉數據庫連接"""
-        if Database._client:
-            Database._client.close()
+        with Database._lock:
+            # 只關閉當前進程創建的客戶端
+            if Database._client and Database._pid == os.getpid():
+                Database._client.close()
+                logger.info("MongoDB連接已關閉")
             Database._client = None
             Database._db = None
-            logger.info("MongoDB連接已關閉")
+            Database._pid = None
 
 # 導出數據庫實例獲取函數
 def get_db():
     """獲取數據庫實例"""
-    return Database.get_instance().db 
\ No newline at end of file
+    return Database.get_instance().db
+
+def get_collection(name, read_profile=None):
+    """
+    獲取集合，並按讀取配置檔設置讀偏好和讀關注
+
+    Args:
+        name: 集合名稱
+        read_profile: READ_PROFILES 中的配置檔名稱，None 表示使用客戶端默認設置
+    """
+    collection = get_db()[name]
+    if read_profile is None:
+        return collection
+    if read_profile == READ_PROFILE_PUBLIC and _primary_reads.get():
+        read_profile = READ_PROFILE_PRIMARY
+    return collection.with_options(**READ_PROFILES[read_profile])
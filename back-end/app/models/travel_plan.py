@@ -1,25 +1,259 @@
 import logging
 import uuid
 import json
+import copy
+import time
+import threading
 from datetime import datetime
 from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
 
-from app.models.db import get_db
+from app.models.db import get_db, get_collection, READ_PROFILE_PRIMARY, READ_PROFILE_PUBLIC
+from app.config.config import get_config
+from app.utils.search_service import build_search_tokens, build_query_tokens, SEARCH_FIELDS
+from app.utils.pagination import keyset_filter, scored_keyset_filter
+from app.utils.plan_patch import apply_operations, PlanPatchError, UUID_PATTERN
+from app.utils.response_cache import invalidate_plan_responses
+from app.utils.tracing import traced
+
+# 獲取配置
+config = get_config()
 
 # 設置日誌
 logger = logging.getLogger(__name__)
+# 每個活動的詳細日誌使用子日誌記錄器，按 LOG_SAMPLE_RATES 抽樣輸出
+activity_logger = logging.getLogger(f'{__name__}.activity')
 
 class TravelPlan:
     """旅行計劃模型類"""
     
     collection_name = 'travel_plans'
+    counters_collection_name = 'plan_counters'
+    # 計算派生欄位所需的原始欄位
+    derived_source_fields = SEARCH_FIELDS + ("days",)
+    
+    # 列表查詢只讀取卡片所需的欄位和摘要
+    LIST_PROJECTION = {
+        "user_id": 1,
+        "title": 1,
+        "destination": 1,
+        "start_date": 1,
+        "end_date": 1,
+        "created_at": 1,
+        "updated_at": 1,
+        "is_public": 1,
+        "budget": 1,
+        "travelers": 1,
+        "summary": 1
+    }
+    # 分頁和條件請求只需要排序鍵和修改時間
+    VERSION_PROJECTION = {
+        "created_at": 1,
+        "updated_at": 1
+    }
+    _indexes_ensured = False
+    # 創建索引失敗後按指數退避重試，避免每個請求都重試並記錄錯誤
+    INDEX_RETRY_MIN_SECONDS = 5
+    INDEX_RETRY_MAX_SECONDS = 300
+    _index_failures = 0
+    _index_retry_at = 0.0
+    
+    # 搜索結果總數的進程內緩存 {詞元元組: (過期時間, 總數)}
+    _search_count_cache = {}
+    _search_count_lock = threading.Lock()
+    
+    @classmethod
+    def get_collection(cls, read_profile=None):
+        """獲取旅行計劃集合（read_profile 指定讀偏好和讀關注配置檔）"""
+        if not cls._indexes_ensured and time.monotonic() >= cls._index_retry_at:
+            cls.ensure_indexes()
+        return get_collection(cls.collection_name, read_profile)
+    
+    @classmethod
+    def ensure_indexes(cls, collection=None):
+        """確保集合所需的索引存在（每個進程只執行一次）"""
+        if collection is None:
+            collection = get_db()[cls.collection_name]
+        
+        try:
+            # 搜索詞元為多鍵索引，配合 is_public 過濾
+            collection.create_index(
+                [("search_tokens", ASCENDING), ("is_public", ASCENDING)],
+                name="search_tokens_public"
+            )
+            # 游標分頁使用 (created_at, _id) 排序
+            collection.create_index(
+                [("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="user_created_at"
+            )
+            collection.create_index(
+                [("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+                name="public_created_at"
+            )
+            cls._indexes_ensured = True
+            cls._index_failures = 0
+        except Exception as e:
+            delay = min(cls.INDEX_RETRY_MIN_SECONDS * 2 ** cls._index_failures, cls.INDEX_RETRY_MAX_SECONDS)
+            cls._index_failures += 1
+            cls._index_retry_at = time.monotonic() + delay
+            logger.error("創建旅行計劃索引失敗（第 %s 次），%s 秒後重試: %s", cls._index_failures, delay, e)
+    
+    @classmethod
+    def get_counters_collection(cls, read_profile=None):
+        """獲取計劃計數器集合"""
+        return get_collection(cls.counters_collection_name, read_profile)
+    
+    @classmethod
+    def _adjust_counts(cls, user_id, user_delta=0, public_delta=0):
+        """寫入時增量更新計劃計數器（計數器不存在時由讀取端初始化）"""
+        try:
+            counters = cls.get_counters_collection()
+            if user_delta:
+                counters.update_one({"_id": f"user:{user_id}"}, {"$inc": {"count": user_delta}})
+            if public_delta:
+                counters.update_one({"_id": "public"}, {"$inc": {"count": public_delta}})
+        except Exception as e:
+            logger.error("更新計劃計數器失敗: %s", e)
+    
+    @classmethod
+    def reset_counts(cls):
+        """清空所有計數器（批量導入等繞過增量更新的操作之後調用）"""
+        try:
+            cls.get_counters_collection().delete_many({})
+        except Exception as e:
+            logger.error("重置計劃計數器失敗: %s", e)
+    
+    @classmethod
+    def _get_count(cls, counter_id, query, read_profile=None):
+        """讀取緩存的計數；計數器不存在或超過刷新間隔時重新統計"""
+        try:
+            counter = cls.get_counters_collection(read_profile).find_one({"_id": counter_id})
+            now = datetime.utcnow()
+            if counter and (now - counter["refreshed_at"]).total_seconds() < config.PLAN_COUNT_REFRESH_SECONDS:
+                return counter["count"]
+            
+            count = cls.get_collection(read_profile).count_documents(query)
+            cls.get_counters_collection().update_one(
+                {"_id": counter_id},
+                {"$set": {"count": count, "refreshed_at": now}},
+                upsert=True
+            )
+            return count
+        except Exception as e:
+            logger.error("讀取計劃計數失敗: %s", e)
+            return 0
+    
+    @classmethod
+    @traced()
+    def count_public_plans(cls):
+        """獲取公開旅行計劃的總數"""
+        return cls._get_count("public", {"is_public": True}, READ_PROFILE_PUBLIC)
+    
+    @classmethod
+    @traced()
+    def count_user_plans(cls, user_id):
+        """獲取用戶旅行計劃的總數"""
+        if isinstance(user_id, str):
+            try:
+                user_id = ObjectId(user_id)
+            except:
+                logger.error("無效的用戶ID格式: %s", user_id)
+                return 0
+        return cls._get_count(f"user:{user_id}", {"user_id": user_id}, READ_PROFILE_PRIMARY)
+    
+    @classmethod
+    @traced()
+    def count_search_results(cls, query):
+        """獲取搜索結果總數（按詞元緩存一段時間）"""
+        tokens = build_query_tokens(query)
+        if not tokens:
+            return 0
+        
+        cache_key = tuple(sorted(tokens))
+        now = time.monotonic()
+        with cls._search_count_lock:
+            cached = cls._search_count_cache.get(cache_key)
+            if cached and cached[0] > now:
+                return cached[1]
+        
+        try:
+            count = cls.get_collection(READ_PROFILE_PUBLIC).count_documents(
+                {"search_tokens": {"$in": tokens}, "is_public": True}
+            )
+        except Exception as e:
+            logger.error("統計搜索結果總數失敗: %s", e)
+            return 0
+        
+        with cls._search_count_lock:
+            # 避免緩存無限增長
+            if len(cls._search_count_cache) >= config.SEARCH_COUNT_CACHE_SIZE:
+                cls._search_count_cache.clear()
+            cls._search_count_cache[cache_key] = (now + config.SEARCH_COUNT_CACHE_SECONDS, count)
+        return count
+    
+    @classmethod
+    def derived_fields(cls, plan):
+        """計算寫入時需要同步維護的派生欄位"""
+        return {
+            "search_tokens": build_search_tokens(plan),
+            "summary": cls.build_summary(plan.get("days"))
+        }
+    
+    @staticmethod
+    def build_summary(days):
+        """生成計劃摘要：封面圖片、天數、活動數和照片數"""
+        summary = {
+            "cover_image": None,
+            "day_count": 0,
+            "activity_count": 0,
+            "photo_count": 0
+        }
+        if not isinstance(days, list):
+            return summary
+        
+        summary["day_count"] = len(days)
+        for day in days:
+            activities = day.get("activities") if isinstance(day, dict) else None
+            if not isinstance(activities, list):
+                continue
+            summary["activity_count"] += len(activities)
+            for activity in activities:
+                photos = activity.get("photos") if isinstance(activity, dict) else None
+                if photos:
+                    summary["photo_count"] += len(photos)
+                    if summary["cover_image"] is None:
+                        summary["cover_image"] = photos[0]
+        return summary
     
     @classmethod
-    def get_collection(cls):
-        """獲取旅行計劃集合"""
-        return get_db()[cls.collection_name]
+    def fill_missing_summaries(cls, plans, read_profile=None):
+        """
+        為列表投影中沒有摘要的舊計劃補上摘要（就地修改，返回原列表）
+
+        只讀取缺少摘要的計劃的 days，整頁只多一次查詢；結果不寫回數據庫，
+        運行 reindex-plans 後不再需要。
+        """
+        missing = [plan for plan in plans if not plan.get("summary") and "days" not in plan]
+        if not missing:
+            return plans
+        
+        try:
+            days_by_id = {
+                doc["_id"]: doc.get("days")
+                for doc in cls.get_collection(read_profile).find(
+                    {"_id": {"$in": [plan["_id"] for plan in missing]}}, {"days": 1}
+                )
+            }
+        except Exception as e:
+            logger.error("讀取舊計劃行程以計算摘要時出錯: %s", e)
+            return plans
+        
+        for plan in missing:
+            plan["summary"] = cls.build_summary(days_by_id.get(plan["_id"]))
+        return plans
     
     @classmethod
+    @traced()
     def create_plan(cls, user_id, plan_data):
         """創建新旅行計劃"""
         # 確保用戶ID格式正確
@@ -27,7 +261,7 @@ class TravelPlan:
             try:
                 user_id = ObjectId(user_id)
             except:
-                logger.error(f"無效的用戶ID格式: {user_id}")
+                logger.error("無效的用戶ID格式: %s", user_id)
                 return None, "無效的用戶ID"
         
         # 確保每個活動都有有效的 UUID
@@ -48,18 +282,18 @@ class TravelPlan:
                         # 檢查活動是否有有效的 ID
                         if "id" not in activity or not activity["id"] or activity["id"] == "undefined":
                             activity["id"] = str(uuid.uuid4())
-                            logger.info(f"創建計劃時為第 {day_index+1} 天第 {act_index+1} 個活動生成UUID: {activity['id']}")
+                            activity_logger.info("創建計劃時為第 %s 天第 %s 個活動生成UUID: %s", day_index+1, act_index+1, activity['id'])
                             total_added_ids += 1
                         # 檢查 ID 是否為有效的 UUID 格式
                         elif not re.match(uuid_pattern, activity["id"], re.I):
                             original_id = activity["id"]
                             activity["id"] = str(uuid.uuid4())
-                            logger.info(f"創建計劃時替換第 {day_index+1} 天第 {act_index+1} 個活動的非UUID格式ID: {original_id} → {activity['id']}")
+                            activity_logger.info("創建計劃時替換第 %s 天第 %s 個活動的非UUID格式ID: %s → %s", day_index+1, act_index+1, original_id, activity['id'])
                             total_added_ids += 1
             
             # 記錄活動 ID 生成/替換情況
             if total_activities > 0:
-                logger.info(f"創建計劃時共檢查 {total_activities} 個活動，生成/替換了 {total_added_ids} 個UUID（{round(total_added_ids/total_activities*100, 2)}%）")
+                logger.info("創建計劃時共檢查 %s 個活動，生成/替換了 %s 個UUID（%s%%）", total_activities, total_added_ids, round(total_added_ids/total_activities*100, 2))
         
         # 創建計劃文檔
         now = datetime.utcnow()
@@ -77,136 +311,258 @@ class TravelPlan:
             "travelers": plan_data.get("travelers", 1),  # 添加旅行人數欄位
             "days": plan_data.get("days", []),
         }
+        plan.update(cls.derived_fields(plan))
         
         # 記錄添加的預算和人數信息
-        logger.info(f"創建旅行計劃 - 目的地: {plan['destination']}, 預算: {plan['budget']}, 旅行人數: {plan['travelers']}, 天數: {len(plan['days'])}")
+        logger.info("創建旅行計劃 - 目的地: %s, 預算: %s, 旅行人數: %s, 天數: %s", plan['destination'], plan['budget'], plan['travelers'], len(plan['days']))
         
         try:
             result = cls.get_collection().insert_one(plan)
             plan_id = result.inserted_id
-            logger.info(f"成功創建旅行計劃: {plan['title']}, ID: {plan_id}")
+            logger.info("成功創建旅行計劃: %s, ID: %s", plan['title'], plan_id)
+            cls._adjust_counts(user_id, user_delta=1, public_delta=1 if plan["is_public"] else 0)
+            if plan["is_public"]:
+                invalidate_plan_responses(plan_id, public=True)
             return plan_id, None
         except Exception as e:
-            logger.error(f"創建旅行計劃失敗: {str(e)}")
+            logger.error("創建旅行計劃失敗: %s", e)
             return None, f"創建旅行計劃失敗: {str(e)}"
     
+    # 修復活動ID時計劃被並發修改的重試次數
+    ACTIVITY_ID_REPAIR_ATTEMPTS = 3
+
+    @staticmethod
+    def _needs_activity_id_repair(plan):
+        """計劃中是否有缺少ID或ID不是UUID格式的活動"""
+        for day in plan.get("days") or []:
+            if not isinstance(day, dict) or not isinstance(day.get("activities"), list):
+                continue
+            for activity in day["activities"]:
+                activity_id = activity.get("id")
+                if not activity_id or activity_id == "undefined" or not UUID_PATTERN.match(str(activity_id)):
+                    return True
+        return False
+
+    @staticmethod
+    def _repair_activity_ids(plan):
+        """
+        為缺少ID或ID不是UUID格式的活動生成新ID（原地修改）
+
+        Returns:
+            {欄位路徑: 新ID}，例如 {"days.0.activities.2.id": "..."}
+        """
+        repairs = {}
+        for day_index, day in enumerate(plan.get("days") or []):
+            if not isinstance(day, dict) or not isinstance(day.get("activities"), list):
+                continue
+            for act_index, activity in enumerate(day["activities"]):
+                activity_id = activity.get("id")
+                if activity_id and activity_id != "undefined" and UUID_PATTERN.match(str(activity_id)):
+                    continue
+                activity["id"] = str(uuid.uuid4())
+                repairs[f"days.{day_index}.activities.{act_index}.id"] = activity["id"]
+                if activity_id:
+                    activity_logger.info("計劃 %s 第 %s 天的第 %s 個活動ID不是有效的UUID格式，已將 %s 替換為 %s",
+                                         plan.get("_id"), day_index+1, act_index+1, activity_id, activity["id"])
+                else:
+                    activity_logger.info("為計劃 %s 第 %s 天的第 %s 個活動生成ID: %s",
+                                         plan.get("_id"), day_index+1, act_index+1, activity["id"])
+        return repairs
+
     @classmethod
-    def find_by_id(cls, plan_id):
-        """根據ID查找旅行計劃"""
+    def _find_with_repaired_activity_ids(cls, plan_id):
+        """
+        從主節點讀取計劃，並以條件寫入保存活動ID的修復
+
+        只寫入被修復的 days.N.activities.M.id 路徑和新的 updated_at，且以讀取到的 updated_at 為條件，
+        期間計劃被其他請求修改時重新讀取後再修復，不會用舊文檔覆蓋對方的修改。
+        """
+        collection = cls.get_collection(READ_PROFILE_PRIMARY)
+        plan = None
+        for _ in range(cls.ACTIVITY_ID_REPAIR_ATTEMPTS):
+            plan = collection.find_one({"_id": plan_id})
+            if not plan:
+                return None
+            repairs = cls._repair_activity_ids(plan)
+            if not repairs:
+                return plan
+            # 活動ID改變後更新 updated_at，使基於它的 ETag 失效，持有舊ID的客戶端會重新讀取
+            updated_at = datetime.utcnow()
+            try:
+                result = collection.update_one(
+                    {"_id": plan_id, "updated_at": plan.get("updated_at")},
+                    {"$set": {**repairs, "updated_at": updated_at}}
+                )
+            except Exception as e:
+                logger.error("更新計劃 %s 的活動ID時出錯: %s", plan_id, e)
+                return plan
+            if result.matched_count:
+                plan["updated_at"] = updated_at
+                invalidate_plan_responses(plan_id, public=bool(plan.get("is_public")))
+                logger.info("已更新計劃 %s 的 %s 個活動ID並保存到數據庫", plan_id, len(repairs))
+                return plan
+            logger.info("計劃 %s 在修復活動ID前已被修改，重新讀取", plan_id)
+        logger.warning("計劃 %s 的活動ID修復多次與並發修改衝突，本次返回未保存的ID", plan_id)
+        return plan
+
+    @classmethod
+    @traced()
+    def find_by_id(cls, plan_id, read_profile=None):
+        """
+        根據ID查找旅行計劃（匿名公開讀取可使用 READ_PROFILE_PUBLIC）
+
+        缺少ID或ID不是UUID格式的活動會被分配新ID並保存。修復總是基於主節點上的文檔：
+        從副本讀取到需要修復的計劃時改從主節點重新讀取，副本的數據可能落後，不能寫回。
+        """
         if isinstance(plan_id, str):
             try:
                 plan_id = ObjectId(plan_id)
             except:
-                logger.error(f"無效的計劃ID格式: {plan_id}")
+                logger.error("無效的計劃ID格式: %s", plan_id)
                 return None
         
         try:
-            # 查詢數據庫
-            plan = cls.get_collection().find_one({"_id": plan_id})
+            plan = cls.get_collection(read_profile).find_one({"_id": plan_id})
+            if plan and cls._needs_activity_id_repair(plan):
+                plan = cls._find_with_repaired_activity_ids(plan_id)
             
             # 轉換ObjectId為字符串
             if plan:
-                original_plan = plan.copy()  # 保存原始計劃以檢查更改
-                
                 plan["_id"] = str(plan["_id"])
                 user_id = plan.get("user_id")
                 if isinstance(user_id, ObjectId):
                     plan["user_id"] = str(user_id)
-                
-                # 確保計劃中的每個活動都有唯一ID
-                uuid_changes_made = False  # 跟踪是否進行了ID修改
-                if "days" in plan and isinstance(plan["days"], list):
-                    for day_index, day in enumerate(plan["days"]):
-                        if "activities" in day and isinstance(day["activities"], list):
-                            import uuid
-                            import re
-                            
-                            for act_index, activity in enumerate(day["activities"]):
-                                # 如果活動沒有ID或ID無效，則生成新ID
-                                if "id" not in activity or not activity["id"] or activity["id"] == "undefined":
-                                    activity["id"] = str(uuid.uuid4())
-                                    logger.info(f"為計劃 {plan_id} 第 {day_index+1} 天的第 {act_index+1} 個活動生成ID: {activity['id']}")
-                                    uuid_changes_made = True
-                                # 檢查ID是否為有效的UUID格式
-                                elif not re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', activity["id"], re.I):
-                                    original_id = activity["id"]
-                                    activity["id"] = str(uuid.uuid4())
-                                    logger.info(f"計劃 {plan_id} 第 {day_index+1} 天的第 {act_index+1} 個活動ID不是有效的UUID格式，已將 {original_id} 替換為 {activity['id']}")
-                                    uuid_changes_made = True
-                
-                # 如果對活動ID進行了修改，保存到數據庫
-                if uuid_changes_made:
-                    try:
-                        update_data = plan.copy()
-                        # 恢復原始ObjectId，避免類型轉換問題
-                        update_data["_id"] = plan_id
-                        if "user_id" in update_data and isinstance(original_plan.get("user_id"), ObjectId):
-                            update_data["user_id"] = original_plan["user_id"]
-                        
-                        # 更新計劃
-                        result = cls.get_collection().update_one(
-                            {"_id": plan_id},
-                            {"$set": update_data}
-                        )
-                        if result.modified_count > 0:
-                            logger.info(f"已更新計劃 {plan_id} 的活動ID並保存到數據庫")
-                        else:
-                            logger.warning(f"計劃 {plan_id} 的活動ID更新失敗")
-                    except Exception as e:
-                        logger.error(f"更新計劃 {plan_id} 的活動ID時出錯: {str(e)}")
             
             return plan
         except Exception as e:
-            logger.error(f"查詢旅行計劃時出錯: {str(e)}")
+            logger.error("查詢旅行計劃時出錯: %s", e)
             return None
     
     @classmethod
-    def find_by_user(cls, user_id, limit=10, skip=0):
-        """查找用戶的所有旅行計劃"""
+    @traced()
+    def find_by_ids(cls, plan_ids, projection=None, read_profile=None):
+        """以單次 $in 查詢批量獲取旅行計劃（只讀，不會修復活動ID）"""
+        object_ids = []
+        for plan_id in plan_ids:
+            try:
+                object_ids.append(plan_id if isinstance(plan_id, ObjectId) else ObjectId(plan_id))
+            except:
+                logger.warning("批量查詢時跳過無效的計劃ID: %s", plan_id)
+        
+        if not object_ids:
+            return []
+        
+        try:
+            return list(cls.get_collection(read_profile).find({"_id": {"$in": object_ids}}, projection))
+        except Exception as e:
+            logger.error("批量查詢旅行計劃時出錯: %s", e)
+            return []
+
+    @classmethod
+    def iter_by_ids(cls, plan_ids, projection=None, read_profile=None, batch_size=20):
+        """按列表排序 (created_at, _id 降序) 返回指定計劃的游標，供響應時逐個讀取"""
+        db_cursor = cls.get_collection(read_profile).find({"_id": {"$in": list(plan_ids)}}, projection)
+        return db_cursor.sort([("created_at", DESCENDING), ("_id", DESCENDING)]).batch_size(batch_size)
+
+    @classmethod
+    @traced()
+    def find_meta(cls, plan_id, read_profile=None):
+        """只讀取計劃的擁有者、公開狀態和版本信息（用於權限檢查和條件請求，不讀取 days）"""
+        try:
+            plan_id = plan_id if isinstance(plan_id, ObjectId) else ObjectId(plan_id)
+        except:
+            logger.error("無效的計劃ID格式: %s", plan_id)
+            return None
+
+        try:
+            return cls.get_collection(read_profile).find_one(
+                {"_id": plan_id},
+                {"user_id": 1, "is_public": 1, "updated_at": 1, "version": 1}
+            )
+        except Exception as e:
+            logger.error("查詢旅行計劃版本信息時出錯: %s", e)
+            return None
+
+    @classmethod
+    @traced()
+    def find_by_user(cls, user_id, limit=10, skip=0, cursor=None, projection=None):
+        """查找用戶的所有旅行計劃（提供cursor時使用游標分頁，projection限制返回欄位）"""
         if isinstance(user_id, str):
             try:
                 user_id = ObjectId(user_id)
             except:
-                logger.error(f"無效的用戶ID格式: {user_id}")
+                logger.error("無效的用戶ID格式: %s", user_id)
                 return []
         
-        cursor = cls.get_collection().find({"user_id": user_id})
-        cursor = cursor.sort("created_at", -1).skip(skip).limit(limit)
-        return list(cursor)
+        query = {"user_id": user_id}
+        if cursor:
+            query.update(keyset_filter(cursor))
+            skip = 0
+        
+        db_cursor = cls.get_collection(READ_PROFILE_PRIMARY).find(query, projection)
+        db_cursor = db_cursor.sort([("created_at", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+        return list(db_cursor)
     
     @classmethod
-    def find_public_plans(cls, limit=10, skip=0):
-        """查找公開的旅行計劃"""
-        cursor = cls.get_collection().find({"is_public": True})
-        cursor = cursor.sort("created_at", -1).skip(skip).limit(limit)
-        return list(cursor)
+    @traced()
+    def find_public_plans(cls, limit=10, skip=0, cursor=None, projection=None):
+        """查找公開的旅行計劃（提供cursor時使用游標分頁，projection限制返回欄位）"""
+        query = {"is_public": True}
+        if cursor:
+            query.update(keyset_filter(cursor))
+            skip = 0
+        
+        db_cursor = cls.get_collection(READ_PROFILE_PUBLIC).find(query, projection)
+        db_cursor = db_cursor.sort([("created_at", DESCENDING), ("_id", DESCENDING)]).skip(skip).limit(limit)
+        return list(db_cursor)
     
     @classmethod
-    def search_plans(cls, query, limit=10, skip=0):
-        """搜索旅行計劃"""
-        # 創建搜索條件
-        search_criteria = {
-            "$or": [
-                {"title": {"$regex": query, "$options": "i"}},
-                {"destination": {"$regex": query, "$options": "i"}}
-            ],
-            "$and": [
-                {"is_public": True}
-            ]
-        }
+    @traced()
+    def search_plans(cls, query, limit=10, skip=0, cursor=None, projection=None):
+        """搜索公開的旅行計劃，按命中的詞元數量排序（提供cursor時使用游標分頁，projection默認為列表欄位）"""
+        tokens = build_query_tokens(query)
+        if not tokens:
+            return []
+        
+        pipeline = [
+            {"$match": {"search_tokens": {"$in": tokens}, "is_public": True}},
+            {"$addFields": {
+                "search_score": {"$size": {"$filter": {
+                    "input": "$search_tokens",
+                    "cond": {"$in": ["$$this", tokens]}
+                }}}
+            }}
+        ]
+        if cursor:
+            pipeline.append({"$match": scored_keyset_filter(cursor, "search_score")})
+            skip = 0
         
-        cursor = cls.get_collection().find(search_criteria)
-        cursor = cursor.sort("created_at", -1).skip(skip).limit(limit)
-        return list(cursor)
+        projection = dict(projection or cls.LIST_PROJECTION)
+        if any(projection.values()):
+            # 包含模式的投影需要顯式保留分數
+            projection["search_score"] = 1
+        pipeline.extend([
+            {"$project": projection},
+            {"$sort": {"search_score": DESCENDING, "created_at": DESCENDING, "_id": DESCENDING}},
+            {"$skip": skip},
+            {"$limit": limit}
+        ])
+        
+        try:
+            return list(cls.get_collection(READ_PROFILE_PUBLIC).aggregate(pipeline))
+        except Exception as e:
+            logger.error("搜索旅行計劃時出錯: %s", e)
+            return []
     
     @classmethod
+    @traced()
     def update_plan(cls, plan_id, update_data, user_id=None):
         """更新旅行計劃"""
         if isinstance(plan_id, str):
             try:
                 plan_id = ObjectId(plan_id)
             except:
-                logger.error(f"無效的計劃ID格式: {plan_id}")
+                logger.error("無效的計劃ID格式: %s", plan_id)
                 return False, {'message': '無效的計劃ID', 'error_code': 'invalid_plan_id'}
         
         # 如果提供了用戶ID，確保只有計劃擁有者可以更新
@@ -215,12 +571,12 @@ class TravelPlan:
                 try:
                     user_id = ObjectId(user_id)
                 except:
-                    logger.error(f"無效的用戶ID格式: {user_id}")
+                    logger.error("無效的用戶ID格式: %s", user_id)
                     return False, {'message': '無效的用戶ID', 'error_code': 'invalid_user_id'}
             
             plan = cls.find_by_id(plan_id)
             if not plan:
-                logger.error(f"找不到計劃 {plan_id} 以進行權限檢查")
+                logger.error("找不到計劃 %s 以進行權限檢查", plan_id)
                 return False, {'message': '找不到計劃', 'error_code': 'plan_not_found'}
             
             plan_owner_id = plan.get("user_id")
@@ -232,8 +588,8 @@ class TravelPlan:
             user_id_str = str(user_id)
             
             if plan_owner_id_str != user_id_str:
-                logger.warning(f"權限錯誤: 用戶 {user_id_str} 無權更新計劃 {plan_id}")
-                logger.warning(f"權限詳情: 計劃擁有者={plan_owner_id_str}, 請求用戶={user_id_str}")
+                logger.warning("權限錯誤: 用戶 %s 無權更新計劃 %s", user_id_str, plan_id)
+                logger.warning("權限詳情: 計劃擁有者=%s, 請求用戶=%s", plan_owner_id_str, user_id_str)
                 return False, {"message": "無權更新此計劃", "error_code": "permission_denied"}
         
         # 確保每個活動都有有效的 UUID
@@ -254,22 +610,22 @@ class TravelPlan:
                         # 檢查活動是否有有效的 ID
                         if "id" not in activity or not activity["id"] or activity["id"] == "undefined":
                             activity["id"] = str(uuid.uuid4())
-                            logger.info(f"更新計劃時為第 {day_index+1} 天第 {act_index+1} 個活動生成UUID: {activity['id']}")
+                            activity_logger.info("更新計劃時為第 %s 天第 %s 個活動生成UUID: %s", day_index+1, act_index+1, activity['id'])
                             uuid_changes_made = True
                             total_added_ids += 1
                         # 檢查 ID 是否為有效的 UUID 格式
                         elif not re.match(uuid_pattern, activity["id"], re.I):
                             original_id = activity["id"]
                             activity["id"] = str(uuid.uuid4())
-                            logger.info(f"更新計劃時替換第 {day_index+1} 天第 {act_index+1} 個活動的非UUID格式ID: {original_id} → {activity['id']}")
+                            activity_logger.info("更新計劃時替換第 %s 天第 %s 個活動的非UUID格式ID: %s → %s", day_index+1, act_index+1, original_id, activity['id'])
                             uuid_changes_made = True
                             total_added_ids += 1
             
             # 記錄活動 ID 生成/替換情況
             if total_activities > 0:
-                logger.info(f"更新計劃 {plan_id} 時共檢查 {total_activities} 個活動，生成/替換了 {total_added_ids} 個UUID")
+                logger.info("更新計劃 %s 時共檢查 %s 個活動，生成/替換了 %s 個UUID", plan_id, total_activities, total_added_ids)
                 if uuid_changes_made:
-                    logger.info(f"更新計劃過程中修改了活動ID，將保存這些更改")
+                    logger.debug("更新計劃過程中修改了活動ID，將保存這些更改")
         
         # 準備更新數據
         update_data["updated_at"] = datetime.utcnow()
@@ -279,28 +635,33 @@ class TravelPlan:
             "days_count": len(update_data.get("days", [])),
             "activities_count": sum(len(day.get("activities", [])) for day in update_data.get("days", []))
         }
-        logger.info(f"準備更新計劃 {plan_id}，天數: {update_summary['days_count']}, 活動總數: {update_summary['activities_count']}")
+        logger.info("準備更新計劃 %s，天數: %s, 活動總數: %s", plan_id, update_summary['days_count'], update_summary['activities_count'])
         
         try:
             # 檢查計劃是否存在
             original_plan = cls.get_collection().find_one({"_id": plan_id})
             if not original_plan:
-                logger.error(f"計劃 {plan_id} 不存在，無法更新")
+                logger.error("計劃 %s 不存在，無法更新", plan_id)
                 return False, "計劃不存在，無法更新"
                 
             # 記錄原始計劃的活動數量
             original_activities_count = sum(len(day.get("activities", [])) for day in original_plan.get("days", []))
-            logger.info(f"原始計劃 {plan_id} 的活動總數: {original_activities_count}")
+            logger.debug("原始計劃 %s 的活動總數: %s", plan_id, original_activities_count)
+            
+            # 標題或目的地變更時重新計算搜索詞元
+            if any(field in update_data for field in cls.derived_source_fields):
+                merged_plan = {field: update_data.get(field, original_plan.get(field)) for field in cls.derived_source_fields}
+                update_data.update(cls.derived_fields(merged_plan))
             
             # 保存原始 user_id 的類型和值
             original_user_id = None
             if "user_id" in update_data and "user_id" in original_plan:
                 original_user_id = original_plan["user_id"]
-                logger.info(f"記錄原始 user_id 類型: {type(original_user_id)}")
+                logger.debug("記錄原始 user_id 類型: %s", type(original_user_id))
             
             # 確保不包含 _id 欄位，避免 MongoDB 錯誤
             if "_id" in update_data:
-                logger.warning(f"更新數據中包含 _id 欄位，將其移除以避免 MongoDB 錯誤")
+                logger.warning("更新數據中包含 _id 欄位，將其移除以避免 MongoDB 錯誤")
                 update_data_copy = update_data.copy()
                 del update_data_copy["_id"]
                 
@@ -308,14 +669,14 @@ class TravelPlan:
                 if original_user_id and isinstance(original_user_id, ObjectId) and "user_id" in update_data_copy:
                     if not isinstance(update_data_copy["user_id"], ObjectId):
                         update_data_copy["user_id"] = original_user_id
-                        logger.info(f"確保 user_id 保持為 ObjectId 類型")
+                        logger.debug("確保 user_id 保持為 ObjectId 類型")
             else:
                 update_data_copy = update_data
                 # 如果 user_id 原本是 ObjectId，確保它保持為 ObjectId
                 if original_user_id and isinstance(original_user_id, ObjectId) and "user_id" in update_data_copy:
                     if not isinstance(update_data_copy["user_id"], ObjectId):
                         update_data_copy["user_id"] = original_user_id
-                        logger.info(f"確保 user_id 保持為 ObjectId 類型")
+                        logger.debug("確保 user_id 保持為 ObjectId 類型")
             
             # 更新計劃
             result = cls.get_collection().update_one(
@@ -325,52 +686,122 @@ class TravelPlan:
             
             # 詳細記錄更新結果
             if result.modified_count > 0:
-                logger.info(f"成功更新旅行計劃: {plan_id}，影響文檔數: {result.modified_count}")
+                logger.info("成功更新旅行計劃: %s，影響文檔數: %s", plan_id, result.modified_count)
+                
+                # 公開狀態變更時同步公開計劃計數
+                if "is_public" in update_data_copy and bool(update_data_copy["is_public"]) != bool(original_plan.get("is_public")):
+                    cls._adjust_counts(original_plan.get("user_id"), public_delta=1 if update_data_copy["is_public"] else -1)
+                
+                # 使公開計劃的緩存響應失效
+                invalidate_plan_responses(plan_id, public=bool(original_plan.get("is_public")) or bool(update_data_copy.get("is_public")))
                 
                 # 驗證更新是否確實寫入數據庫
                 updated_plan = cls.get_collection().find_one({"_id": plan_id})
                 if updated_plan:
                     updated_activities_count = sum(len(day.get("activities", [])) for day in updated_plan.get("days", []))
-                    logger.info(f"更新後計劃 {plan_id} 的活動總數: {updated_activities_count}")
+                    logger.debug("更新後計劃 %s 的活動總數: %s", plan_id, updated_activities_count)
                     
                     # 檢查活動數量是否符合預期
                     expected_activities = update_summary["activities_count"]
                     if updated_activities_count != expected_activities:
-                        logger.warning(f"計劃 {plan_id} 的活動數量不符合預期! 預期: {expected_activities}, 實際: {updated_activities_count}")
+                        logger.warning("計劃 %s 的活動數量不符合預期! 預期: %s, 實際: %s", plan_id, expected_activities, updated_activities_count)
                     
                     # 檢查 user_id 類型是否保持不變
                     updated_user_id = updated_plan.get("user_id")
-                    logger.info(f"更新後的 user_id 類型: {type(updated_user_id)}")
+                    logger.debug("更新後的 user_id 類型: %s", type(updated_user_id))
                     if original_user_id and type(original_user_id) != type(updated_user_id):
-                        logger.warning(f"警告：user_id 類型已變更! 原始類型: {type(original_user_id)}, 更新後類型: {type(updated_user_id)}")
+                        logger.warning("警告：user_id 類型已變更! 原始類型: %s, 更新後類型: %s", type(original_user_id), type(updated_user_id))
                 
                 return True, None
             elif result.matched_count > 0:
-                logger.info(f"旅行計劃匹配但無更改: {plan_id}，匹配文檔數: {result.matched_count}")
+                logger.info("旅行計劃匹配但無更改: %s，匹配文檔數: %s", plan_id, result.matched_count)
                 
                 # 驗證文檔是否確實保持不變
                 current_plan = cls.get_collection().find_one({"_id": plan_id})
                 if current_plan:
                     current_activities_count = sum(len(day.get("activities", [])) for day in current_plan.get("days", []))
                     if current_activities_count != original_activities_count:
-                        logger.warning(f"警告：儘管報告無更改，但計劃 {plan_id} 的活動數量已變化! 原始: {original_activities_count}, 當前: {current_activities_count}")
+                        logger.warning("警告：儘管報告無更改，但計劃 %s 的活動數量已變化! 原始: %s, 當前: %s", plan_id, original_activities_count, current_activities_count)
                 
                 return True, None
             
-            logger.warning(f"計劃更新失敗，未找到匹配文檔: {plan_id}")
+            logger.warning("計劃更新失敗，未找到匹配文檔: %s", plan_id)
             return False, "計劃更新失敗，未找到匹配文檔"
         except Exception as e:
-            logger.error(f"更新旅行計劃失敗: {str(e)}")
+            logger.error("更新旅行計劃失敗: %s", e)
             return False, f"更新旅行計劃失敗: {str(e)}"
     
     @classmethod
+    @traced()
+    def patch_plan(cls, plan_id, user_id, operations):
+        """
+        在一次讀取和一次條件寫入中應用批量修改操作
+        
+        寫入時以讀取到的 updated_at 作為條件，若期間計劃被其他請求修改，
+        則返回 conflict 錯誤而不覆蓋對方的修改。
+        
+        Returns:
+            (成功與否, 成功時為結果字典，失敗時為包含 message 和 error_code 的字典)
+        """
+        if isinstance(plan_id, str):
+            try:
+                plan_id = ObjectId(plan_id)
+            except:
+                logger.error("無效的計劃ID格式: %s", plan_id)
+                return False, {'message': '無效的計劃ID', 'error_code': 'invalid_plan_id'}
+        
+        plan = cls.get_collection(READ_PROFILE_PRIMARY).find_one({"_id": plan_id})
+        if not plan:
+            return False, {'message': '找不到旅行計劃', 'error_code': 'plan_not_found'}
+        
+        if str(plan.get("user_id")) != str(user_id):
+            logger.warning("權限錯誤: 用戶 %s 無權修改計劃 %s", user_id, plan_id)
+            return False, {'message': '無權修改此旅行計劃', 'error_code': 'permission_denied'}
+        
+        days = copy.deepcopy(plan.get("days", []))
+        try:
+            fields, results = apply_operations(days, operations)
+        except PlanPatchError as e:
+            return False, {'message': e.message, 'error_code': 'invalid_operation', 'op_index': e.op_index}
+        
+        merged_plan = {**plan, **fields, "days": days}
+        update_data = {
+            **fields,
+            "days": days,
+            "updated_at": datetime.utcnow(),
+            **cls.derived_fields(merged_plan)
+        }
+        
+        try:
+            result = cls.get_collection().update_one(
+                {"_id": plan_id, "updated_at": plan.get("updated_at")},
+                {"$set": update_data}
+            )
+        except Exception as e:
+            logger.error("批量修改旅行計劃失敗: %s", e)
+            return False, {'message': f'批量修改旅行計劃失敗: {str(e)}', 'error_code': 'update_failed'}
+        
+        if result.matched_count == 0:
+            logger.warning("計劃 %s 在讀取後已被修改，批量修改未提交", plan_id)
+            return False, {'message': '計劃已被其他請求修改，請重新載入後再試', 'error_code': 'conflict'}
+        
+        if "is_public" in fields and bool(fields["is_public"]) != bool(plan.get("is_public")):
+            cls._adjust_counts(plan.get("user_id"), public_delta=1 if fields["is_public"] else -1)
+        
+        invalidate_plan_responses(plan_id, public=bool(plan.get("is_public")) or bool(fields.get("is_public")))
+        
+        logger.info("成功對計劃 %s 應用 %s 個修改操作", plan_id, len(results))
+        return True, {'results': results, 'updated_at': update_data["updated_at"]}
+    
+    @classmethod
+    @traced()
     def delete_plan(cls, plan_id, user_id=None):
         """刪除旅行計劃"""
         if isinstance(plan_id, str):
             try:
                 plan_id = ObjectId(plan_id)
             except:
-                logger.error(f"無效的計劃ID格式: {plan_id}")
+                logger.error("無效的計劃ID格式: %s", plan_id)
                 return False, "無效的計劃ID"
         
         # 如果提供了用戶ID，確保只有計劃擁有者可以刪除
@@ -379,30 +810,44 @@ class TravelPlan:
                 try:
                     user_id = ObjectId(user_id)
                 except:
-                    logger.error(f"無效的用戶ID格式: {user_id}")
+                    logger.error("無效的用戶ID格式: %s", user_id)
                     return False, "無效的用戶ID"
             
-            plan = cls.find_by_id(plan_id)
-            if not plan or plan.get("user_id") != user_id:
-                logger.warning(f"用戶 {user_id} 無權刪除計劃 {plan_id}")
+            plan = cls.get_collection().find_one({"_id": plan_id}, {"user_id": 1})
+            if not plan or str(plan.get("user_id")) != str(user_id):
+                logger.warning("用戶 %s 無權刪除計劃 %s", user_id, plan_id)
                 return False, "無權刪除此計劃"
         
         try:
-            result = cls.get_collection().delete_one({"_id": plan_id})
-            if result.deleted_count > 0:
-                logger.info(f"成功刪除旅行計劃: {plan_id}")
+            deleted = cls.get_collection().find_one_and_delete(
+                {"_id": plan_id},
+                projection={"user_id": 1, "is_public": 1}
+            )
+            if deleted:
+                logger.info("成功刪除旅行計劃: %s", plan_id)
+                cls._adjust_counts(deleted.get("user_id"), user_delta=-1, public_delta=-1 if deleted.get("is_public") else 0)
+                invalidate_plan_responses(plan_id, public=bool(deleted.get("is_public")))
                 return True, None
             return False, "計劃刪除失敗"
         except Exception as e:
-            logger.error(f"刪除旅行計劃失敗: {str(e)}")
+            logger.error("刪除旅行計劃失敗: %s", e)
             return False, f"刪除旅行計劃失敗: {str(e)}"
     
     @classmethod
+    @traced()
     def save_plan_to_file(cls, plan_id, file_path=None):
         """將旅行計劃保存到文件"""
-        plan = cls.find_by_id(plan_id)
+        if isinstance(plan_id, str):
+            try:
+                plan_id = ObjectId(plan_id)
+            except:
+                logger.error("無效的計劃ID格式: %s", plan_id)
+                return False, "無效的計劃ID"
+        
+        # 直接讀取文檔，導出不應觸發 find_by_id 中的活動ID修復寫入
+        plan = cls.get_collection().find_one({"_id": plan_id})
         if not plan:
-            logger.error(f"找不到計劃: {plan_id}")
+            logger.error("找不到計劃: %s", plan_id)
             return False, "找不到計劃"
         
         # 將ObjectId轉換為字符串
@@ -422,13 +867,14 @@ class TravelPlan:
         try:
             with open(file_path, 'w', encoding='utf-8') as f:
                 json.dump(plan, f, ensure_ascii=False, indent=2)
-            logger.info(f"旅行計劃已保存到文件: {file_path}")
+            logger.info("旅行計劃已保存到文件: %s", file_path)
             return True, file_path
         except Exception as e:
-            logger.error(f"保存旅行計劃到文件失敗: {str(e)}")
+            logger.error("保存旅行計劃到文件失敗: %s", e)
             return False, f"保存旅行計劃到文件失敗: {str(e)}"
     
     @classmethod
+    @traced()
     def load_plan_from_file(cls, file_path, user_id=None):
         """從文件加載旅行計劃"""
         try:
@@ -452,5 +898,5 @@ class TravelPlan:
             # 創建新計劃
             return cls.create_plan(user_id, plan_data)
         except Exception as e:
-            logger.error(f"從文件加載旅行計劃失敗: {str(e)}")
+            logger.error("從文件加載旅行計劃失敗: %s", e)
             return None, f"從文件加載旅行計劃失敗: {str(e)}" 
\ No newline at end of file
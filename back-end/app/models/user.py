@@ -1,19 +1,32 @@
 import logging
 import uuid
+from copy import deepcopy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
 from bson.objectid import ObjectId
 
 from app.models.db import get_db
+from app.config.config import get_config
+from app.utils.ttl_cache import TTLCache
+from app.utils.password_hasher import password_hasher, PasswordHasherBusyError
+from app.utils.metrics import register_cache_size
 
 # 設置日誌
 logger = logging.getLogger(__name__)
 
+# 獲取配置
+config = get_config()
+
 class User:
     """用戶模型類"""
     
     collection_name = 'users'
     
+    # 資料緩存不保存密碼哈希
+    PROFILE_PROJECTION = {"password_hash": 0}
+    
+    # 用戶資料緩存 {用戶ID字符串: 用戶文檔}，在 update_profile / change_password 時失效
+    _profile_cache = TTLCache(config.USER_CACHE_SIZE, config.USER_CACHE_SECONDS)
+    
     @classmethod
     def get_collection(cls):
         """獲取用戶集合"""
@@ -24,13 +37,13 @@ class User:
         """創建新用戶"""
         # 檢查郵箱是否已存在
         if cls.find_by_email(email):
-            logger.warning(f"郵箱 {email} 已存在")
+            logger.warning("郵箱 %s 已存在", email)
             return None, "郵箱已存在"
         
         # 創建用戶文檔
         user = {
             "email": email,
-            "password_hash": generate_password_hash(password),
+            "password_hash": password_hasher.hash(password),
             "created_at": datetime.utcnow(),
             "updated_at": datetime.utcnow(),
             "is_active": True,
@@ -44,10 +57,10 @@ class User:
         try:
             result = cls.get_collection().insert_one(user)
             user_id = result.inserted_id
-            logger.info(f"成功創建用戶: {email}, ID: {user_id}")
+            logger.info("成功創建用戶: %s, ID: %s", email, user_id)
             return user_id, None
         except Exception as e:
-            logger.error(f"創建用戶失敗: {str(e)}")
+            logger.error("創建用戶失敗: %s", e)
             return None, f"創建用戶失敗: {str(e)}"
     
     @classmethod
@@ -57,11 +70,36 @@ class User:
             try:
                 user_id = ObjectId(user_id)
             except:
-                logger.error(f"無效的用戶ID格式: {user_id}")
+                logger.error("無效的用戶ID格式: %s", user_id)
                 return None
         
         return cls.get_collection().find_one({"_id": user_id})
     
+    @classmethod
+    def find_profile_by_id(cls, user_id):
+        """通過ID查找用戶資料（不含密碼哈希），結果短時間緩存"""
+        key = str(user_id)
+        user = cls._profile_cache.get(key)
+        if user is not None:
+            return deepcopy(user)
+        
+        try:
+            object_id = user_id if isinstance(user_id, ObjectId) else ObjectId(user_id)
+        except Exception:
+            logger.error("無效的用戶ID格式: %s", user_id)
+            return None
+        
+        user = cls.get_collection().find_one({"_id": object_id}, cls.PROFILE_PROJECTION)
+        if user:
+            cls._profile_cache.set(key, user)
+            return deepcopy(user)
+        return None
+    
+    @classmethod
+    def invalidate_cache(cls, user_id):
+        """使用戶資料緩存失效"""
+        cls._profile_cache.pop(str(user_id))
+    
     @classmethod
     def find_by_email(cls, email):
         """通過郵箱查找用戶"""
@@ -69,16 +107,39 @@ class User:
     
     @classmethod
     def authenticate(cls, email, password):
-        """驗證用戶憑證"""
+        """
+        驗證用戶憑證
+
+        Raises:
+            PasswordHasherBusyError: 密碼哈希服務繁忙
+        """
         user = cls.find_by_email(email)
             
-        if user and check_password_hash(user["password_hash"], password):
-            logger.info(f"用戶 {email} 驗證成功")
+        if user and password_hasher.verify(user["password_hash"], password):
+            logger.info("用戶 %s 驗證成功", email)
+            if password_hasher.needs_rehash(user["password_hash"]):
+                cls.rehash_password(user, password)
             return user
         
-        logger.warning(f"用戶 {email} 驗證失敗")
+        logger.warning("用戶 %s 驗證失敗", email)
         return None
     
+    @classmethod
+    def rehash_password(cls, user, password):
+        """以當前配置的哈希方法和成本重新計算密碼哈希（登錄時透明升級）"""
+        try:
+            password_hash = password_hasher.hash(password)
+            # 僅在哈希未被並發修改時更新，避免覆蓋同時進行的密碼更改
+            cls.get_collection().update_one(
+                {"_id": user["_id"], "password_hash": user["password_hash"]},
+                {"$set": {"password_hash": password_hash}}
+            )
+            user["password_hash"] = password_hash
+            logger.info("用戶 %s 的密碼哈希已升級為 %s", user['email'], password_hasher.method)
+        except Exception as e:
+            # 升級失敗不影響本次登錄，下次登錄時重試
+            logger.warning("升級密碼哈希失敗: %s", e)
+    
     @classmethod
     def update_profile(cls, user_id, profile_data):
         """更新用戶資料"""
@@ -86,7 +147,7 @@ class User:
             try:
                 user_id = ObjectId(user_id)
             except:
-                logger.error(f"無效的用戶ID格式: {user_id}")
+                logger.error("無效的用戶ID格式: %s", user_id)
                 return False
         
         update_data = {
@@ -106,38 +167,50 @@ class User:
                 {"_id": user_id},
                 {"$set": update_data}
             )
+            cls.invalidate_cache(user_id)
             return result.modified_count > 0
         except Exception as e:
-            logger.error(f"更新用戶資料失敗: {str(e)}")
+            logger.error("更新用戶資料失敗: %s", e)
             return False
     
     @classmethod
     def change_password(cls, user_id, current_password, new_password):
-        """更改用戶密碼"""
+        """
+        更改用戶密碼
+
+        Raises:
+            PasswordHasherBusyError: 密碼哈希服務繁忙
+        """
         user = cls.find_by_id(user_id)
         if not user:
-            logger.warning(f"用戶ID不存在: {user_id}")
+            logger.warning("用戶ID不存在: %s", user_id)
             return False, "用戶不存在"
         
         # 驗證當前密碼
-        if not check_password_hash(user["password_hash"], current_password):
-            logger.warning(f"用戶 {user['email']} 當前密碼驗證失敗")
+        if not password_hasher.verify(user["password_hash"], current_password):
+            logger.warning("用戶 %s 當前密碼驗證失敗", user['email'])
             return False, "當前密碼不正確"
         
         try:
             result = cls.get_collection().update_one(
-                {"_id": user_id},
+                {"_id": user["_id"]},
                 {
                     "$set": {
-                        "password_hash": generate_password_hash(new_password),
+                        "password_hash": password_hasher.hash(new_password),
                         "updated_at": datetime.utcnow()
                     }
                 }
             )
+            cls.invalidate_cache(user["_id"])
             if result.modified_count > 0:
-                logger.info(f"用戶 {user['email']} 密碼更改成功")
+                logger.info("用戶 %s 密碼更改成功", user['email'])
                 return True, None
             return False, "密碼更新失敗"
+        except PasswordHasherBusyError:
+            # 交給調用方返回 503，而不是當作更新失敗
+            raise
         except Exception as e:
-            logger.error(f"更改密碼失敗: {str(e)}")
-            return False, f"更改密碼失敗: {str(e)}" 
\ No newline at end of file
+            logger.error("更改密碼失敗: %s", e)
+            return False, f"更改密碼失敗: {str(e)}"
+
+register_cache_size('user_profiles', lambda: len(User._profile_cache))
@@ -0,0 +1,120 @@
+import time
+import hashlib
+import logging
+from functools import wraps
+from typing import Dict, Any
+import jwt
+from flask import request, jsonify, current_app
+from app.config.config import get_config
+from app.utils.ttl_cache import TTLCache
+from app.utils.metrics import register_cache_size
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 已驗證令牌的聲明緩存 {令牌摘要: 聲明}
+_token_cache = TTLCache(config.AUTH_TOKEN_CACHE_SIZE, config.AUTH_TOKEN_CACHE_SECONDS)
+register_cache_size('auth_tokens', lambda: len(_token_cache))
+
+def _token_key(token: str, secret_key: str) -> str:
+    """緩存鍵使用令牌和密鑰的摘要，不在內存中保留原始令牌"""
+    return hashlib.sha256(f"{secret_key}\0{token}".encode('utf-8')).hexdigest()
+
+def verify_token(token: str, secret_key: str) -> Dict[str, Any]:
+    """
+    驗證 JWT 並返回聲明，驗證結果在令牌過期前緩存一段時間
+
+    Args:
+        token: Bearer 令牌
+        secret_key: 簽名密鑰
+
+    Returns:
+        令牌聲明
+
+    Raises:
+        jwt.ExpiredSignatureError: 令牌已過期
+        jwt.InvalidTokenError: 令牌無效
+    """
+    key = _token_key(token, secret_key)
+    claims = _token_cache.get(key)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, secret_key, algorithms=['HS256'])
+
+    # 緩存時間不超過令牌剩餘有效期，過期的令牌不會從緩存中通過驗證
+    ttl = config.AUTH_TOKEN_CACHE_SECONDS
+    if 'exp' in claims:
+        ttl = min(ttl, claims['exp'] - time.time())
+    if ttl > 0:
+        _token_cache.set(key, claims, ttl)
+    return claims
+
+def clear_token_cache():
+    """清空令牌緩存（例如更換密鑰之後）"""
+    _token_cache.clear()
+
+def decode_request_token(token):
+    """驗證令牌，返回 (用戶ID, 錯誤回應)"""
+    try:
+        payload = verify_token(token, current_app.config.get('SECRET_KEY', 'dev_key'))
+        return payload['sub'], None
+    except jwt.ExpiredSignatureError:
+        return None, (jsonify({
+            'success': False,
+            'message': '認證令牌已過期'
+        }), 401)
+    except (jwt.InvalidTokenError, KeyError):
+        return None, (jsonify({
+            'success': False,
+            'message': '無效的認證令牌'
+        }), 401)
+
+def get_bearer_token():
+    """從請求頭讀取 Bearer 令牌，未提供時返回 None"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split(' ')[1]
+
+# 身份驗證裝飾器
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = get_bearer_token()
+        if not token:
+            return jsonify({
+                'success': False,
+                'message': '未提供有效的認證令牌'
+            }), 401
+        
+        # 驗證令牌
+        user_id, error_response = decode_request_token(token)
+        if error_response:
+            return error_response
+        
+        # 將用戶ID添加到請求中
+        request.user_id = user_id
+        return f(*args, **kwargs)
+    
+    return decorated
+
+# 可選身份驗證裝飾器：未提供令牌時以匿名身份繼續，提供了無效令牌則拒絕
+def token_optional(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        request.user_id = None
+        
+        token = get_bearer_token()
+        if token:
+            user_id, error_response = decode_request_token(token)
+            if error_response:
+                return error_response
+            request.user_id = user_id
+        
+        return f(*args, **kwargs)
+    
+    return decorated
@@ -0,0 +1,195 @@
+import gzip
+import json
+import os
+import time
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+from bson import json_util
+from bson.json_util import JSONOptions, JSONMode
+from pymongo.errors import BulkWriteError
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 使用 MongoDB Extended JSON 以便 ObjectId 和 datetime 能夠無損往返
+JSON_OPTIONS = JSONOptions(json_mode=JSONMode.RELAXED, tz_aware=False)
+
+# MongoDB 重複鍵錯誤碼
+DUPLICATE_KEY_ERROR = 11000
+
+def _open_ndjson(path: str, mode: str, compressed: Optional[bool] = None):
+    """按副檔名（或指定的 compressed）打開普通或 gzip 壓縮的 NDJSON 文件"""
+    if compressed is None:
+        compressed = path.endswith('.gz')
+    if compressed:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+def _throughput(count: int, started: float) -> Dict[str, Any]:
+    """生成吞吐量統計"""
+    elapsed = max(time.monotonic() - started, 1e-9)
+    return {
+        "elapsed_seconds": round(elapsed, 3),
+        "docs_per_second": round(count / elapsed, 1)
+    }
+
+def export_plans(collection, path: str, query: Optional[Dict[str, Any]] = None,
+                 batch_size: int = 1000, progress=None) -> Dict[str, Any]:
+    """
+    將旅行計劃以串流方式導出為 NDJSON（.gz 結尾時使用 gzip 壓縮）
+
+    直接迭代數據庫游標逐行寫出，內存佔用只與 batch_size 有關；
+    不經過 find_by_id，因此導出過程不會寫入數據庫。
+
+    Args:
+        collection: 旅行計劃集合
+        path: 輸出文件路徑
+        query: 過濾條件，默認導出全部
+        batch_size: 每次從數據庫讀取的文檔數量
+        progress: 可選回調，參數為已導出數量
+
+    Returns:
+        包含導出數量和吞吐量的統計
+    """
+    started = time.monotonic()
+    exported = 0
+    tmp_path = f"{path}.partial"
+
+    cursor = collection.find(query or {}, no_cursor_timeout=True).sort("_id", 1).batch_size(batch_size)
+    try:
+        with _open_ndjson(tmp_path, 'w', compressed=path.endswith('.gz')) as f:
+            for doc in cursor:
+                f.write(json_util.dumps(doc, json_options=JSON_OPTIONS, ensure_ascii=False))
+                f.write('\n')
+                exported += 1
+                if progress and exported % batch_size == 0:
+                    progress(exported)
+    finally:
+        cursor.close()
+
+    # 寫入完成後再重命名，避免留下不完整的備份文件
+    os.replace(tmp_path, path)
+
+    stats = {"exported": exported, "path": path, **_throughput(exported, started)}
+    logger.info("導出旅行計劃完成: %s", stats)
+    return stats
+
+def _load_checkpoint(checkpoint_path: Optional[str]) -> Tuple[int, Set[int]]:
+    """讀取已處理的行數和其中插入失敗、需要重試的行號"""
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0, set()
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    return int(checkpoint.get("lines_done", 0)), set(checkpoint.get("failed_lines", []))
+
+def _save_checkpoint(checkpoint_path: Optional[str], lines_done: int, failed_lines: Set[int]):
+    """原子地寫入導入進度"""
+    if not checkpoint_path:
+        return
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"lines_done": lines_done, "failed_lines": sorted(failed_lines), "updated_at": time.time()}, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def _insert_batch(collection, batch) -> Tuple[Dict[str, int], List[int]]:
+    """
+    以無序方式批量插入，已存在的文檔（重複鍵）視為跳過
+
+    Returns:
+        (插入、跳過、失敗數量, 失敗文檔在批次中的索引)
+    """
+    try:
+        result = collection.insert_many(batch, ordered=False)
+        return {"inserted": len(result.inserted_ids), "skipped": 0, "failed": 0}, []
+    except BulkWriteError as e:
+        details = e.details
+        errors = details.get("writeErrors", [])
+        failed_indexes = []
+        for error in errors:
+            if error.get("code") != DUPLICATE_KEY_ERROR:
+                logger.error("導入文檔失敗 (索引 %s): %s", error.get('index'), error.get('errmsg'))
+                failed_indexes.append(error.get("index"))
+        return {
+            "inserted": details.get("nInserted", 0),
+            "skipped": len(errors) - len(failed_indexes),
+            "failed": len(failed_indexes)
+        }, failed_indexes
+
+def import_plans(collection, path: str, batch_size: int = 1000,
+                 checkpoint_path: Optional[str] = None, transform=None,
+                 progress=None) -> Dict[str, Any]:
+    """
+    從 NDJSON 文件批量導入旅行計劃
+
+    每批使用 insert_many(ordered=False) 寫入，並在每批完成後記錄檢查點；
+    中斷後使用同一檢查點重新執行會從上次完成的位置繼續。插入失敗（重複鍵以外的錯誤）
+    的行號記錄在檢查點的 failed_lines 中，使用同一檢查點重新執行時會重試這些行。
+    保留原始 _id，因此重複導入同一批數據時已存在的文檔會被跳過。
+
+    Args:
+        collection: 旅行計劃集合
+        path: NDJSON 文件路徑（.gz 結尾時按 gzip 讀取）
+        batch_size: 每批插入的文檔數量
+        checkpoint_path: 檢查點文件路徑，None 表示不記錄進度
+        transform: 可選的文檔轉換函數，返回 None 時跳過該文檔
+        progress: 可選回調，參數為當前統計
+
+    Returns:
+        包含插入、跳過、失敗數量、仍然失敗的行號和吞吐量的統計
+    """
+    started = time.monotonic()
+    lines_done, failed_lines = _load_checkpoint(checkpoint_path)
+    if lines_done:
+        logger.info("從檢查點繼續導入，跳過前 %s 行（重試其中失敗的 %s 行）", lines_done, len(failed_lines))
+
+    stats = {"inserted": 0, "skipped": 0, "failed": 0, "resumed_from": lines_done}
+    batch = []
+    batch_lines = []
+    line_number = 0
+
+    def flush():
+        result, failed_indexes = _insert_batch(collection, batch)
+        for key, value in result.items():
+            stats[key] += value
+        failed_lines.update(batch_lines[index] for index in failed_indexes)
+        _save_checkpoint(checkpoint_path, max(line_number, lines_done), failed_lines)
+        batch.clear()
+        batch_lines.clear()
+        if progress:
+            progress(stats)
+
+    with _open_ndjson(path, 'r') as f:
+        for line_number, line in enumerate(f, start=1):
+            if line_number <= lines_done and line_number not in failed_lines:
+                continue
+            # 重試的行在本批寫入後按結果重新記錄
+            failed_lines.discard(line_number)
+            if not line.strip():
+                continue
+
+            doc = json_util.loads(line, json_options=JSON_OPTIONS)
+            if transform:
+                doc = transform(doc)
+                if doc is None:
+                    stats["skipped"] += 1
+                    continue
+
+            batch.append(doc)
+            batch_lines.append(line_number)
+            if len(batch) >= batch_size:
+                flush()
+
+    if batch:
+        flush()
+    else:
+        _save_checkpoint(checkpoint_path, max(line_number, lines_done), failed_lines)
+
+    processed = stats["inserted"] + stats["skipped"] + stats["failed"]
+    stats["failed_lines"] = sorted(failed_lines)
+    stats.update(_throughput(processed, started))
+    if failed_lines:
+        logger.error("導入旅行計劃完成，仍有 %s 行插入失敗，使用同一檢查點重新執行可重試: %s",
+                     len(failed_lines), stats)
+    else:
+        logger.info("導入旅行計劃完成: %s", stats)
+    return stats
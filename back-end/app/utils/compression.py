@@ -0,0 +1,107 @@
+import gzip
+import zlib
+import logging
+from flask import request
+from app.config.config import get_config
+
+try:
+    import brotli
+except ImportError:  # brotli 為可選依賴，未安裝時只提供 gzip
+    brotli = None
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 值得壓縮的內容類型
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+def supported_encodings():
+    """按優先順序返回服務端支持的編碼"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate_encoding(accept_encodings):
+    """
+    根據 Accept-Encoding 選擇編碼
+
+    Args:
+        accept_encodings: werkzeug 解析後的 Accept-Encoding
+
+    Returns:
+        'br'、'gzip' 或 None（客戶端不接受壓縮）
+    """
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings[encoding]
+        # 同等權重時保留優先順序較高的編碼
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_body(data: bytes, encoding: str) -> bytes:
+    """一次性壓縮完整的響應主體"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=config.COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=config.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def compress_stream(chunks, encoding: str):
+    """逐塊壓縮串流響應，每塊都刷新輸出以保持首字節時間"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config.COMPRESSION_BROTLI_QUALITY)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    # wbits=31 表示輸出 gzip 格式
+    compressor = zlib.compressobj(config.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def _should_compress(response) -> bool:
+    """判斷響應是否需要壓縮"""
+    if request.method == 'HEAD' or response.status_code != 200:
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+def compress_response(response):
+    """after_request 鉤子：按協商結果壓縮響應"""
+    if not _should_compress(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding(request.accept_encodings)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.COMPRESSION_MIN_SIZE:
+            return response
+        response.set_data(compress_body(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    # 壓縮後是不同的表示形式，強 ETag 需要區分（條件請求時會去掉後綴再比較）
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f'{etag}-{encoding}', weak=weak)
+    return response
+
+def init_compression(app):
+    """為應用註冊響應壓縮"""
+    if not config.COMPRESSION_ENABLED:
+        return
+    app.after_request(compress_response)
+    logger.info("已啟用響應壓縮: %s，最小壓縮大小 %s 字節", ', '.join(supported_encodings()), config.COMPRESSION_MIN_SIZE)
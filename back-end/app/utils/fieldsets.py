@@ -0,0 +1,121 @@
+import re
+from typing import Dict, Any, List, Iterable, Optional
+
+# 單次請求允許選擇的欄位數量上限
+MAX_FIELDS = 50
+
+# 可以選擇的計劃頂層欄位（search_tokens 等內部欄位不對外開放）
+PLAN_FIELDS = (
+    'title', 'destination', 'start_date', 'end_date', 'budget', 'travelers',
+    'is_public', 'created_at', 'updated_at', 'version', 'user_id', 'summary', 'days'
+)
+
+# 允許選擇子欄位的頂層欄位
+NESTED_PLAN_FIELDS = ('summary', 'days')
+
+FIELD_PATH_PATTERN = re.compile(r'^[A-Za-z_]+(\.[A-Za-z_]+)*$')
+
+class FieldsetError(ValueError):
+    """無效的欄位選擇"""
+
+def parse_fields(value) -> Optional[List[str]]:
+    """
+    解析 fields / exclude 參數
+
+    Args:
+        value: 逗號分隔的字符串（查詢參數）或字符串列表（請求主體）
+
+    Returns:
+        去重後的欄位路徑列表；未提供時返回 None
+
+    Raises:
+        FieldsetError: 欄位路徑無效或不允許選擇時
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.split(',')
+    if not isinstance(value, list) or not all(isinstance(field, str) for field in value):
+        raise FieldsetError('無效的欄位列表')
+
+    fields = list(dict.fromkeys(field.strip() for field in value if field.strip()))
+    if not fields:
+        return None
+    if len(fields) > MAX_FIELDS:
+        raise FieldsetError(f'一次最多只能選擇 {MAX_FIELDS} 個欄位')
+
+    for field in fields:
+        if not FIELD_PATH_PATTERN.match(field):
+            raise FieldsetError(f'無效的欄位: {field}')
+        top_level = field.split('.', 1)[0]
+        if top_level not in PLAN_FIELDS or ('.' in field and top_level not in NESTED_PLAN_FIELDS):
+            raise FieldsetError(f'不支持的欄位: {field}')
+
+    return _collapse(fields)
+
+def _collapse(fields: Iterable[str]) -> List[str]:
+    """移除已被父路徑涵蓋的子路徑（MongoDB 不允許投影中出現路徑衝突）"""
+    fields = list(fields)
+    return [
+        field for field in fields
+        if not any(field != other and field.startswith(f'{other}.') for other in fields)
+    ]
+
+def get_fieldset_args(args) -> Dict[str, Optional[List[str]]]:
+    """
+    從請求參數中讀取 fields 和 exclude
+
+    Raises:
+        FieldsetError: 參數無效或同時提供兩者時
+    """
+    fields = parse_fields(args.get('fields'))
+    exclude = parse_fields(args.get('exclude'))
+    if fields and exclude:
+        raise FieldsetError('fields 和 exclude 不能同時使用')
+    return {'fields': fields, 'exclude': exclude}
+
+def build_projection(fields: Optional[List[str]] = None, exclude: Optional[List[str]] = None,
+                     required: Iterable[str] = ()) -> Optional[Dict[str, int]]:
+    """
+    將欄位選擇編譯為 MongoDB 投影
+
+    Args:
+        fields: 需要返回的欄位路徑
+        exclude: 需要排除的欄位路徑
+        required: 服務端處理所需的欄位（總是讀取，返回前由 prune_fields 移除）
+
+    Returns:
+        投影字典；未選擇欄位時返回 None（讀取完整文檔）
+    """
+    if fields:
+        return {field: 1 for field in _collapse([*fields, *required])}
+    if exclude:
+        required = set(required)
+        projection = {field: 0 for field in exclude if field not in required}
+        # 內部欄位在排除模式下同樣不返回
+        projection.setdefault('search_tokens', 0)
+        return projection
+    return None
+
+def prune_fields(doc: Dict[str, Any], fields: Optional[List[str]] = None,
+                 exclude: Optional[List[str]] = None, required: Iterable[str] = ()) -> Dict[str, Any]:
+    """移除為服務端處理而額外讀取、但客戶端沒有選擇的頂層欄位"""
+    if fields:
+        requested = {field.split('.', 1)[0] for field in fields}
+        for key in required:
+            if key not in requested:
+                doc.pop(key, None)
+    elif exclude:
+        for key in required:
+            if key in exclude:
+                doc.pop(key, None)
+    doc.pop('search_tokens', None)
+    return doc
+
+def projection_includes(projection: Optional[Dict[str, int]], field: str) -> bool:
+    """判斷投影是否會讀取指定的頂層欄位（或其任一子欄位）"""
+    if projection is None:
+        return True
+    if any(projection.values()):
+        return any(key == field or key.startswith(f'{field}.') for key, value in projection.items() if value)
+    return projection.get(field, 1) != 0
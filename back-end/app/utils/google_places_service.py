@@ -1,31 +1,41 @@
 import requests
 import logging
 import os
+import time
 from typing import Dict, Any, List, Optional
 from app.config.config import get_config
+from app.utils.metrics import stage_timer, observe_stage, register_cache_size
+from app.utils.tracing import span, traced, set_attribute
+from app.utils.places_disk_cache import places_disk_cache, MISSING, SEARCH, DETAILS
 from datetime import datetime
 import uuid
 import re
 
 # 設置日誌
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# 每個景點的詳細日誌使用子日誌記錄器，按 LOG_SAMPLE_RATES 抽樣輸出
+activity_logger = logging.getLogger(f'{__name__}.activity')
 
 # 獲取配置
 config = get_config()
 
 # Google Places API設置
 GOOGLE_PLACES_API_KEY = config.GOOGLE_PLACES_API_KEY
-PLACES_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/textsearch/json"
-PLACES_DETAILS_URL = "https://maps.googleapis.com/maps/api/place/details/json"
-PLACES_PHOTO_URL = "https://maps.googleapis.com/maps/api/place/photo"
+GOOGLE_PLACES_API_URL = config.GOOGLE_PLACES_API_URL.rstrip('/')
+PLACES_SEARCH_URL = f"{GOOGLE_PLACES_API_URL}/textsearch/json"
+PLACES_DETAILS_URL = f"{GOOGLE_PLACES_API_URL}/details/json"
+PLACES_PHOTO_URL = f"{GOOGLE_PLACES_API_URL}/photo"
 
-logger.info(f"Google Places API Key: {GOOGLE_PLACES_API_KEY[:5]}...{GOOGLE_PLACES_API_KEY[-5:]}")
+logger.info("Google Places API Key: %s...%s", GOOGLE_PLACES_API_KEY[:5], GOOGLE_PLACES_API_KEY[-5:])
 
 # 簡單的緩存機制
 place_search_cache = {}  # 用於存儲地點搜索結果
 place_details_cache = {}  # 用於存儲地點詳細信息
 
+register_cache_size('places_search', lambda: len(place_search_cache))
+register_cache_size('places_details', lambda: len(place_details_cache))
+
+@traced('places.is_api_key_valid')
 def is_api_key_valid(max_retries: int = 2) -> bool:
     """
     檢查API金鑰是否有效
@@ -37,7 +47,7 @@ def is_api_key_valid(max_retries: int = 2) -> bool:
         如果API金鑰有效返回True，否則返回False
     """
     # 使用簡單的請求測試API金鑰
-    logger.info(f"開始檢查Google Places API金鑰 {GOOGLE_PLACES_API_KEY[:5]}...{GOOGLE_PLACES_API_KEY[-5:]} 有效性")
+    logger.info("開始檢查Google Places API金鑰 %s...%s 有效性", GOOGLE_PLACES_API_KEY[:5], GOOGLE_PLACES_API_KEY[-5:])
     
     if not GOOGLE_PLACES_API_KEY:
         logger.error("未設置Google Places API金鑰")
@@ -54,33 +64,34 @@ def is_api_key_valid(max_retries: int = 2) -> bool:
                     "key": GOOGLE_PLACES_API_KEY
                 }
                 
-                logger.info(f"嘗試使用地標 '{landmark}' 測試API金鑰 (嘗試 {attempt+1}/{max_retries})")
+                logger.info("嘗試使用地標 '%s' 測試API金鑰 (嘗試 %s/%s)", landmark, attempt+1, max_retries)
                 response = requests.get(PLACES_SEARCH_URL, params=params, timeout=10)  # 添加超時
                 result = response.json()
                 
                 if result.get("status") == "OK":
-                    logger.info(f"API金鑰有效，使用地標 '{landmark}' 成功獲取結果")
+                    logger.info("API金鑰有效，使用地標 '%s' 成功獲取結果", landmark)
                     return True
                 elif result.get("status") == "REQUEST_DENIED":
                     error_message = result.get("error_message", "未知錯誤")
-                    logger.warning(f"API金鑰無效或未授權: {error_message}")
+                    logger.warning("API金鑰無效或未授權: %s", error_message)
                     # 如果明確指出是金鑰問題，立即返回
                     if "API key" in error_message:
                         return False
                 else:
-                    logger.warning(f"API測試回應狀態: {result.get('status')}, 錯誤信息: {result.get('error_message', '無')}")
+                    logger.warning("API測試回應狀態: %s, 錯誤信息: %s", result.get('status'), result.get('error_message', '無'))
             
             except requests.exceptions.Timeout:
-                logger.warning(f"API請求超時，嘗試使用另一個地標")
+                logger.warning("API請求超時，嘗試使用另一個地標")
                 continue
                 
             except Exception as e:
-                logger.error(f"測試API金鑰時發生錯誤: {e}")
+                logger.error("測試API金鑰時發生錯誤: %s", e)
                 continue
     
-    logger.error(f"所有API測試嘗試均失敗，API金鑰可能無效")
+    logger.error("所有API測試嘗試均失敗，API金鑰可能無效")
     return False
 
+@traced('places.search_place')
 def search_place(place_name: str, destination: str) -> Optional[Dict[str, Any]]:
     """
     使用Google Places API搜索地點
@@ -98,10 +109,24 @@ def search_place(place_name: str, destination: str) -> Optional[Dict[str, Any]]:
     
     # 檢查緩存
     if cache_key in place_search_cache:
-        logger.info(f"從緩存中獲取地點搜索結果: {query}")
+        activity_logger.info("從緩存中獲取地點搜索結果: %s", query)
+        observe_stage('places_search', 0.0, result='hit')
+        set_attribute('cache_hit', True)
         return place_search_cache[cache_key]
     
-    logger.info(f"搜索地點: {query}")
+    # 檢查主機本地的磁盤緩存（同一主機的其他工作進程或重啟前寫入的結果）
+    started = time.perf_counter()
+    cached = places_disk_cache.get(SEARCH, cache_key)
+    if cached is not MISSING:
+        activity_logger.info("從磁盤緩存中獲取地點搜索結果: %s", query)
+        observe_stage('places_search', time.perf_counter() - started, result='disk_hit')
+        set_attribute('cache_hit', True)
+        set_attribute('cache_tier', 'disk')
+        place_search_cache[cache_key] = cached
+        return cached
+    
+    activity_logger.info("搜索地點: %s", query)
+    set_attribute('cache_hit', False)
     
     # 設置請求參數
     params = {
@@ -111,29 +136,35 @@ def search_place(place_name: str, destination: str) -> Optional[Dict[str, Any]]:
     
     try:
         # 發送請求
-        logger.info(f"發送請求到: {PLACES_SEARCH_URL}")
-        response = requests.get(PLACES_SEARCH_URL, params=params)
-        response.raise_for_status()
+        activity_logger.info("發送請求到: %s", PLACES_SEARCH_URL)
+        with stage_timer('places_search', result='miss'):
+            response = requests.get(PLACES_SEARCH_URL, params=params)
+            response.raise_for_status()
         
         # 解析回應
         result = response.json()
-        logger.info(f"搜索地點回應狀態: {result.get('status')}")
+        activity_logger.info("搜索地點回應狀態: %s", result.get('status'))
         
         # 檢查是否有結果
         if result["status"] == "OK" and len(result["results"]) > 0:
             # 返回第一個結果
-            logger.info(f"找到地點: {result['results'][0].get('name')}")
+            activity_logger.info("找到地點: %s", result['results'][0].get('name'))
             place_search_cache[cache_key] = result["results"][0]  # 存入緩存
+            places_disk_cache.set(SEARCH, cache_key, result["results"][0])
             return result["results"][0]
         else:
-            logger.warning(f"未找到地點: {query}, 狀態: {result.get('status')}, 錯誤信息: {result.get('error_message', '無')}")
+            logger.warning("未找到地點: %s, 狀態: %s, 錯誤信息: %s", query, result.get('status'), result.get('error_message', '無'))
             place_search_cache[cache_key] = None  # 緩存無結果
+            # 磁盤緩存跨進程和重啟保留，只保存確定無結果的查詢（限流或金鑰錯誤不寫入）
+            if result.get("status") == "ZERO_RESULTS":
+                places_disk_cache.set(SEARCH, cache_key, None)
             return None
             
     except requests.exceptions.RequestException as e:
-        logger.error(f"搜索地點時發生錯誤: {e}")
+        logger.error("搜索地點時發生錯誤: %s", e)
         return None
 
+@traced('places.get_place_details')
 def get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
     """
     使用Google Places API獲取地點詳細資訊
@@ -146,10 +177,24 @@ def get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
     """
     # 檢查緩存
     if place_id in place_details_cache:
-        logger.info(f"從緩存中獲取地點詳細信息: {place_id}")
+        activity_logger.info("從緩存中獲取地點詳細信息: %s", place_id)
+        observe_stage('places_details', 0.0, result='hit')
+        set_attribute('cache_hit', True)
         return place_details_cache[place_id]
     
-    logger.info(f"獲取地點詳細資訊: {place_id}")
+    # 檢查主機本地的磁盤緩存
+    started = time.perf_counter()
+    cached = places_disk_cache.get(DETAILS, place_id)
+    if cached is not MISSING:
+        activity_logger.info("從磁盤緩存中獲取地點詳細信息: %s", place_id)
+        observe_stage('places_details', time.perf_counter() - started, result='disk_hit')
+        set_attribute('cache_hit', True)
+        set_attribute('cache_tier', 'disk')
+        place_details_cache[place_id] = cached
+        return cached
+    
+    activity_logger.info("獲取地點詳細資訊: %s", place_id)
+    set_attribute('cache_hit', False)
     
     # 設置請求參數
     params = {
@@ -160,27 +205,31 @@ def get_place_details(place_id: str) -> Optional[Dict[str, Any]]:
     
     try:
         # 發送請求
-        logger.info(f"發送請求到: {PLACES_DETAILS_URL}")
-        response = requests.get(PLACES_DETAILS_URL, params=params)
-        response.raise_for_status()
+        activity_logger.info("發送請求到: %s", PLACES_DETAILS_URL)
+        with stage_timer('places_details', result='miss'):
+            response = requests.get(PLACES_DETAILS_URL, params=params)
+            response.raise_for_status()
         
         # 解析回應
         result = response.json()
-        logger.info(f"獲取地點詳細資訊回應狀態: {result.get('status')}")
+        activity_logger.info("獲取地點詳細資訊回應狀態: %s", result.get('status'))
         
         # 檢查是否有結果
         if result["status"] == "OK":
             # 返回結果
-            logger.info(f"找到地點詳細資訊: {result['result'].get('name')}")
+            activity_logger.info("找到地點詳細資訊: %s", result['result'].get('name'))
             place_details_cache[place_id] = result["result"]  # 存入緩存
+            places_disk_cache.set(DETAILS, place_id, result["result"])
             return result["result"]
         else:
-            logger.warning(f"未找到地點詳細資訊: {place_id}, 狀態: {result.get('status')}, 錯誤信息: {result.get('error_message', '無')}")
+            logger.warning("未找到地點詳細資訊: %s, 狀態: %s, 錯誤信息: %s", place_id, result.get('status'), result.get('error_message', '無'))
             place_details_cache[place_id] = None  # 緩存無結果
+            if result.get("status") == "NOT_FOUND":
+                places_disk_cache.set(DETAILS, place_id, None)
             return None
             
     except requests.exceptions.RequestException as e:
-        logger.error(f"獲取地點詳細資訊時發生錯誤: {e}")
+        logger.error("獲取地點詳細資訊時發生錯誤: %s", e)
         return None
 
 def get_photo_url(photo_reference: str, max_width: int = 400) -> Optional[str]:
@@ -198,8 +247,8 @@ def get_photo_url(photo_reference: str, max_width: int = 400) -> Optional[str]:
     photo_url = f"{PLACES_PHOTO_URL}?maxwidth={max_width}&photoreference={photo_reference}&key={GOOGLE_PLACES_API_KEY}"
     
     # 為了安全起見，不在日誌中顯示完整URL（包含API金鑰）
-    safe_log_url = f"{PLACES_PHOTO_URL}?maxwidth={max_width}&photoreference={photo_reference[:10]}...&key=**HIDDEN**"
-    logger.info(f"構建照片URL: {safe_log_url}")
+    activity_logger.info("構建照片URL: %s?maxwidth=%s&photoreference=%s...&key=**HIDDEN**",
+                         PLACES_PHOTO_URL, max_width, photo_reference[:10])
     
     return photo_url
 
@@ -314,6 +363,7 @@ def estimate_duration(place_type: str) -> int:
     
     return durations.get(place_type, 90)
 
+@traced('places.enrich_place_info')
 def enrich_place_info(place_name: str, destination: str, lat: float, lng: float, place_type: str, activity_id: str = None) -> Dict[str, Any]:
     """
     豐富景點資訊
@@ -329,20 +379,20 @@ def enrich_place_info(place_name: str, destination: str, lat: float, lng: float,
     Returns:
         包含豐富資訊的景點字典
     """
-    logger.info(f"豐富景點資訊: {place_name}, {destination}")
+    activity_logger.info("豐富景點資訊: %s, %s", place_name, destination)
     
     # 如果沒有提供活動ID，生成一個新的
     if not activity_id:
         activity_id = str(uuid.uuid4())
-        logger.info(f"為活動 '{place_name}' 生成新ID: {activity_id}")
+        activity_logger.info("為活動 '%s' 生成新ID: %s", place_name, activity_id)
     else:
         # 檢查ID是否為有效的UUID格式
         if not re.match(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', activity_id, re.I):
             original_id = activity_id
             activity_id = str(uuid.uuid4())
-            logger.info(f"活動 '{place_name}' 的ID不是有效的UUID格式，已將 {original_id} 替換為 {activity_id}")
+            activity_logger.info("活動 '%s' 的ID不是有效的UUID格式，已將 %s 替換為 %s", place_name, original_id, activity_id)
         else:
-            logger.info(f"使用提供的活動ID: {activity_id} 用於 '{place_name}'")
+            activity_logger.info("使用提供的活動ID: %s 用於 '%s'", activity_id, place_name)
     
     # 初始化豐富的景點資訊
     enriched_place = {
@@ -365,39 +415,39 @@ def enrich_place_info(place_name: str, destination: str, lat: float, lng: float,
     place_result = search_place(place_name, destination)
     
     if place_result:
-        logger.info(f"成功搜索到地點: {place_name}")
+        activity_logger.info("成功搜索到地點: %s", place_name)
         
         # 更新經緯度（使用更準確的值）
         if "geometry" in place_result and "location" in place_result["geometry"]:
             enriched_place["lat"] = place_result["geometry"]["location"]["lat"]
             enriched_place["lng"] = place_result["geometry"]["location"]["lng"]
-            logger.info(f"更新經緯度: {enriched_place['lat']}, {enriched_place['lng']}")
+            activity_logger.info("更新經緯度: %s, %s", enriched_place['lat'], enriched_place['lng'])
         
         # 獲取地點ID
         place_id = place_result.get("place_id")
         enriched_place["place_id"] = place_id
         
         if place_id:
-            logger.info(f"獲取到地點ID: {place_id}")
+            activity_logger.info("獲取到地點ID: %s", place_id)
             
             # 獲取地點詳細資訊
             place_details = get_place_details(place_id)
             
             if place_details:
-                logger.info(f"成功獲取地點詳細資訊: {place_name}")
+                activity_logger.info("成功獲取地點詳細資訊: %s", place_name)
                 
                 # 更新地址
                 enriched_place["address"] = place_details.get("formatted_address")
-                logger.info(f"地址: {enriched_place['address']}")
+                activity_logger.info("地址: %s", enriched_place['address'])
                 
                 # 更新評分
                 enriched_place["rating"] = place_details.get("rating")
-                logger.info(f"評分: {enriched_place['rating']}")
+                activity_logger.info("評分: %s", enriched_place['rating'])
                 
                 # 更新營業時間 (僅如果地點有營業時間)
                 if "opening_hours" in place_details and "weekday_text" in place_details["opening_hours"]:
                     enriched_place["opening_hours"] = place_details["opening_hours"]["weekday_text"]
-                    logger.info(f"營業時間: {enriched_place['opening_hours']}")
+                    activity_logger.info("營業時間: %s", enriched_place['opening_hours'])
                 
                 # 更新照片 (最多三張)
                 if "photos" in place_details:
@@ -409,30 +459,31 @@ def enrich_place_info(place_name: str, destination: str, lat: float, lng: float,
                                 photo_url = get_photo_url(photo_reference)
                                 enriched_place["photos"].append(photo_url)
                                 photo_count += 1
-                                logger.info(f"添加照片 {photo_count}: {photo_url[:50]}...")
+                                activity_logger.info("添加照片 %s: %s...", photo_count, photo_url[:50])
                             except Exception as e:
-                                logger.error(f"獲取照片URL時發生錯誤: {e}")
+                                logger.error("獲取照片URL時發生錯誤: %s", e)
                     
-                    logger.info(f"總共添加照片數量: {photo_count}")
+                    activity_logger.info("總共添加照片數量: %s", photo_count)
                 else:
-                    logger.warning(f"地點無照片資訊: {place_name}")
+                    logger.warning("地點無照片資訊: %s", place_name)
                 
                 # 生成描述 (如果還沒有描述)
                 if not enriched_place.get("description"):
                     enriched_place["description"] = get_place_description(place_name, place_type)
-                    logger.info(f"描述: {enriched_place['description'][:30]}...")
+                    activity_logger.info("描述: %s...", enriched_place['description'][:30])
             else:
-                logger.warning(f"未能獲取地點詳細資訊: {place_name}")
+                logger.warning("未能獲取地點詳細資訊: %s", place_name)
         else:
-            logger.warning(f"未獲取到地點ID: {place_name}")
+            logger.warning("未獲取到地點ID: %s", place_name)
     else:
-        logger.warning(f"未能搜索到地點: {place_name}")
+        logger.warning("未能搜索到地點: %s", place_name)
         # 使用簡單描述
         if not enriched_place.get("description"):
             enriched_place["description"] = get_place_description(place_name, place_type)
     
     return enriched_place
 
+@traced('places.enrich_travel_plan')
 def enrich_travel_plan(travel_plan: Dict[str, Any]) -> Dict[str, Any]:
     """
     豐富整個旅遊計畫
@@ -463,21 +514,17 @@ def enrich_travel_plan(travel_plan: Dict[str, Any]) -> Dict[str, Any]:
         logger.error("旅遊計畫中缺少目的地資訊")
         return travel_plan
     
-    logger.info(f"開始豐富旅遊計畫: {destination}")
+    logger.info("開始豐富旅遊計畫: %s", destination)
     
     # 獲取計畫ID或生成新ID
     plan_id = travel_plan.get("plan_id")
     if not plan_id:
         plan_id = f"plan_{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        logger.info(f"生成新的計畫ID: {plan_id}")
+        logger.info("生成新的計畫ID: %s", plan_id)
     
-    # 處理日期時間值
+    # 日期時間保持為 datetime，由 JSON 提供者在響應時序列化
     created_at = travel_plan.get("created_at", datetime.now())
-    if isinstance(created_at, datetime):
-        created_at = created_at.isoformat()
-    
     updated_at = datetime.now()
-    updated_at_str = updated_at.isoformat()
     
     # 創建新的旅遊計畫結構
     enriched_plan = {
@@ -493,7 +540,7 @@ def enrich_travel_plan(travel_plan: Dict[str, Any]) -> Dict[str, Any]:
         "itinerary_preference": travel_plan.get("itinerary_preference", "輕鬆"),
         "travel_companions": travel_plan.get("travel_companions", "個人"),
         "created_at": created_at,
-        "updated_at": updated_at_str,  # 使用字符串格式
+        "updated_at": updated_at,
         "is_public": travel_plan.get("is_public", False),
         "version": travel_plan.get("version", 1),
         "days": []
@@ -509,104 +556,87 @@ def enrich_travel_plan(travel_plan: Dict[str, Any]) -> Dict[str, Any]:
     try:
         for i, day_data in enumerate(days_data):
             day_number = day_data.get("day", i + 1)
-            logger.info(f"處理第 {day_number} 天行程")
+            activity_logger.info("處理第 %s 天行程", day_number)
+            with span('places.enrich_day', day=day_number) as day_span:
             
-            # 創建新的日程結構
-            enriched_day = {
-                "day": day_number,
-                "date": day_data.get("date", ""),  # 如果原始數據中有日期則使用，否則留空
-                "activities": []
-            }
+                # 創建新的日程結構
+                enriched_day = {
+                    "day": day_number,
+                    "date": day_data.get("date", ""),  # 如果原始數據中有日期則使用，否則留空
+                    "activities": []
+                }
             
-            # 檢查是否使用 activities 或 schedule 結構
-            activities_list = day_data.get("activities", [])
-            if not activities_list and "schedule" in day_data:
-                activities_list = day_data.get("schedule", [])
-                logger.info(f"使用 schedule 結構: {len(activities_list)} 個活動")
-            else:
-                logger.info(f"使用 activities 結構: {len(activities_list)} 個活動")
+                # 檢查是否使用 activities 或 schedule 結構
+                activities_list = day_data.get("activities", [])
+                if not activities_list and "schedule" in day_data:
+                    activities_list = day_data.get("schedule", [])
+                    activity_logger.info("使用 schedule 結構: %s 個活動", len(activities_list))
+                else:
+                    activity_logger.info("使用 activities 結構: %s 個活動", len(activities_list))
             
-            if not activities_list:
-                logger.warning(f"第 {day_number} 天沒有活動資料")
-                enriched_plan["days"].append(enriched_day)
-                continue
+                if not activities_list:
+                    logger.warning("第 %s 天沒有活動資料", day_number)
+                    enriched_plan["days"].append(enriched_day)
+                    continue
             
-            # 遍歷每個景點/活動
-            for j, place in enumerate(activities_list):
-                total_activities += 1
-                place_name = place.get("name", place.get("location", "未知地點"))
-                logger.info(f"處理第 {day_number} 天第 {j+1} 個景點: {place_name}")
+                # 遍歷每個景點/活動
+                for j, place in enumerate(activities_list):
+                    total_activities += 1
+                    place_name = place.get("name", place.get("location", "未知地點"))
+                    activity_logger.info("處理第 %s 天第 %s 個景點: %s", day_number, j+1, place_name)
                 
-                # 檢查活動是否已有ID
-                activity_id = place.get("id")
-                if not activity_id:
-                    activity_id = str(uuid.uuid4())
-                    place["id"] = activity_id
-                    logger.info(f"為活動 '{place_name}' 生成新ID: {activity_id}")
-                    generated_ids += 1
-                elif not re.match(uuid_pattern, activity_id, re.I):
-                    original_id = activity_id
-                    activity_id = str(uuid.uuid4())
-                    place["id"] = activity_id
-                    logger.info(f"替換非UUID格式ID: {original_id} → {activity_id}")
-                    replaced_ids += 1
-                else:
-                    logger.info(f"保留原始UUID: {activity_id}")
-                    preserved_ids += 1
+                    # 檢查活動是否已有ID
+                    activity_id = place.get("id")
+                    if not activity_id:
+                        activity_id = str(uuid.uuid4())
+                        place["id"] = activity_id
+                        activity_logger.info("為活動 '%s' 生成新ID: %s", place_name, activity_id)
+                        generated_ids += 1
+                    elif not re.match(uuid_pattern, activity_id, re.I):
+                        original_id = activity_id
+                        activity_id = str(uuid.uuid4())
+                        place["id"] = activity_id
+                        activity_logger.info("替換非UUID格式ID: %s → %s", original_id, activity_id)
+                        replaced_ids += 1
+                    else:
+                        activity_logger.info("保留原始UUID: %s", activity_id)
+                        preserved_ids += 1
                 
-                try:
-                    # 豐富景點資訊
-                    enriched_place = enrich_place_info(
-                        place_name=place_name,
-                        destination=destination,
-                        lat=place.get("lat", 0),
-                        lng=place.get("lng", 0),
-                        place_type=place.get("type", "景點"),
-                        activity_id=activity_id  # 確保傳遞活動ID
-                    )
+                    try:
+                        # 豐富景點資訊
+                        enriched_place = enrich_place_info(
+                            place_name=place_name,
+                            destination=destination,
+                            lat=place.get("lat", 0),
+                            lng=place.get("lng", 0),
+                            place_type=place.get("type", "景點"),
+                            activity_id=activity_id  # 確保傳遞活動ID
+                        )
                     
-                    # 保留原始的時間和其他可能的欄位
-                    enriched_place["time"] = place.get("time", "未指定時間")
-                    if "description" in place and place["description"]:
-                        enriched_place["description"] = place["description"]
+                        # 保留原始的時間和其他可能的欄位
+                        enriched_place["time"] = place.get("time", "未指定時間")
+                        if "description" in place and place["description"]:
+                            enriched_place["description"] = place["description"]
                     
-                    # 添加到日程中
-                    enriched_day["activities"].append(enriched_place)
-                    logger.info(f"成功添加景點 {place_name} 的豐富資訊，ID: {activity_id}")
-                except Exception as e:
-                    logger.error(f"處理景點 {place_name} 時發生錯誤: {e}")
-                    # 如果豐富失敗，仍添加原始景點資訊，但確保有ID
-                    place["id"] = activity_id
-                    enriched_day["activities"].append(place)
+                        # 添加到日程中
+                        enriched_day["activities"].append(enriched_place)
+                        activity_logger.info("成功添加景點 %s 的豐富資訊，ID: %s", place_name, activity_id)
+                    except Exception as e:
+                        logger.error("處理景點 %s 時發生錯誤: %s", place_name, e)
+                        # 如果豐富失敗，仍添加原始景點資訊，但確保有ID
+                        place["id"] = activity_id
+                        enriched_day["activities"].append(place)
             
-            # 添加到計畫中
-            enriched_plan["days"].append(enriched_day)
-            logger.info(f"完成第 {day_number} 天行程處理，共 {len(enriched_day['activities'])} 個活動")
+                # 添加到計畫中
+                enriched_plan["days"].append(enriched_day)
+                day_span.set_attribute('activities', len(enriched_day['activities']))
+                activity_logger.info("完成第 %s 天行程處理，共 %s 個活動", day_number, len(enriched_day['activities']))
     
     except Exception as e:
-        logger.error(f"豐富旅遊計畫時發生錯誤: {e}")
+        logger.error("豐富旅遊計畫時發生錯誤: %s", e)
         # 發生錯誤時仍然返回部分處理的結果
     
-    logger.info(f"完成豐富旅遊計畫: {destination}，共 {len(enriched_plan['days'])} 天行程，總計 {total_activities} 個活動")
-    logger.info(f"UUID統計 - 保留原始ID: {preserved_ids}, 生成新ID: {generated_ids}, 替換無效ID: {replaced_ids}")
-    
-    # 確保所有datetime對象都被轉換為字符串
-    def convert_datetime(obj):
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                if isinstance(value, datetime):
-                    obj[key] = value.isoformat()
-                elif isinstance(value, dict) or isinstance(value, list):
-                    convert_datetime(value)
-        elif isinstance(obj, list):
-            for i, item in enumerate(obj):
-                if isinstance(item, datetime):
-                    obj[i] = item.isoformat()
-                elif isinstance(item, dict) or isinstance(item, list):
-                    convert_datetime(item)
-        return obj
-    
-    # 處理整個數據結構
-    enriched_plan = convert_datetime(enriched_plan)
+    logger.info("完成豐富旅遊計畫: %s，共 %s 天行程，總計 %s 個活動", destination, len(enriched_plan['days']), total_activities)
+    logger.info("UUID統計 - 保留原始ID: %s, 生成新ID: %s, 替換無效ID: %s", preserved_ids, generated_ids, replaced_ids)
     
     return enriched_plan 
\ No newline at end of file
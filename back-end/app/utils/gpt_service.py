@@ -6,11 +6,14 @@ import logging
 from typing import List, Dict, Any
 from app.config.config import get_config
 from app.utils.google_places_service import enrich_travel_plan
+from app.utils.metrics import stage_timer
+from app.utils.tracing import traced, set_attribute, SPAN_KIND_CLIENT
 import uuid
 
 # 設置日誌
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# 每個活動的詳細日誌使用子日誌記錄器，按 LOG_SAMPLE_RATES 抽樣輸出
+activity_logger = logging.getLogger(f'{__name__}.activity')
 
 # 獲取配置
 config = get_config()
@@ -76,6 +79,7 @@ def create_prompt(destination: str, days: int, budget: str,
     
     return prompt
 
+@traced('openai.call_openai_api', kind=SPAN_KIND_CLIENT)
 def call_openai_api(prompt: str) -> Dict[str, Any]:
     """呼叫OpenAI API生成旅遊計畫"""
     headers = {
@@ -92,12 +96,15 @@ def call_openai_api(prompt: str) -> Dict[str, Any]:
         "temperature": 0.7,
         "max_tokens": 4000
     }
+    set_attribute('openai.model', data["model"])
     
     try:
-        response = requests.post(OPENAI_API_URL, headers=headers, json=data)
-        response.raise_for_status()
+        with stage_timer('gpt_completion'):
+            response = requests.post(OPENAI_API_URL, headers=headers, json=data)
+            response.raise_for_status()
+            result = response.json()
+        set_attribute('openai.total_tokens', result.get("usage", {}).get("total_tokens"))
         
-        result = response.json()
         content = result["choices"][0]["message"]["content"]
         
         # 嘗試從回應中提取JSON
@@ -109,22 +116,25 @@ def call_openai_api(prompt: str) -> Dict[str, Any]:
                 json_str = content[json_start:json_end]
                 return json.loads(json_str)
             else:
-                logger.error(f"無法從回應中找到JSON: {content}")
+                logger.error("無法從回應中找到JSON: %s", content)
                 return {"error": "無法解析回應"}
         except json.JSONDecodeError as e:
-            logger.error(f"JSON解析錯誤: {e}, 原始內容: {content}")
+            logger.error("JSON解析錯誤: %s, 原始內容: %s", e, content)
             return {"error": "無法解析回應", "raw_content": content}
             
     except requests.exceptions.RequestException as e:
-        logger.error(f"API請求錯誤: {e}")
+        logger.error("API請求錯誤: %s", e)
         return {"error": f"API請求錯誤: {str(e)}"}
 
+@traced('gpt.generate_travel_plan')
 def generate_travel_plan(destination: str, start_date: str, end_date: str, 
                         budget: str, interests: List[str], 
                         itinerary_preference: str, travel_companions: str) -> Dict[str, Any]:
     """生成完整的旅遊計畫"""
     # 計算旅行天數
     days = calculate_days(start_date, end_date)
+    set_attribute('destination', destination)
+    set_attribute('days', days)
     
     # 創建提示
     prompt = create_prompt(
@@ -165,7 +175,7 @@ def generate_travel_plan(destination: str, start_date: str, end_date: str,
         "days": [],
     }
     
-    logger.info(f"開始為 '{destination}' 生成 {days} 天的旅行計劃")
+    logger.info("開始為 '%s' 生成 %s 天的旅行計劃", destination, days)
     total_activities = 0
     
     # 處理日程安排
@@ -207,14 +217,14 @@ def generate_travel_plan(destination: str, start_date: str, end_date: str,
                 }
                 
                 # 記錄活動ID的生成
-                logger.info(f"第 {i+1} 天: 為活動 '{activity['name']}' 生成UUID: {activity_id}")
+                activity_logger.info("第 %s 天: 為活動 '%s' 生成UUID: %s", i+1, activity['name'], activity_id)
                 day_activities_count += 1
                 total_activities += 1
                 
                 day["activities"].append(activity)
             
-            logger.info(f"第 {i+1} 天添加了 {day_activities_count} 個活動")
+            activity_logger.info("第 %s 天添加了 %s 個活動", i+1, day_activities_count)
             result["days"].append(day)
     
-    logger.info(f"旅行計劃生成完成: '{destination}' {days} 天行程，共 {total_activities} 個活動")
+    logger.info("旅行計劃生成完成: '%s' %s 天行程，共 %s 個活動", destination, days, total_activities)
     return result 
\ No newline at end of file
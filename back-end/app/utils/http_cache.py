@@ -0,0 +1,73 @@
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional, Iterable, Any
+from flask import request, Response
+
+# 緩存策略：客戶端可以緩存，但每次使用前必須重新驗證
+CACHE_CONTROL_PRIVATE = 'private, no-cache'
+CACHE_CONTROL_PUBLIC = 'public, no-cache'
+
+# 壓縮後的響應在 ETag 後附加的編碼後綴
+ENCODING_ETAG_SUFFIXES = ('-br', '-gzip')
+
+def compute_etag(*parts: Any) -> str:
+    """根據請求路徑、計劃ID和修改時間等版本信息計算強 ETag（不含引號）"""
+    digest = hashlib.sha1()
+    for part in parts:
+        if isinstance(part, datetime):
+            part = part.isoformat()
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'|')
+    return digest.hexdigest()
+
+def compute_list_etag(plans: Iterable[dict], *parts: Any) -> str:
+    """根據列表中每個計劃的ID和修改時間計算 ETag"""
+    versions = [(str(plan.get('_id')), plan.get('updated_at')) for plan in plans]
+    return compute_etag(request.full_path, *parts, *versions)
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """將數據庫中的 UTC naive 時間轉換為帶時區的時間（HTTP 日期精確到秒）"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+def _strip_encoding(etag: str) -> str:
+    """去掉壓縮編碼後綴，使同一資源的各種編碼形式都能匹配"""
+    for suffix in ENCODING_ETAG_SUFFIXES:
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)]
+    return etag
+
+def is_not_modified(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """
+    判斷客戶端緩存是否仍然有效
+
+    If-None-Match 優先；只有未提供時才比較 If-Modified-Since。
+    """
+    if request.if_none_match:
+        if request.if_none_match.star_tag:
+            return True
+        return any(_strip_encoding(tag) == etag for tag in request.if_none_match.as_set(include_weak=True))
+
+    last_modified = _as_utc(last_modified)
+    if request.if_modified_since and last_modified:
+        return last_modified <= request.if_modified_since
+
+    return False
+
+def set_cache_headers(response: Response, etag: str, last_modified: Optional[datetime] = None,
+                      cache_control: str = CACHE_CONTROL_PRIVATE) -> Response:
+    """設置 ETag、Last-Modified 和 Cache-Control 響應頭"""
+    response.set_etag(etag)
+    last_modified = _as_utc(last_modified)
+    if last_modified:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = cache_control
+    return response
+
+def not_modified_response(etag: str, last_modified: Optional[datetime] = None,
+                          cache_control: str = CACHE_CONTROL_PRIVATE) -> Response:
+    """返回不含主體的 304 響應"""
+    return set_cache_headers(Response(status=304), etag, last_modified, cache_control)
@@ -0,0 +1,116 @@
+import json
+import time
+import uuid
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, Optional
+from bson.objectid import ObjectId
+from flask import current_app
+from flask.json.provider import JSONProvider
+from app.utils.metrics import stage_timer, observe_stage
+
+try:
+    import orjson
+except ImportError:  # orjson 為可選依賴，未安裝時使用標準庫
+    orjson = None
+
+# 串流響應時累積到此大小再寫出，避免每個元素一次寫入
+STREAM_CHUNK_SIZE = 16 * 1024
+
+def default(value: Any) -> Any:
+    """序列化 JSON 原生不支持的類型：ObjectId 輸出為字符串，日期時間輸出為 ISO 8601"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    raise TypeError(f"無法序列化類型 {type(value).__name__}")
+
+class FastJSONProvider(JSONProvider):
+    """
+    基於 orjson 的 JSON 提供者
+
+    datetime 和 UUID 由 orjson 原生編碼，ObjectId 通過 default 轉為字符串，
+    視圖函數可以直接返回數據庫文檔中的值而無需逐欄位轉換。
+    日期時間輸出為 ISO 8601（與 datetime.isoformat() 相同），而非 Flask 默認的 HTTP 日期格式。
+    未安裝 orjson 時使用標準庫 json 並保持相同的輸出格式。
+    """
+
+    mimetype = 'application/json'
+    compact = None
+
+    def _indent(self, kwargs) -> bool:
+        """是否輸出縮進格式（調試模式或指定 indent 時）"""
+        indent = kwargs.pop('indent', None)
+        if indent is not None:
+            return bool(indent)
+        return (self.compact is None and self._app.debug) or self.compact is False
+
+    def dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        """序列化為 UTF-8 字節"""
+        indent = self._indent(kwargs)
+        if orjson is not None:
+            option = orjson.OPT_NON_STR_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            return orjson.dumps(obj, default=default, option=option)
+        separators = None if indent else (',', ':')
+        return json.dumps(obj, default=default, ensure_ascii=False,
+                          indent=2 if indent else None, separators=separators).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        kwargs.setdefault('indent', 0)
+        return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        with stage_timer('serialization'):
+            body = self.dumps_bytes(obj) + b'\n'
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+def stream_json(items: Iterable[Any], envelope: Optional[Dict[str, Any]] = None, items_key: str = 'plans'):
+    """
+    以串流方式輸出 JSON，元素在被迭代時才序列化，無需先在內存中構建整個列表
+
+    Args:
+        items: 元素的可迭代對象（例如數據庫游標上的生成器）
+        envelope: 包裹元素的對象欄位，None 表示直接輸出數組
+        items_key: 元素數組在 envelope 中的鍵名
+
+    Returns:
+        串流的 JSON 響應
+    """
+    provider = current_app.json
+    if envelope is None:
+        head, tail = b'[', b']\n'
+    else:
+        fields = provider.dumps_bytes(envelope, indent=0)[:-1]
+        separator = b',' if envelope else b''
+        head = fields + separator + provider.dumps_bytes(items_key, indent=0) + b':['
+        tail = b']}\n'
+
+    def generate():
+        buffer = bytearray(head)
+        first = True
+        # 只累計序列化本身的時間，不包括從游標讀取元素的時間
+        elapsed = 0.0
+        for item in items:
+            if not first:
+                buffer += b','
+            start = time.perf_counter()
+            buffer += provider.dumps_bytes(item, indent=0)
+            elapsed += time.perf_counter() - start
+            first = False
+            if len(buffer) >= STREAM_CHUNK_SIZE:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += tail
+        observe_stage('serialization', elapsed, result='stream')
+        yield bytes(buffer)
+
+    return current_app.response_class(generate(), mimetype=provider.mimetype)
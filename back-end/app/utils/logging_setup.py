@@ -0,0 +1,250 @@
+import re
+import sys
+import copy
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from logging.handlers import QueueHandler, QueueListener
+from typing import List, Tuple
+from flask import g, request
+from app.config.config import get_config
+from app.utils.json_provider import default as json_default
+
+try:
+    import orjson
+except ImportError:  # orjson 為可選依賴，未安裝時使用標準庫
+    orjson = None
+
+# 獲取配置
+config = get_config()
+
+# 當前請求的ID，由 before_request 設置，日誌記錄時讀取
+request_id_var = ContextVar('request_id', default=None)
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._:-]{1,64}$')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+
+# 參數為這些類型時可以安全地延遲到監聽線程再格式化
+IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None), bytes, uuid.UUID, datetime)
+
+# LogRecord 自帶的屬性，其餘屬性視為 extra 欄位輸出
+RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+def parse_sample_rates(value: str) -> List[Tuple[str, float]]:
+    """
+    解析抽樣設置，例如 "app.*.activity=0.05,app.models.db=0.5"
+
+    Returns:
+        [(日誌記錄器名稱模式, 輸出比例)]，按出現順序匹配
+    """
+    rates = []
+    for item in (value or '').split(','):
+        if '=' not in item:
+            continue
+        pattern, rate = item.split('=', 1)
+        rates.append((pattern.strip(), min(max(float(rate), 0.0), 1.0)))
+    return rates
+
+class RequestContextFilter(logging.Filter):
+    """在記錄日誌的線程中附加請求ID（進入隊列之前）"""
+
+    def filter(self, record):
+        # 在請求結束後記錄的日誌可以通過 extra 顯式提供請求ID
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id_var.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """按日誌記錄器名稱抽樣 INFO 及以下的記錄，WARNING 及以上總是輸出"""
+
+    def __init__(self, rates: List[Tuple[str, float]]):
+        super().__init__()
+        self.rates = rates
+        self._cache = {}
+
+    def _rate(self, name: str) -> float:
+        rate = self._cache.get(name)
+        if rate is None:
+            rate = next((rate for pattern, rate in self.rates if fnmatchcase(name, pattern)), 1.0)
+            self._cache[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rate = self._rate(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class JsonFormatter(logging.Formatter):
+    """每條記錄輸出為一行 JSON"""
+
+    def format(self, record):
+        data = {
+            'timestamp': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in RESERVED_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        if orjson is not None:
+            return orjson.dumps(data, default=_safe_default).decode('utf-8')
+        return json.dumps(data, default=_safe_default, ensure_ascii=False)
+
+def _safe_default(value):
+    """extra 欄位中無法序列化的值以字符串輸出，而不是丟失整條日誌"""
+    try:
+        return json_default(value)
+    except TypeError:
+        return str(value)
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    非阻塞的隊列處理器
+
+    請求線程只把記錄放入隊列，格式化和寫出由監聽線程完成；隊列已滿時丟棄記錄並計數，
+    而不是阻塞請求。參數均為不可變類型時保留 msg 和 args，消息在監聽線程中才格式化。
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, IMMUTABLE_ARG_TYPES) for arg in args)):
+            # 可變參數可能在格式化前被修改，立即格式化
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # 異常的堆棧幀在請求線程中格式化，避免在隊列中保留整個調用棧
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class TextFormatter(logging.Formatter):
+    """純文本格式，異常文本可能已在入隊時格式化"""
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = None
+        return super().format(record)
+
+_state = {'listener': None, 'handler': None}
+_lock = threading.Lock()
+
+def _build_formatter():
+    if config.LOG_FORMAT == 'text':
+        return TextFormatter(TEXT_FORMAT)
+    return JsonFormatter()
+
+def setup_logging():
+    """
+    配置根日誌記錄器：隊列處理器 + 後台監聽線程寫出到標準錯誤
+
+    重複調用（例如多次 create_app 或 fork 之後）會替換之前安裝的處理器。
+    """
+    with _lock:
+        _stop_listener()
+        root = logging.getLogger()
+        root.setLevel(config.LOG_LEVEL)
+
+        output = logging.StreamHandler(sys.stderr)
+        output.setFormatter(_build_formatter())
+
+        log_queue = queue.Queue(config.LOG_QUEUE_SIZE)
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(RequestContextFilter())
+        handler.addFilter(SamplingFilter(parse_sample_rates(config.LOG_SAMPLE_RATES)))
+
+        # 移除其他地方（例如 basicConfig）安裝的處理器，避免重複輸出
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+
+        listener = QueueListener(log_queue, output, respect_handler_level=True)
+        listener.start()
+        _state.update(listener=listener, handler=handler)
+
+def _stop_listener():
+    listener = _state['listener']
+    if listener is not None:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+        _state['listener'] = None
+
+def stop_logging():
+    """停止監聽線程並寫出隊列中剩餘的記錄"""
+    with _lock:
+        _stop_listener()
+
+def reset_after_fork():
+    """fork 後監聽線程不存在於子進程中，重新安裝處理器和監聽線程"""
+    _state['listener'] = None
+    setup_logging()
+
+def dropped_records() -> int:
+    """隊列已滿時丟棄的記錄數"""
+    handler = _state['handler']
+    return handler.dropped if handler is not None else 0
+
+def get_request_id():
+    """當前請求的ID（請求上下文之外為 None）"""
+    return request_id_var.get()
+
+def _assign_request_id():
+    incoming = request.headers.get(REQUEST_ID_HEADER, '')
+    request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+    g.request_id = request_id
+    g.request_id_token = request_id_var.set(request_id)
+
+def _add_request_id_header(response):
+    request_id = g.get('request_id')
+    if request_id:
+        response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+def _clear_request_id(exc=None):
+    token = g.pop('request_id_token', None)
+    if token is not None:
+        try:
+            request_id_var.reset(token)
+        except ValueError:
+            # 令牌屬於其他上下文（例如在不同線程中結束請求），直接清除
+            request_id_var.set(None)
+
+def init_logging(app):
+    """配置日誌並為每個請求分配ID（沿用客戶端或上游代理提供的 X-Request-ID）"""
+    setup_logging()
+    app.before_request(_assign_request_id)
+    app.after_request(_add_request_id_header)
+    app.teardown_request(_clear_request_id)
+
+atexit.register(stop_logging)
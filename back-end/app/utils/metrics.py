@@ -0,0 +1,294 @@
+import time
+import logging
+import threading
+from functools import wraps
+from typing import Callable, Dict, Iterable, Tuple
+from flask import g, request, Response, abort
+from app.config.config import get_config
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 延遲直方圖的默認桶（秒），覆蓋從緩存命中到 GPT 生成的範圍
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LOOPBACK_ADDRESSES = ('127.0.0.1', '::1')
+
+def _escape(value) -> str:
+    """轉義標籤值中的反斜線、雙引號和換行"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    """指標基類：按標籤值組合保存數值"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指標 {self.name} 需要標籤 {self.labelnames}，收到 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """返回 (名稱後綴, 標籤名, 標籤值, 數值) 列表"""
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, names, values, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+class Counter(Metric):
+    """只增不減的計數器"""
+
+    type_name = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [('_total', self.labelnames, key, value) for key, value in items]
+
+class Gauge(Metric):
+    """可增可減的當前值；也可以在抓取時通過回調函數讀取"""
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._callbacks = {}
+        if not self.labelnames:
+            self._values[()] = 0
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        """抓取時調用 fn 獲取數值（例如緩存條目數）"""
+        key = self._key(labels)
+        with self._lock:
+            self._callbacks[key] = fn
+
+    def track_inprogress(self, **labels):
+        """裝飾器：函數執行期間數值加一"""
+        def decorator(f):
+            @wraps(f)
+            def decorated(*args, **kwargs):
+                self.inc(**labels)
+                try:
+                    return f(*args, **kwargs)
+                finally:
+                    self.dec(**labels)
+            return decorated
+        return decorator
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            callbacks = list(self._callbacks.items())
+        for key, fn in callbacks:
+            try:
+                values[key] = fn()
+            except Exception as e:
+                logger.warning("讀取指標 %s 失敗: %s", self.name, e)
+        return [('', self.labelnames, key, value) for key, value in values.items()]
+
+class Histogram(Metric):
+    """累積桶直方圖"""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = entry[0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        samples = []
+        names = self.labelnames + ('le',)
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append(('_bucket', names, key + (_format_value(bound),), cumulative))
+            samples.append(('_sum', self.labelnames, key, total))
+            samples.append(('_count', self.labelnames, key, count))
+        return samples
+
+class Registry:
+    """指標註冊表"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """輸出 Prometheus 文本格式"""
+        with self._lock:
+            metrics = list(self._metrics)
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+# 全局註冊表（各工作進程分別統計，每次抓取返回處理該請求的工作進程的數據）
+registry = Registry()
+
+HTTP_REQUESTS = registry.register(Counter(
+    'travo_http_requests', 'HTTP 請求數', ('method', 'endpoint', 'status')))
+HTTP_REQUEST_DURATION = registry.register(Histogram(
+    'travo_http_request_duration_seconds', 'HTTP 請求處理時間（串流響應計算到輸出完成）', ('method', 'endpoint')))
+STAGE_DURATION = registry.register(Histogram(
+    'travo_stage_duration_seconds', '請求內各處理階段的耗時', ('stage', 'result')))
+MONGO_COMMAND_DURATION = registry.register(Histogram(
+    'travo_mongo_command_duration_seconds', 'MongoDB 命令耗時', ('command', 'collection', 'result')))
+MONGO_COMMANDS_PER_REQUEST = registry.register(Histogram(
+    'travo_mongo_commands_per_request', '每個 HTTP 請求執行的 MongoDB 命令數', ('endpoint',),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)))
+GENERATIONS_IN_FLIGHT = registry.register(Gauge(
+    'travo_generations_in_flight', '正在進行的行程生成數'))
+CACHE_ENTRIES = registry.register(Gauge(
+    'travo_cache_entries', '進程內緩存的條目數', ('cache',)))
+
+class StageTimer:
+    """
+    階段計時上下文管理器
+
+    結果標籤默認為 ok，代碼塊拋出異常時為 error，也可以在代碼塊內修改 timer.result。
+    """
+
+    def __init__(self, stage: str, result: str = 'ok'):
+        self.stage = stage
+        self.result = result
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.result = 'error'
+        STAGE_DURATION.observe(time.perf_counter() - self._start, stage=self.stage, result=self.result)
+        return False
+
+def stage_timer(stage: str, result: str = 'ok') -> StageTimer:
+    """記錄一個處理階段的耗時，例如 with stage_timer('gpt_generation'): ..."""
+    return StageTimer(stage, result)
+
+def observe_stage(stage: str, seconds: float, result: str = 'ok'):
+    """直接記錄已測得的階段耗時"""
+    STAGE_DURATION.observe(seconds, stage=stage, result=result)
+
+def register_cache_size(cache: str, fn: Callable[[], float]):
+    """註冊緩存條目數的讀取函數"""
+    CACHE_ENTRIES.set_function(fn, cache=cache)
+
+def request_endpoint() -> str:
+    """當前請求匹配的路由規則，作為指標標籤（未匹配時為 unmatched，避免標籤基數隨 URL 增長）"""
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _start_timer():
+    g.metrics_start = time.perf_counter()
+
+def _record_request(response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+    method = request.method
+    endpoint = request_endpoint()
+    status = str(response.status_code)
+
+    def record():
+        HTTP_REQUESTS.inc(method=method, endpoint=endpoint, status=status)
+        HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method=method, endpoint=endpoint)
+
+    # 串流響應在輸出完成、WSGI 服務器關閉響應時才記錄
+    response.call_on_close(record)
+    return response
+
+def _is_local_request() -> bool:
+    """直接來自本機的請求（經反向代理轉發的請求帶有 X-Forwarded-For，不視為本機）"""
+    return request.remote_addr in LOOPBACK_ADDRESSES and not request.headers.get('X-Forwarded-For')
+
+def check_metrics_access():
+    """
+    檢查運維端點（/metrics、緩存統計）的訪問權限，未授權時中止請求
+
+    設置 METRICS_AUTH_TOKEN 時需要 Bearer 令牌；未設置時只接受本機請求，
+    除非顯式設置 METRICS_PUBLIC。
+    """
+    token = config.METRICS_AUTH_TOKEN
+    if token:
+        if request.headers.get('Authorization') != f'Bearer {token}':
+            abort(401)
+    elif not config.METRICS_PUBLIC and not _is_local_request():
+        abort(404)
+
+def metrics_view():
+    """以 Prometheus 文本格式輸出指標"""
+    check_metrics_access()
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+def init_metrics(app):
+    """為應用註冊請求計數、延遲直方圖和 /metrics 端點"""
+    if not config.METRICS_ENABLED:
+        return
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+    if not config.METRICS_AUTH_TOKEN and not config.METRICS_PUBLIC:
+        logger.info("未設置 METRICS_AUTH_TOKEN，/metrics 只接受本機請求")
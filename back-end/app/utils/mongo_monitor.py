@@ -0,0 +1,166 @@
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict
+from pymongo import monitoring
+from app.config.config import get_config
+from app.utils.metrics import MONGO_COMMAND_DURATION, MONGO_COMMANDS_PER_REQUEST, request_endpoint
+from app.utils.logging_setup import get_request_id
+from app.utils.tracing import tracer, current_span, SPAN_KIND_CLIENT
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 命令名稱與集合名稱不在同一鍵下的命令
+COLLECTION_KEYS = {'getMore': 'collection'}
+
+# 慢操作日誌中記錄形狀的命令欄位
+SHAPE_FIELDS = ('filter', 'query', 'sort', 'projection', 'pipeline', 'key')
+
+# 批量寫入命令中各條語句的查詢條件
+STATEMENT_FIELDS = {'update': ('updates', 'q'), 'delete': ('deletes', 'q')}
+
+# 形狀的最大嵌套深度，超過的部分記錄為 '...'
+MAX_SHAPE_DEPTH = 6
+
+# 當前 HTTP 請求的命令統計，由 before_request 設置
+_request_stats = ContextVar('mongo_request_stats', default=None)
+
+class RequestStats:
+    """單個 HTTP 請求內的命令數和總耗時"""
+
+    __slots__ = ('commands', 'duration_micros')
+
+    def __init__(self):
+        self.commands = 0
+        self.duration_micros = 0
+
+def command_collection(command_name: str, command) -> str:
+    """從命令文檔中讀取集合名稱（例如 {'find': 'travel_plans', ...}）"""
+    value = command.get(COLLECTION_KEYS.get(command_name, command_name))
+    return value if isinstance(value, str) else ''
+
+def redact_shape(value: Any, depth: int = 0) -> Any:
+    """
+    保留查詢的鍵和操作符，將所有值替換為 '?'
+
+    例如 {'user_id': ObjectId(...), 'title': {'$regex': 'abc'}} → {'user_id': '?', 'title': {'$regex': '?'}}
+    """
+    if depth >= MAX_SHAPE_DEPTH:
+        return '...'
+    if isinstance(value, dict):
+        return {key: redact_shape(item, depth + 1) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # 列表只保留不同的元素形狀，例如 $in 的值列表記錄為 ['?']
+        shapes = []
+        for item in value:
+            shape = redact_shape(item, depth + 1)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return '?'
+
+def command_shape(command_name: str, command) -> Dict[str, Any]:
+    """提取命令中的查詢、排序、投影和聚合管道的形狀（不含任何值）"""
+    shape = {}
+    for field in SHAPE_FIELDS:
+        if field in command:
+            value = command[field]
+            # 排序和投影的值是方向或開關，不屬於用戶數據，保留原樣
+            shape[field] = dict(value) if field in ('sort', 'projection') and isinstance(value, dict) else redact_shape(value)
+    if command_name in STATEMENT_FIELDS:
+        statements_key, query_key = STATEMENT_FIELDS[command_name]
+        statements = command.get(statements_key) or []
+        shape[statements_key] = redact_shape([statement.get(query_key, {}) for statement in statements])
+        shape['statements'] = len(statements)
+    if command_name == 'insert':
+        shape['documents'] = len(command.get('documents') or [])
+    return shape
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    MongoDB 命令監控
+
+    記錄每個命令按命令和集合分類的耗時；超過 MONGO_SLOW_OP_MS 的命令記錄慢操作日誌，
+    其中查詢只記錄形狀（值已脫敏）；在 HTTP 請求內執行的命令累計到該請求的統計中，
+    啟用追蹤時為每個命令記錄一個子 span。
+    """
+
+    def __init__(self):
+        # 開始事件才帶有命令文檔，完成事件按 (連接, 請求ID) 找回
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        span = None
+        if tracer.enabled and current_span() is not None:
+            span = tracer.start_span(f'mongodb.{event.command_name}', SPAN_KIND_CLIENT)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (event.command, span)
+
+    def _finish(self, event, result: str):
+        with self._lock:
+            command, span = self._pending.pop((event.connection_id, event.request_id), ({}, None))
+        collection = command_collection(event.command_name, command)
+        if span is not None:
+            span.set_attribute('db.system', 'mongodb')
+            span.set_attribute('db.operation', event.command_name)
+            span.set_attribute('db.mongodb.collection', collection)
+            if result == 'error':
+                span.set_error(str(getattr(event, 'failure', '')))
+            span.end()
+        MONGO_COMMAND_DURATION.observe(event.duration_micros / 1e6, command=event.command_name,
+                                       collection=collection, result=result)
+
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.duration_micros += event.duration_micros
+
+        duration_ms = event.duration_micros / 1000
+        if config.MONGO_SLOW_OP_MS >= 0 and duration_ms >= config.MONGO_SLOW_OP_MS:
+            logger.warning("MongoDB 慢操作: %s %s 耗時 %.1f ms，結果: %s，形狀: %s",
+                           event.command_name, collection, duration_ms, result,
+                           command_shape(event.command_name, command),
+                           extra={'mongo_command': event.command_name, 'mongo_collection': collection,
+                                  'duration_ms': round(duration_ms, 1)})
+
+    def succeeded(self, event):
+        self._finish(event, 'ok')
+
+    def failed(self, event):
+        self._finish(event, 'error')
+
+# 全局命令監聽器，創建 MongoClient 時註冊
+command_monitor = CommandMonitor()
+
+def _start_request_stats():
+    _request_stats.set(RequestStats())
+
+def _record_request_stats(response):
+    stats = _request_stats.get()
+    if stats is None:
+        return response
+    endpoint = request_endpoint()
+    request_id = get_request_id()
+
+    def record():
+        # 串流響應在輸出過程中仍可能讀取游標，輸出完成後才記錄
+        _request_stats.set(None)
+        MONGO_COMMANDS_PER_REQUEST.observe(stats.commands, endpoint=endpoint)
+        threshold = config.MONGO_REQUEST_OPS_WARN
+        if threshold > 0 and stats.commands >= threshold:
+            logger.warning("請求 %s 執行了 %s 個 MongoDB 命令，總耗時 %.1f ms",
+                           endpoint, stats.commands, stats.duration_micros / 1000,
+                           extra={'request_id': request_id})
+
+    response.call_on_close(record)
+    return response
+
+def init_mongo_monitoring(app):
+    """為每個 HTTP 請求統計 MongoDB 命令數"""
+    app.before_request(_start_request_stats)
+    app.after_request(_record_request_stats)
@@ -0,0 +1,107 @@
+import base64
+import json
+from datetime import datetime
+from typing import Dict, Any, Optional
+from bson.objectid import ObjectId
+
+# 每頁數量上限（請求的 limit 超過時按上限返回，不報錯）
+MAX_PAGE_LIMIT = 100
+
+class InvalidCursorError(ValueError):
+    """無效的分頁游標"""
+
+def encode_cursor(doc: Dict[str, Any], score_field: Optional[str] = None) -> str:
+    """
+    根據當前頁最後一個文檔生成不透明的分頁游標
+
+    Args:
+        doc: 當前頁最後一個文檔（需包含 created_at 和 _id）
+        score_field: 相關度排序時使用的分數欄位
+
+    Returns:
+        URL 安全的 base64 字符串
+    """
+    payload = {
+        "c": doc["created_at"].isoformat(),
+        "i": str(doc["_id"])
+    }
+    if score_field:
+        payload["s"] = doc.get(score_field, 0)
+
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: str) -> Dict[str, Any]:
+    """解析分頁游標，返回 created_at、_id 以及可選的分數"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        cursor = {
+            "created_at": datetime.fromisoformat(payload["c"]),
+            "_id": ObjectId(payload["i"])
+        }
+        if "s" in payload:
+            cursor["score"] = int(payload["s"])
+        return cursor
+    except Exception:
+        raise InvalidCursorError("無效的分頁游標")
+
+def keyset_filter(cursor: Dict[str, Any]) -> Dict[str, Any]:
+    """生成 (created_at, _id) 降序排列下「下一頁」的查詢條件"""
+    return {
+        "$or": [
+            {"created_at": {"$lt": cursor["created_at"]}},
+            {"created_at": cursor["created_at"], "_id": {"$lt": cursor["_id"]}}
+        ]
+    }
+
+def scored_keyset_filter(cursor: Dict[str, Any], score_field: str) -> Dict[str, Any]:
+    """生成 (分數, created_at, _id) 降序排列下「下一頁」的查詢條件"""
+    score = cursor.get("score", 0)
+    return {
+        "$or": [
+            {score_field: {"$lt": score}},
+            {score_field: score, "created_at": {"$lt": cursor["created_at"]}},
+            {score_field: score, "created_at": cursor["created_at"], "_id": {"$lt": cursor["_id"]}}
+        ]
+    }
+
+def get_pagination_args(args) -> Dict[str, Any]:
+    """
+    從請求參數中解析分頁設置
+
+    提供 cursor 時使用游標分頁（忽略 page），否則退回 page/limit 分頁。
+
+    Raises:
+        InvalidCursorError: 游標無效時
+        ValueError: page 或 limit 不是整數時
+    """
+    page = max(int(args.get('page', 1)), 1)
+    limit = min(max(int(args.get('limit', 10)), 1), MAX_PAGE_LIMIT)
+
+    cursor_token = args.get('cursor')
+    cursor = decode_cursor(cursor_token) if cursor_token else None
+
+    return {
+        "page": page,
+        "limit": limit,
+        "skip": 0 if cursor else (page - 1) * limit,
+        "cursor": cursor
+    }
+
+def split_page(docs, limit: int, score_field: Optional[str] = None):
+    """
+    將多查詢一筆的結果切分為當前頁和下一頁游標
+
+    Args:
+        docs: 以 limit + 1 查詢得到的文檔列表
+        limit: 每頁數量
+
+    Returns:
+        (當前頁文檔, 下一頁游標或None)
+    """
+    if len(docs) <= limit:
+        return docs, None
+
+    page_docs = docs[:limit]
+    return page_docs, encode_cursor(page_docs[-1], score_field)
@@ -0,0 +1,125 @@
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.config.config import get_config
+from app.utils.tracing import traced
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+class PasswordHasherBusyError(RuntimeError):
+    """等待中的哈希任務已達上限"""
+
+class PasswordHasher:
+    """
+    密碼哈希服務
+
+    哈希計算刻意消耗大量 CPU，在請求線程中執行會長時間持有 GIL 並阻塞同一工作進程的其他請求，
+    因此交給有界進程池執行。等待中的任務數超過 PASSWORD_HASH_MAX_PENDING 時立即拒絕，
+    而不是讓請求無限排隊。PASSWORD_HASH_WORKERS 為 0 時在當前線程中執行。
+    """
+
+    def __init__(self):
+        self._executor = None
+        self._slots = None
+        self._method = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """丟棄進程池（fork 後在子進程中調用，進程池在首次使用時重新創建）"""
+        with self._lock:
+            self._executor = None
+            self._slots = None
+
+    def shutdown(self):
+        """關閉進程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # 使用 spawn 避免在多線程的工作進程中 fork
+                self._executor = ProcessPoolExecutor(
+                    max_workers=config.PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+                self._slots = threading.BoundedSemaphore(config.PASSWORD_HASH_MAX_PENDING)
+                logger.info("已創建密碼哈希進程池，進程數: %s", config.PASSWORD_HASH_WORKERS)
+            return self._executor, self._slots
+
+    def _run(self, fn, *args):
+        """在進程池中執行哈希函數並等待結果"""
+        if config.PASSWORD_HASH_WORKERS <= 0:
+            return fn(*args)
+
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            logger.warning("密碼哈希隊列已滿，拒絕請求")
+            raise PasswordHasherBusyError("密碼哈希服務繁忙")
+        try:
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError):
+            slots.release()
+            logger.error("密碼哈希進程池不可用，已重建並在當前線程中執行")
+            self.reset()
+            return fn(*args)
+        future.add_done_callback(lambda _: slots.release())
+
+        try:
+            return future.result(timeout=config.PASSWORD_HASH_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            logger.error("密碼哈希超時（%s 秒）", config.PASSWORD_HASH_TIMEOUT_SECONDS)
+            raise PasswordHasherBusyError("密碼哈希服務繁忙")
+        except BrokenProcessPool:
+            logger.error("密碼哈希進程異常退出，已重建並在當前線程中執行")
+            self.reset()
+            return fn(*args)
+
+    @property
+    def method(self) -> str:
+        """
+        完整的哈希方法字符串（例如 scrypt:32768:8:1），用於判斷已存儲的哈希是否需要更新。
+        配置中省略的參數由 Werkzeug 補全默認值。
+        """
+        if self._method is None:
+            sample = generate_password_hash('', method=config.PASSWORD_HASH_METHOD, salt_length=1)
+            self._method = sample.split('$', 1)[0]
+        return self._method
+
+    @traced('password_hasher.hash')
+    def hash(self, password: str) -> str:
+        """
+        按配置的方法和成本計算密碼哈希
+
+        Raises:
+            PasswordHasherBusyError: 哈希隊列已滿或超時
+        """
+        return self._run(generate_password_hash, password,
+                         config.PASSWORD_HASH_METHOD, config.PASSWORD_HASH_SALT_LENGTH)
+
+    @traced('password_hasher.verify')
+    def verify(self, password_hash: str, password: str) -> bool:
+        """
+        驗證密碼
+
+        Raises:
+            PasswordHasherBusyError: 哈希隊列已滿或超時
+        """
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """已存儲的哈希方法或成本與當前配置不一致時返回 True"""
+        return password_hash.split('$', 1)[0] != self.method
+
+# 全局密碼哈希服務實例
+password_hasher = PasswordHasher()
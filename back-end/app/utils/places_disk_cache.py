@@ -0,0 +1,216 @@
+"""
+主機本地的 Google Places 共享緩存
+
+同一主機上的所有工作進程共用一個 SQLite 文件（WAL 模式，讀取經 mmap），
+位於進程內字典和 Places API 之間：進程內未命中時先查磁盤，磁盤也未命中才請求 API，
+結果同時寫入兩層。文件在重啟和重新部署後保留，新的工作進程從第一個請求開始即可命中。
+後台線程定期清除過期條目、限制條目數並截斷 WAL 文件；多個進程通過元數據表協調，
+每個間隔只有一個進程執行清理。
+"""
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from typing import Any, Dict, Optional
+from app.config.config import get_config
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+SEARCH = 'search'
+DETAILS = 'details'
+
+# 未命中的標記（None 是緩存的「無結果」）
+MISSING = object()
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS places ("
+    " kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL NOT NULL,"
+    " PRIMARY KEY (kind, key)) WITHOUT ROWID",
+    "CREATE INDEX IF NOT EXISTS places_expires_at ON places (expires_at)",
+    "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL NOT NULL)"
+)
+
+class PlacesDiskCache:
+    """
+    以 SQLite 文件實現的跨進程 Places 緩存
+
+    每個線程使用自己的連接（SQLite 連接不能跨線程共用），fork 後按進程ID重新連接。
+    讀寫出錯時記錄警告並視為未命中，不影響請求。
+    """
+
+    def __init__(self, path: str, ttl: float, negative_ttl: float, max_entries: int,
+                 compact_interval: float, mmap_bytes: int):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.compact_interval = compact_interval
+        self.mmap_bytes = mmap_bytes
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._initialized_pid = None
+        self._compactor = None
+        self._compactor_pid = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    def _connect(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == pid:
+            return connection
+
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory and self._initialized_pid != pid:
+                os.makedirs(directory, exist_ok=True)
+            # 自動提交模式，寫入各自成為一個短事務
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA mmap_size={int(self.mmap_bytes)}")
+            if self._initialized_pid != pid:
+                for statement in SCHEMA:
+                    connection.execute(statement)
+                self._initialized_pid = pid
+        self._local.connection = connection
+        self._local.pid = pid
+        self._ensure_compactor()
+        return connection
+
+    def get(self, kind: str, key: str) -> Any:
+        """返回未過期的值（可能是 None），未命中時返回 MISSING"""
+        if not self.enabled:
+            return MISSING
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM places WHERE kind = ? AND key = ? AND expires_at > ?",
+                (kind, key, time.time())
+            ).fetchone()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("讀取 Places 磁盤緩存失敗: %s", e)
+            return MISSING
+        if row is None:
+            return MISSING
+        try:
+            return json.loads(row[0])
+        except ValueError as e:
+            # 條目損壞（例如寫入中途被截斷）時視為未命中，重新請求後會被覆蓋
+            logger.warning("Places 磁盤緩存條目 %s/%s 無法解析: %s", kind, key, e)
+            return MISSING
+
+    def set(self, kind: str, key: str, value: Optional[Dict[str, Any]]):
+        """寫入條目；value 為 None 時按較短的無結果有效期保存"""
+        if not self.enabled:
+            return
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        try:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO places (kind, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (kind, key, json.dumps(value, ensure_ascii=False, separators=(',', ':')), time.time() + ttl)
+            )
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("寫入 Places 磁盤緩存失敗: %s", e)
+
+    def compact(self, force: bool = False) -> Optional[Dict[str, int]]:
+        """
+        清除過期條目、按到期時間淘汰超出上限的條目並截斷 WAL 文件
+
+        距上次清理（任一進程）不足一個間隔時跳過並返回 None，force 為 True 時總是執行。
+        """
+        if not self.enabled:
+            return None
+        now = time.time()
+        try:
+            connection = self._connect()
+            # 立即取得寫鎖，避免多個進程同時判斷為需要清理
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT value FROM meta WHERE name = 'compacted_at'").fetchone()
+                if not force and row is not None and now - row[0] < self.compact_interval:
+                    connection.execute("ROLLBACK")
+                    return None
+                expired = connection.execute("DELETE FROM places WHERE expires_at <= ?", (now,)).rowcount
+                evicted = 0
+                if self.max_entries > 0:
+                    excess = connection.execute("SELECT COUNT(*) FROM places").fetchone()[0] - self.max_entries
+                    if excess > 0:
+                        evicted = connection.execute(
+                            "DELETE FROM places WHERE (kind, key) IN "
+                            "(SELECT kind, key FROM places ORDER BY expires_at LIMIT ?)",
+                            (excess,)
+                        ).rowcount
+                connection.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('compacted_at', ?)", (now,))
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("清理 Places 磁盤緩存失敗: %s", e)
+            return None
+        if expired or evicted:
+            logger.info("Places 磁盤緩存清理完成：過期 %s 條，淘汰 %s 條", expired, evicted)
+        return {'expired': expired, 'evicted': evicted}
+
+    def _ensure_compactor(self):
+        """每個進程在首次使用時啟動後台清理線程（fork 後的子進程重新啟動）"""
+        if self.compact_interval <= 0 or self._compactor_pid == os.getpid():
+            return
+        with self._lock:
+            if self._compactor_pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._compactor = threading.Thread(target=self._run_compactor, args=(self._stop,),
+                                               name='places-disk-cache-compactor', daemon=True)
+            self._compactor_pid = os.getpid()
+            self._compactor.start()
+
+    def _run_compactor(self, stop: threading.Event):
+        while not stop.wait(self.compact_interval):
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Places 磁盤緩存清理線程出錯")
+
+    def stats(self) -> Dict[str, Any]:
+        """條目數和文件大小"""
+        if not self.enabled:
+            return {'enabled': False}
+        try:
+            entries = dict(self._connect().execute("SELECT kind, COUNT(*) FROM places GROUP BY kind").fetchall())
+        except (sqlite3.Error, OSError) as e:
+            logger.warning("讀取 Places 磁盤緩存統計失敗: %s", e)
+            entries = {}
+        size = sum(os.path.getsize(path) for path in (self.path, f'{self.path}-wal') if os.path.exists(path))
+        return {'enabled': True, 'path': self.path, 'entries': entries, 'bytes': size}
+
+    def reset(self):
+        """丟棄當前進程的連接和清理線程（例如 fork 後），下次使用時重新創建"""
+        self._stop.set()
+        with self._lock:
+            self._local = threading.local()
+            self._compactor = None
+            self._compactor_pid = None
+            self._initialized_pid = None
+
+# 應用內共用的 Places 磁盤緩存（未設置路徑時不啟用）
+places_disk_cache = PlacesDiskCache(
+    path=config.PLACES_DISK_CACHE_PATH,
+    ttl=config.PLACES_DISK_CACHE_TTL_SECONDS,
+    negative_ttl=config.PLACES_DISK_CACHE_NEGATIVE_TTL_SECONDS,
+    max_entries=config.PLACES_DISK_CACHE_MAX_ENTRIES,
+    compact_interval=config.PLACES_DISK_CACHE_COMPACT_SECONDS,
+    mmap_bytes=config.PLACES_DISK_CACHE_MMAP_BYTES
+)
@@ -0,0 +1,191 @@
+import re
+import uuid
+from typing import Dict, Any, List, Optional
+
+# 單次請求允許的操作數量上限
+MAX_PATCH_OPERATIONS = 200
+
+# 可以通過 update_plan 操作修改的計劃欄位
+PATCHABLE_PLAN_FIELDS = ('title', 'destination', 'start_date', 'end_date', 'budget', 'travelers', 'is_public')
+
+UUID_PATTERN = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I)
+
+class PlanPatchError(ValueError):
+    """批量修改操作無效"""
+
+    def __init__(self, message: str, op_index: Optional[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.op_index = op_index
+
+def _day_activities(days: List[Dict[str, Any]], day_index) -> List[Dict[str, Any]]:
+    """獲取指定天數的活動列表並驗證索引"""
+    if not isinstance(day_index, int) or day_index < 0 or day_index >= len(days):
+        raise PlanPatchError(f'無效的日期索引: {day_index}，有效範圍: 0-{len(days)-1}')
+    return days[day_index].setdefault('activities', [])
+
+def _find_activity(days: List[Dict[str, Any]], activity_id):
+    """按ID查找活動，返回 (天數索引, 活動索引)"""
+    if not activity_id:
+        raise PlanPatchError('缺少 activity_id')
+    for day_index, day in enumerate(days):
+        for activity_index, activity in enumerate(day.get('activities', [])):
+            if activity.get('id') == activity_id:
+                return day_index, activity_index
+    raise PlanPatchError(f'找不到ID為 {activity_id} 的活動')
+
+def _insert_at(items: List[Any], item: Any, position):
+    """按位置插入，未指定位置時追加到末尾"""
+    if position is None:
+        items.append(item)
+        return
+    if not isinstance(position, int) or position < 0 or position > len(items):
+        raise PlanPatchError(f'無效的插入位置: {position}')
+    items.insert(position, item)
+
+def _ensure_activity_id(activity: Dict[str, Any]) -> str:
+    """確保新活動有有效的UUID"""
+    activity_id = activity.get('id')
+    if not activity_id or activity_id == 'undefined' or not UUID_PATTERN.match(str(activity_id)):
+        activity['id'] = str(uuid.uuid4())
+    return activity['id']
+
+def _renumber_days(days: List[Dict[str, Any]]):
+    """天數增刪或重排後重新編號"""
+    for index, day in enumerate(days):
+        day['day'] = index + 1
+
+def _add_activity(plan, op):
+    activity = op.get('activity')
+    if not isinstance(activity, dict):
+        raise PlanPatchError('缺少 activity')
+    activity = dict(activity)
+    activity_id = _ensure_activity_id(activity)
+    _insert_at(_day_activities(plan['days'], op.get('day_index')), activity, op.get('position'))
+    return {'activity_id': activity_id}
+
+def _update_activity(plan, op):
+    fields = op.get('fields')
+    if not isinstance(fields, dict):
+        raise PlanPatchError('缺少 fields')
+    day_index, activity_index = _find_activity(plan['days'], op.get('activity_id'))
+    activity = plan['days'][day_index]['activities'][activity_index]
+    # 活動ID不可修改
+    activity.update({key: value for key, value in fields.items() if key != 'id'})
+    return {'activity_id': activity['id']}
+
+def _move_activity(plan, op):
+    day_index, activity_index = _find_activity(plan['days'], op.get('activity_id'))
+    target = _day_activities(plan['days'], op.get('to_day_index', day_index))
+    activity = plan['days'][day_index]['activities'].pop(activity_index)
+    _insert_at(target, activity, op.get('position'))
+    return {'activity_id': activity['id']}
+
+def _reorder_activities(plan, op):
+    activities = _day_activities(plan['days'], op.get('day_index'))
+    order = op.get('order')
+    current_ids = [activity.get('id') for activity in activities]
+    if None in current_ids or len(set(current_ids)) != len(current_ids):
+        raise PlanPatchError('該天存在缺少ID或ID重複的活動，無法重新排序')
+    if not isinstance(order, list) or not all(isinstance(activity_id, str) for activity_id in order):
+        raise PlanPatchError('order 必須是活動ID字符串的列表')
+    if len(set(order)) != len(order) or set(order) != set(current_ids):
+        raise PlanPatchError('order 必須包含該天所有活動的ID且不能重複')
+    by_id = {activity['id']: activity for activity in activities}
+    activities[:] = [by_id[activity_id] for activity_id in order]
+    return {}
+
+def _delete_activity(plan, op):
+    day_index, activity_index = _find_activity(plan['days'], op.get('activity_id'))
+    deleted = plan['days'][day_index]['activities'].pop(activity_index)
+    return {'activity_id': deleted.get('id'), 'day_index': day_index, 'activity_index': activity_index}
+
+def _add_day(plan, op):
+    day = op.get('day') or {}
+    if not isinstance(day, dict):
+        raise PlanPatchError('day 必須是對象')
+    activities = day.get('activities', [])
+    if not isinstance(activities, list) or not all(isinstance(activity, dict) for activity in activities):
+        raise PlanPatchError('day.activities 必須是活動對象的列表')
+    activities = [dict(activity) for activity in activities]
+    activity_ids = [_ensure_activity_id(activity) for activity in activities]
+    if len(set(activity_ids)) != len(activity_ids):
+        raise PlanPatchError('day.activities 中的活動ID不能重複')
+    day = {'date': day.get('date', ''), 'activities': activities}
+    _insert_at(plan['days'], day, op.get('position'))
+    _renumber_days(plan['days'])
+    return {'day_index': plan['days'].index(day)}
+
+def _delete_day(plan, op):
+    day_index = op.get('day_index')
+    _day_activities(plan['days'], day_index)
+    plan['days'].pop(day_index)
+    _renumber_days(plan['days'])
+    return {}
+
+def _reorder_days(plan, op):
+    order = op.get('order')
+    # bool 是 int 的子類，需要排除；混合類型直接排序會拋出 TypeError
+    if (not isinstance(order, list)
+            or not all(isinstance(index, int) and not isinstance(index, bool) for index in order)
+            or sorted(order) != list(range(len(plan['days'])))):
+        raise PlanPatchError('order 必須是所有天數索引的排列')
+    plan['days'][:] = [plan['days'][index] for index in order]
+    _renumber_days(plan['days'])
+    return {}
+
+def _update_plan(plan, op):
+    fields = op.get('fields')
+    if not isinstance(fields, dict) or not fields:
+        raise PlanPatchError('缺少 fields')
+    invalid = [key for key in fields if key not in PATCHABLE_PLAN_FIELDS]
+    if invalid:
+        raise PlanPatchError(f'不可修改的欄位: {", ".join(invalid)}')
+    plan['fields'].update(fields)
+    return {}
+
+OPERATIONS = {
+    'add_activity': _add_activity,
+    'update_activity': _update_activity,
+    'move_activity': _move_activity,
+    'reorder_activities': _reorder_activities,
+    'delete_activity': _delete_activity,
+    'add_day': _add_day,
+    'delete_day': _delete_day,
+    'reorder_days': _reorder_days,
+    'update_plan': _update_plan
+}
+
+def apply_operations(days: List[Dict[str, Any]], operations: List[Dict[str, Any]]):
+    """
+    按順序將批量修改操作應用到計劃的行程上
+
+    Args:
+        days: 計劃的日程列表（會被原地修改，調用方應傳入副本）
+        operations: 操作列表，每個操作包含 op 欄位，例如
+            {"op": "move_activity", "activity_id": "...", "to_day_index": 1, "position": 0}
+
+    Returns:
+        (修改後的計劃欄位, 每個操作的結果列表)
+
+    Raises:
+        PlanPatchError: 任一操作無效時，整批操作都不會被提交
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PlanPatchError('缺少 operations')
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise PlanPatchError(f'一次最多只能提交 {MAX_PATCH_OPERATIONS} 個操作')
+
+    plan = {'days': days, 'fields': {}}
+    results = []
+    for index, op in enumerate(operations):
+        handler = OPERATIONS.get(op.get('op')) if isinstance(op, dict) else None
+        if handler is None:
+            raise PlanPatchError(f'不支持的操作: {op.get("op") if isinstance(op, dict) else op}', index)
+        try:
+            results.append({'op': op['op'], **handler(plan, op)})
+        except PlanPatchError as e:
+            e.op_index = index
+            raise
+
+    return plan['fields'], results
@@ -0,0 +1,234 @@
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import pstats
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from flask import g, request
+from app.config.config import get_config
+from app.utils.logging_setup import get_request_id
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 按需分析的請求頭和查詢參數（值為分析模式）；令牌只接受請求頭，避免出現在訪問日誌和瀏覽器歷史中
+PROFILE_HEADER = 'X-Profile'
+PROFILE_TOKEN_HEADER = 'X-Profile-Token'
+PROFILE_QUERY_PARAM = 'profile'
+
+# 分析模式：sample 定時採樣調用棧，開銷低；cprofile 記錄每次函數調用，結果精確但會明顯拖慢請求
+MODE_SAMPLE = 'sample'
+MODE_CPROFILE = 'cprofile'
+MODES = (MODE_SAMPLE, MODE_CPROFILE)
+
+# 項目根目錄，棧幀中的文件路徑相對它輸出
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(BASE_DIR):
+        filename = os.path.relpath(filename, BASE_DIR)
+    else:
+        # 第三方庫只保留 site-packages 之後的部分
+        index = filename.find('site-packages')
+        if index >= 0:
+            filename = filename[index + len('site-packages') + 1:]
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'
+
+def collapse_stack(frame) -> str:
+    """將棧幀轉換為 collapsed 格式（從外到內以分號連接）"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+class StackSampler:
+    """
+    調用棧採樣器
+
+    後台線程每隔 interval 秒讀取目標線程的當前棧幀並計數，
+    目標線程本身不受影響，開銷只取決於採樣頻率。
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+class RequestProfile:
+    """一個請求的分析：採樣調用棧，cprofile 模式下同時記錄確定性分析"""
+
+    def __init__(self, mode: str, reason: str):
+        self.mode = mode
+        self.reason = reason
+        self.started_at = datetime.now()
+        self.start = time.perf_counter()
+        self.sampler = StackSampler(threading.get_ident(), config.PROFILING_INTERVAL_MS / 1000)
+        self.profiler = cProfile.Profile() if mode == MODE_CPROFILE else None
+        self.finished = False
+
+    def begin(self):
+        self.sampler.start()
+        if self.profiler is not None:
+            self.profiler.enable()
+
+    def finish(self, method: str, path: str, endpoint: str, status: int, request_id: str) -> str:
+        """停止分析並寫出文件，返回文件名前綴"""
+        if self.finished:
+            return ''
+        self.finished = True
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.sampler.stop()
+        duration = time.perf_counter() - self.start
+
+        name = '{}-{}-{}-{}'.format(self.started_at.strftime('%Y%m%dT%H%M%S'), method,
+                                    endpoint.strip('/').replace('/', '_').replace('<', '').replace('>', '') or 'root',
+                                    request_id or os.urandom(4).hex())
+        base = os.path.join(config.PROFILING_DIR, name)
+        os.makedirs(config.PROFILING_DIR, exist_ok=True)
+
+        # collapsed 格式可直接用 flamegraph.pl、speedscope 或 inferno 生成火焰圖
+        with open(f'{base}.collapsed', 'w', encoding='utf-8') as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        if self.profiler is not None:
+            pstats.Stats(self.profiler).dump_stats(f'{base}.prof')
+
+        metadata = {
+            'request_id': request_id,
+            'method': method,
+            'path': path,
+            'endpoint': endpoint,
+            'status': status,
+            'mode': self.mode,
+            'reason': self.reason,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(duration * 1000, 1),
+            'interval_ms': config.PROFILING_INTERVAL_MS,
+            'samples': self.sampler.samples,
+        }
+        with open(f'{base}.json', 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False, indent=2)
+
+        logger.info("已寫出請求分析: %s（%s，%.1f ms，%s 個樣本）",
+                    base, self.mode, duration * 1000, self.sampler.samples)
+        _prune_profiles()
+        return name
+
+def _prune_profiles():
+    """只保留最近 PROFILING_MAX_FILES 個分析，刪除更早的文件"""
+    limit = config.PROFILING_MAX_FILES
+    if limit <= 0:
+        return
+    try:
+        names = sorted({entry.rsplit('.', 1)[0] for entry in os.listdir(config.PROFILING_DIR)
+                        if entry.endswith(('.collapsed', '.prof', '.json'))})
+        for name in names[:-limit]:
+            for suffix in ('.collapsed', '.prof', '.json'):
+                path = os.path.join(config.PROFILING_DIR, name + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+    except OSError as e:
+        logger.warning("清理分析文件失敗: %s", e)
+
+def _requested_mode():
+    """
+    按需分析的模式；未請求或令牌不正確時返回 None
+
+    未設置 PROFILING_TOKEN 時不接受按需分析，避免任何人都能拖慢服務或讀取調用棧。
+    """
+    mode = request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_PARAM)
+    if not mode:
+        return None
+    token = config.PROFILING_TOKEN
+    provided = request.headers.get(PROFILE_TOKEN_HEADER, '')
+    if not token or not hmac.compare_digest(provided.encode('utf-8'), token.encode('utf-8')):
+        logger.warning("拒絕未授權的分析請求: %s %s", request.method, request.path)
+        return None
+    mode = mode.lower()
+    return mode if mode in MODES else config.PROFILING_MODE
+
+def _endpoint() -> str:
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _start_profile():
+    mode = _requested_mode()
+    reason = 'on_demand'
+    if mode is None:
+        if config.PROFILING_SAMPLE_RATE <= 0 or random.random() >= config.PROFILING_SAMPLE_RATE:
+            return
+        # 持續抽樣的請求總是使用低開銷的採樣模式
+        mode, reason = MODE_SAMPLE, 'sampled'
+    profile = RequestProfile(mode, reason)
+    g.request_profile = profile
+    profile.begin()
+
+def _finish_profile(response):
+    profile = g.pop('request_profile', None)
+    if profile is None:
+        return response
+    method = request.method
+    path = request.path
+    endpoint = _endpoint()
+    status = response.status_code
+    request_id = get_request_id()
+
+    def finish():
+        try:
+            profile.finish(method, path, endpoint, status, request_id)
+        except Exception as e:
+            logger.error("寫出請求分析失敗: %s", e)
+
+    if profile.reason == 'on_demand':
+        response.headers['X-Profile-ID'] = request_id or ''
+    # 串流響應輸出完成後才停止分析，結果包含響應體的生成
+    response.call_on_close(finish)
+    return response
+
+def _abandon_profile(exc=None):
+    # 未經過 after_request（例如未處理的異常）時在這裡停止，避免採樣線程洩漏
+    profile = g.pop('request_profile', None)
+    if profile is not None:
+        try:
+            profile.finish(request.method, request.path, _endpoint(), 500, get_request_id())
+        except Exception as e:
+            logger.error("寫出請求分析失敗: %s", e)
+
+def init_profiling(app):
+    """按需（帶令牌的請求頭或查詢參數）或按比例分析請求"""
+    if not config.PROFILING_ENABLED:
+        return
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
+    app.teardown_request(_abandon_profile)
+    logger.info("已啟用請求分析，輸出目錄 %s，持續抽樣比例 %s", config.PROFILING_DIR, config.PROFILING_SAMPLE_RATE)
@@ -0,0 +1,359 @@
+import re
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from functools import wraps
+from typing import Tuple
+from flask import request, jsonify, make_response
+from app.config.config import get_config
+
+try:
+    import redis
+except ImportError:  # Redis 為可選依賴，未安裝時各工作進程各自限流
+    redis = None
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 限流算法
+SLIDING_WINDOW = 'sliding_window'
+TOKEN_BUCKET = 'token_bucket'
+
+WINDOW_UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+LIMIT_PATTERN = re.compile(r'^\s*(\d+)\s*/\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+# available 為 False 表示共享存儲不可用、本次請求沒有計數（是否放行由 RATE_LIMIT_FAIL_OPEN 決定）
+RateLimitResult = namedtuple('RateLimitResult', 'allowed limit remaining reset_after retry_after available',
+                             defaults=(True,))
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """
+    解析限流設置，例如 "10/hour"、"5/minute"、"100/10minutes"
+
+    Returns:
+        (請求數, 窗口秒數)
+
+    Raises:
+        ValueError: 格式無效，或請求數、窗口長度不是正數時（例如 "0/minute"）
+    """
+    match = LIMIT_PATTERN.match(value)
+    if not match:
+        raise ValueError(f"無效的限流設置: {value}")
+    count, multiplier, unit = match.groups()
+    count, window = int(count), int(multiplier or 1) * WINDOW_UNITS[unit]
+    if count <= 0 or window <= 0:
+        raise ValueError(f"限流的請求數和窗口長度必須大於 0: {value}")
+    return count, window
+
+class LocalRateLimitStore:
+    """進程內的限流計數，未配置共享存儲時使用（多工作進程時實際上限為設置值乘以進程數）"""
+
+    backend = 'local'
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def sliding_window(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, int, int]:
+        """滑動窗口計數，返回 (是否允許, 當前窗口計數, 上一窗口計數)"""
+        index = int(now // window)
+        weight = 1 - (now - index * window) / window
+        with self._lock:
+            entry_index, current, previous = self._entries.get(key, (index, 0, 0))
+            if entry_index != index:
+                previous = current if entry_index == index - 1 else 0
+                current = 0
+            if previous * weight + current + 1 > limit:
+                self._put(key, (index, current, previous))
+                return False, current, previous
+            current += 1
+            self._put(key, (index, current, previous))
+            return True, current, previous
+
+    def token_bucket(self, key: str, capacity: int, rate: float, now: float) -> Tuple[bool, float]:
+        """令牌桶，返回 (是否允許, 剩餘令牌數)"""
+        with self._lock:
+            tokens, updated_at = self._entries.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._put(key, (tokens, now))
+            return allowed, tokens
+
+# 兩個腳本都在 Redis 中原子執行，避免多個工作進程同時讀寫同一計數
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+if previous * tonumber(ARGV[2]) + current + 1 > tonumber(ARGV[1]) then
+    return {0, current, previous}
+end
+current = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return {1, current, previous}
+"""
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {allowed, tostring(tokens)}
+"""
+
+class RedisRateLimitStore:
+    """Redis 共享限流計數，所有工作進程和實例共用同一上限"""
+
+    backend = 'redis'
+
+    def __init__(self, url: str, prefix: str):
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._sliding_window = self._client.register_script(SLIDING_WINDOW_SCRIPT)
+        self._token_bucket = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def sliding_window(self, key: str, limit: int, window: int, now: float) -> Tuple[bool, int, int]:
+        index = int(now // window)
+        weight = 1 - (now - index * window) / window
+        allowed, current, previous = self._sliding_window(
+            keys=[f'{self.prefix}:{key}:{index}', f'{self.prefix}:{key}:{index - 1}'],
+            args=[limit, weight, window * 2]
+        )
+        return bool(allowed), int(current), int(previous)
+
+    def token_bucket(self, key: str, capacity: int, rate: float, now: float) -> Tuple[bool, float]:
+        allowed, tokens = self._token_bucket(
+            keys=[f'{self.prefix}:{key}'],
+            args=[capacity, rate, now, math.ceil(capacity / rate)]
+        )
+        return bool(allowed), float(tokens)
+
+class RateLimiter:
+    """
+    限流器
+
+    滑動窗口按當前窗口計數加上一窗口的加權計數判斷，適合登錄這類需要穩定上限的路由；
+    令牌桶允許短時間的突發請求並按固定速率恢復，適合生成這類偶爾連續調用的路由。
+    共享存儲出錯時不改用進程內計數（多工作進程時上限會悄悄變為設置值乘以進程數），
+    而是按 RATE_LIMIT_FAIL_OPEN 放行或拒絕請求，並按指數退避重試共享存儲。
+    """
+
+    # 共享存儲出錯後的重試間隔（秒）
+    RETRY_MIN_SECONDS = 1
+    RETRY_MAX_SECONDS = 30
+
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._create_store()
+        return self._store
+
+    @staticmethod
+    def _create_store():
+        url = config.RATE_LIMIT_REDIS_URL
+        if url:
+            if redis is None:
+                logger.warning("已設置 RATE_LIMIT_REDIS_URL 但未安裝 redis 套件，使用進程內限流")
+            else:
+                logger.info("限流使用 Redis 共享存儲")
+                return RedisRateLimitStore(url, config.RATE_LIMIT_PREFIX)
+        return LocalRateLimitStore(config.RATE_LIMIT_MAX_KEYS)
+
+    def reset(self):
+        """丟棄當前存儲（例如 fork 後），下次使用時重新創建"""
+        with self._lock:
+            self._store = None
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def _mark_unavailable(self, error: Exception):
+        """共享存儲出錯後暫停使用，按指數退避安排下次重試"""
+        with self._lock:
+            self._failures += 1
+            delay = min(self.RETRY_MIN_SECONDS * 2 ** (self._failures - 1), self.RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay
+        logger.warning("限流共享存儲不可用，%s 秒內%s請求: %s",
+                       delay, '不限流放行' if config.RATE_LIMIT_FAIL_OPEN else '拒絕', error)
+
+    def _ensure_available(self) -> bool:
+        """共享存儲是否可用；退避結束後只讓一個請求重試"""
+        if not self._failures:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            if now < self._retry_at:
+                return False
+            self._retry_at = now + self.RETRY_MIN_SECONDS
+        return True
+
+    def _unavailable_result(self, limit: int) -> RateLimitResult:
+        """共享存儲不可用時的結果，等到下次重試時間"""
+        retry_after = max(self._retry_at - time.monotonic(), 0)
+        return RateLimitResult(config.RATE_LIMIT_FAIL_OPEN, limit, 0, retry_after, retry_after, False)
+
+    def hit(self, key: str, limit: int, window: int, algorithm: str = SLIDING_WINDOW) -> RateLimitResult:
+        """
+        記錄一次請求並判斷是否超出上限
+
+        Args:
+            key: 限流鍵（路由名稱和客戶端標識）
+            limit: 窗口內允許的請求數（令牌桶容量）
+            window: 窗口秒數（令牌桶完全恢復所需秒數）
+            algorithm: SLIDING_WINDOW 或 TOKEN_BUCKET
+        """
+        if not self._ensure_available():
+            return self._unavailable_result(limit)
+
+        now = time.time()
+        try:
+            if algorithm == TOKEN_BUCKET:
+                result = self._token_bucket(key, limit, window, now)
+            else:
+                result = self._sliding_window(key, limit, window, now)
+        except Exception as e:
+            self._mark_unavailable(e)
+            return self._unavailable_result(limit)
+
+        if self._failures:
+            with self._lock:
+                self._failures = 0
+            logger.info("限流共享存儲已恢復")
+        return result
+
+    def _sliding_window(self, key, limit, window, now) -> RateLimitResult:
+        allowed, current, previous = self.store.sliding_window(key, limit, window, now)
+        elapsed = now % window
+        weight = 1 - elapsed / window
+        remaining = max(0, math.floor(limit - previous * weight - current))
+        reset_after = window - elapsed
+
+        retry_after = 0
+        if not allowed:
+            if current + 1 > limit:
+                # 本窗口已滿：等到下一窗口中本窗口計數的權重降到足夠低
+                retry_after = reset_after + window * (1 - (limit - 1) / current)
+            else:
+                # 等到上一窗口計數的權重降到足夠低
+                retry_after = window * (1 - (limit - current - 1) / previous) - elapsed
+        return RateLimitResult(allowed, limit, remaining, reset_after, max(retry_after, 0))
+
+    def _token_bucket(self, key, capacity, window, now) -> RateLimitResult:
+        rate = capacity / window
+        allowed, tokens = self.store.token_bucket(key, capacity, rate, now)
+        retry_after = 0 if allowed else (1 - tokens) / rate
+        return RateLimitResult(allowed, capacity, math.floor(tokens), (capacity - tokens) / rate, retry_after)
+
+# 全局限流器實例
+rate_limiter = RateLimiter()
+
+def init_rate_limit(app):
+    """啟動時檢查共享存儲配置，缺少 redis 套件時提前警告而不是等到第一次請求"""
+    if config.RATE_LIMIT_ENABLED and config.RATE_LIMIT_REDIS_URL and redis is None:
+        logger.warning("已設置 RATE_LIMIT_REDIS_URL 但無法導入 redis 套件（pip install redis），"
+                       "各工作進程將各自計數，實際上限為設置值乘以進程數")
+
+def get_client_ip() -> str:
+    """客戶端 IP；RATE_LIMIT_TRUSTED_PROXIES 指定部署在幾層反向代理之後"""
+    proxies = config.RATE_LIMIT_TRUSTED_PROXIES
+    if proxies > 0:
+        route = request.access_route
+        if len(route) >= proxies and request.headers.get('X-Forwarded-For'):
+            return route[-proxies]
+    return request.remote_addr or 'unknown'
+
+def get_rate_limit_key(name: str) -> str:
+    """已登錄用戶按用戶ID限流，匿名請求按客戶端 IP 限流"""
+    user_id = getattr(request, 'user_id', None)
+    if user_id:
+        return f'{name}:user:{user_id}'
+    return f'{name}:ip:{get_client_ip()}'
+
+def set_rate_limit_headers(response, result: RateLimitResult, window: int):
+    """設置 IETF RateLimit 標準響應頭"""
+    response.headers['RateLimit-Limit'] = str(result.limit)
+    response.headers['RateLimit-Remaining'] = str(result.remaining)
+    response.headers['RateLimit-Reset'] = str(math.ceil(result.reset_after))
+    response.headers['RateLimit-Policy'] = f'{result.limit};w={window}'
+    return response
+
+def rate_limit(name: str, limit: str, algorithm: str = SLIDING_WINDOW):
+    """
+    路由限流裝飾器（需要按用戶限流時放在 token_required 之後）
+
+    Args:
+        name: 限流名稱，不同路由的計數互不影響
+        limit: 限流設置，例如 "10/hour"；為空時不限流
+        algorithm: SLIDING_WINDOW 或 TOKEN_BUCKET
+    """
+    parsed = parse_limit(limit) if limit else None
+
+    def decorator(f):
+        if parsed is None:
+            return f
+        count, window = parsed
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not config.RATE_LIMIT_ENABLED:
+                return f(*args, **kwargs)
+
+            key = get_rate_limit_key(name)
+            result = rate_limiter.hit(key, count, window, algorithm)
+            if not result.available:
+                # 沒有計數，不返回 RateLimit 響應頭
+                if result.allowed:
+                    return f(*args, **kwargs)
+                response = jsonify({
+                    'success': False,
+                    'message': '服務暫時不可用，請稍後再試'
+                })
+                response.status_code = 503
+                response.headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+                return response
+
+            if not result.allowed:
+                logger.warning("請求超出限流: %s", key)
+                response = jsonify({
+                    'success': False,
+                    'message': '請求過於頻繁，請稍後再試'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+                return set_rate_limit_headers(response, result, window)
+
+            response = make_response(f(*args, **kwargs))
+            return set_rate_limit_headers(response, result, window)
+
+        return decorated
+    return decorator
@@ -0,0 +1,356 @@
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Dict, Any, Optional, Tuple
+from flask import request, make_response, Response
+from app.config.config import get_config
+from app.utils.http_cache import is_not_modified, not_modified_response
+from app.utils.metrics import register_cache_size
+from app.models.db import primary_reads
+
+try:
+    import redis
+except ImportError:  # Redis 為可選依賴，未安裝時使用進程內緩存
+    redis = None
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# 緩存命名空間：公開列表，以及每個計劃的詳情
+PUBLIC_LIST_NAMESPACE = 'public_plans'
+
+# 所有命名空間共用的世代，用於整體失效（例如批量導入之後）
+GLOBAL_NAMESPACE = '*'
+
+# 隨緩存內容一起保存並在命中時恢復的響應頭
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Cache-Control',
+                  'X-Total-Count', 'X-Next-Cursor')
+
+STAT_NAMES = ('hits', 'misses', 'stores', 'invalidations')
+
+def plan_namespace(plan_id) -> str:
+    """計劃詳情的緩存命名空間"""
+    return f'plan:{plan_id}'
+
+class LocalCacheStore:
+    """進程內的 LRU 緩存，未配置共享存儲時使用（各工作進程各自緩存和失效）"""
+
+    backend = 'local'
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._stats = dict.fromkeys(STAT_NAMES, 0)
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: int):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, *namespaces: str) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(namespace, 0) for namespace in namespaces)
+
+    def bump_generation(self, namespace: str):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            # 舊世代的條目已無法命中，立即清理以釋放內存
+            if namespace == GLOBAL_NAMESPACE:
+                self._entries.clear()
+                return
+            prefix = f'{namespace}|'
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+    def incr_stat(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, 'entries': len(self._entries)}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+class RedisCacheStore:
+    """Redis 共享緩存，所有工作進程共用條目、失效世代和命中統計"""
+
+    backend = 'redis'
+
+    def __init__(self, url: str, prefix: str):
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+    def _key(self, name: str) -> str:
+        return f'{self.prefix}:{name}'
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._client.get(self._key(f'entry:{key}'))
+
+    def set(self, key: str, value: bytes, ttl: int):
+        self._client.set(self._key(f'entry:{key}'), value, ex=ttl)
+
+    def generations(self, *namespaces: str) -> Tuple[int, ...]:
+        values = self._client.mget([self._key(f'gen:{namespace}') for namespace in namespaces])
+        return tuple(int(value or 0) for value in values)
+
+    def bump_generation(self, namespace: str):
+        # 舊世代的條目不再被讀取，由 TTL 自然過期
+        self._client.incr(self._key(f'gen:{namespace}'))
+
+    def incr_stat(self, name: str):
+        self._client.hincrby(self._key('stats'), name, 1)
+
+    def stats(self) -> Dict[str, int]:
+        raw = self._client.hgetall(self._key('stats'))
+        stats = dict.fromkeys(STAT_NAMES, 0)
+        stats.update({key.decode(): int(value) for key, value in raw.items()})
+        return stats
+
+class ResponseCache:
+    """
+    預先序列化的響應緩存
+
+    鍵由命名空間的當前世代、請求路徑和規範化的查詢參數組成；失效時只需
+    遞增命名空間世代，無需枚舉或刪除舊鍵。
+
+    共享存儲出錯時不改用進程內副本（其他進程的失效無法到達，會持續返回舊內容），
+    而是暫停緩存、直接執行視圖，並按指數退避重試。恢復後先整體失效一次，
+    因為不可用期間的失效可能沒有寫入共享存儲。
+    """
+
+    RETRY_MIN_SECONDS = 1
+    RETRY_MAX_SECONDS = 30
+
+    def __init__(self):
+        self._store = None
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._retry_at = 0.0
+
+    @property
+    def store(self):
+        if self._store is None:
+            with self._lock:
+                if self._store is None:
+                    self._store = self._create_store()
+        return self._store
+
+    @staticmethod
+    def _create_store():
+        url = config.RESPONSE_CACHE_REDIS_URL
+        if url:
+            if redis is None:
+                logger.warning("已設置 RESPONSE_CACHE_REDIS_URL 但未安裝 redis 套件，使用進程內響應緩存")
+            else:
+                logger.info("響應緩存使用 Redis 共享存儲")
+                return RedisCacheStore(url, config.RESPONSE_CACHE_PREFIX)
+        return LocalCacheStore(config.RESPONSE_CACHE_MAX_ENTRIES)
+
+    def reset(self):
+        """丟棄當前存儲（例如 fork 後），下次使用時重新創建"""
+        with self._lock:
+            self._store = None
+            self._failures = 0
+            self._retry_at = 0.0
+
+    def _mark_unavailable(self, error: Exception):
+        """共享存儲出錯後暫停使用緩存，按指數退避安排下次重試"""
+        with self._lock:
+            self._failures += 1
+            delay = min(self.RETRY_MIN_SECONDS * 2 ** (self._failures - 1), self.RETRY_MAX_SECONDS)
+            self._retry_at = time.monotonic() + delay
+        logger.warning("響應緩存共享存儲不可用，%s 秒內不使用緩存: %s", delay, error)
+
+    def _ensure_available(self) -> bool:
+        """共享存儲是否可用；退避結束後重試，恢復時整體失效一次"""
+        if not self._failures:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        try:
+            self.store.bump_generation(GLOBAL_NAMESPACE)
+        except Exception as e:
+            self._mark_unavailable(e)
+            return False
+        with self._lock:
+            self._failures = 0
+        logger.info("響應緩存共享存儲已恢復，已使所有舊條目失效")
+        return True
+
+    @staticmethod
+    def normalize_args(args) -> str:
+        """將查詢參數排序並統一大小寫，使等價的請求共用同一條目"""
+        items = []
+        for key, value in args.items(multi=True):
+            value = value.strip()
+            if value.lower() in ('true', 'false'):
+                value = value.lower()
+            if value:
+                items.append(f'{key}={value}')
+        return '&'.join(sorted(items))
+
+    def build_key(self, namespace: str, path: str, args) -> Optional[str]:
+        """返回緩存鍵；共享存儲不可用時返回 None（本次請求不使用緩存）"""
+        if not self._ensure_available():
+            return None
+        try:
+            global_generation, generation = self.store.generations(GLOBAL_NAMESPACE, namespace)
+        except Exception as e:
+            self._mark_unavailable(e)
+            return None
+        return f'{namespace}|{global_generation}.{generation}|{path}?{self.normalize_args(args)}'
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+        try:
+            value = self.store.get(key)
+            self.store.incr_stat('hits' if value is not None else 'misses')
+        except Exception as e:
+            self._mark_unavailable(e)
+            return None
+        if value is None:
+            return None
+        headers, _, body = value.partition(b'\n')
+        return json.loads(headers), body
+
+    def set(self, key: str, headers: Dict[str, str], body: bytes):
+        value = json.dumps(headers).encode('utf-8') + b'\n' + body
+        try:
+            self.store.set(key, value, config.RESPONSE_CACHE_TTL_SECONDS)
+            self.store.incr_stat('stores')
+        except Exception as e:
+            self._mark_unavailable(e)
+
+    def invalidate(self, *namespaces: str):
+        """使指定命名空間下的所有緩存響應失效（共享存儲不可用時由恢復後的整體失效代替）"""
+        if not self._ensure_available():
+            return
+        try:
+            for namespace in namespaces:
+                self.store.bump_generation(namespace)
+                self.store.incr_stat('invalidations')
+        except Exception as e:
+            self._mark_unavailable(e)
+
+    def invalidate_all(self):
+        """使所有緩存響應失效"""
+        self.invalidate(GLOBAL_NAMESPACE)
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中統計（共享存儲時為所有工作進程的總和）"""
+        stats = None
+        if self._ensure_available():
+            try:
+                stats = self.store.stats()
+            except Exception as e:
+                self._mark_unavailable(e)
+        if stats is None:
+            return {'backend': self.store.backend, 'available': False}
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'backend': self.store.backend,
+            'available': True,
+            **stats,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0
+        }
+
+# 應用內共用的響應緩存
+response_cache = ResponseCache()
+
+# Redis 共享緩存的條目數不在進程內統計
+register_cache_size('responses', lambda: len(response_cache.store) if response_cache.store.backend == 'local' else 0)
+
+def init_response_cache(app):
+    """啟動時檢查共享存儲配置，缺少 redis 套件時提前警告而不是等到第一次請求"""
+    if config.RESPONSE_CACHE_REDIS_URL and redis is None:
+        logger.warning("已設置 RESPONSE_CACHE_REDIS_URL 但無法導入 redis 套件（pip install redis），"
+                       "各工作進程將使用各自的進程內響應緩存")
+
+def invalidate_plan_responses(plan_id, public: bool = False):
+    """
+    計劃寫入後使相關的緩存響應失效
+
+    Args:
+        plan_id: 被修改的計劃ID
+        public: 寫入前或寫入後計劃是否公開（公開列表只在此時需要失效）
+    """
+    namespaces = [plan_namespace(plan_id)]
+    if public:
+        namespaces.append(PUBLIC_LIST_NAMESPACE)
+    response_cache.invalidate(*namespaces)
+
+def _store_when_complete(chunks, key: str, headers: Dict[str, str]):
+    """邊發送邊收集串流響應，完整發送後寫入緩存（客戶端中途斷開時不緩存）"""
+    body = bytearray()
+    for chunk in chunks:
+        body += chunk
+        yield chunk
+    response_cache.set(key, headers, bytes(body))
+
+def cached_response(namespace):
+    """
+    緩存匿名 GET 請求成功響應的裝飾器
+
+    Args:
+        namespace: 命名空間名稱，或接收視圖參數並返回命名空間的函數
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if not config.RESPONSE_CACHE_ENABLED or request.method != 'GET':
+                return f(*args, **kwargs)
+
+            name = namespace(**kwargs) if callable(namespace) else namespace
+            key = response_cache.build_key(name, request.path, request.args)
+            if key is None:
+                return f(*args, **kwargs)
+
+            cached = response_cache.get(key)
+            if cached is not None:
+                headers, body = cached
+                response = Response(body, status=200, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                # 條件請求仍然按緩存的 ETag / Last-Modified 返回 304
+                etag, _ = response.get_etag()
+                if etag and is_not_modified(etag, response.last_modified):
+                    return not_modified_response(etag, response.last_modified, response.headers.get('Cache-Control'))
+                return response
+
+            # 填充緩存的內容必須不舊於當前世代，公開讀取改從主節點讀取
+            with primary_reads():
+                response = make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                headers = {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers}
+                if response.is_streamed:
+                    # 串流響應在發送完畢後才寫入緩存
+                    response.response = _store_when_complete(response.response, key, headers)
+                else:
+                    response_cache.set(key, headers, response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated
+    return decorator
@@ -0,0 +1,92 @@
+import re
+import unicodedata
+from typing import Dict, Any, List
+
+# 搜索字段及查詢限制
+SEARCH_FIELDS = ("title", "destination")
+MAX_QUERY_LENGTH = 100
+MAX_QUERY_TOKENS = 32
+
+# 拉丁單詞的前綴詞元長度範圍（建立索引時輸出，使 "tok" 能命中 "Tokyo"）
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_LENGTH = 15
+
+# 中日韓文字（漢字、平假名、片假名、韓文）連續片段
+CJK_RUN_PATTERN = re.compile(
+    r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+'
+)
+# 非中日韓部分的拉丁字母/數字單詞
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+def _normalize(text: str) -> str:
+    """全形轉半形並轉為小寫"""
+    return unicodedata.normalize("NFKC", text).lower()
+
+def _cjk_tokens(run: str, include_unigrams: bool) -> List[str]:
+    """將中日韓文字片段切分為二元組（bigram）"""
+    if len(run) == 1:
+        return [run]
+
+    tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+    if include_unigrams:
+        tokens.extend(run)
+    return tokens
+
+def _word_prefixes(word: str) -> List[str]:
+    """單詞的前綴（edge n-gram），不包括單詞本身"""
+    return [word[:length] for length in range(MIN_PREFIX_LENGTH, min(len(word), MAX_PREFIX_LENGTH + 1))]
+
+def tokenize_text(text: str, include_unigrams: bool = True, include_prefixes: bool = False) -> List[str]:
+    """
+    將文字切分為搜索詞元
+
+    中日韓文字使用二元組切分（例如「京都5日遊」→ 京都、日遊），
+    拉丁字母和數字按單詞切分。
+
+    Args:
+        text: 原始文字
+        include_unigrams: 是否同時輸出中日韓單字詞元（建立索引時使用，
+            使單字查詢也能命中）
+        include_prefixes: 是否同時輸出拉丁單詞的前綴（建立索引時使用，
+            使單詞開頭的部分查詢也能命中；單詞中間的片段仍不會命中）
+
+    Returns:
+        去重後的詞元列表，保持出現順序
+    """
+    if not text or not isinstance(text, str):
+        return []
+
+    text = _normalize(text)
+    tokens = []
+
+    for run in CJK_RUN_PATTERN.findall(text):
+        tokens.extend(_cjk_tokens(run, include_unigrams))
+
+    # 移除中日韓片段後再切分其餘單詞
+    for word in WORD_PATTERN.findall(CJK_RUN_PATTERN.sub(' ', text)):
+        tokens.append(word)
+        if include_prefixes:
+            tokens.extend(_word_prefixes(word))
+
+    return list(dict.fromkeys(tokens))
+
+def build_search_tokens(plan: Dict[str, Any]) -> List[str]:
+    """為旅行計劃生成預先計算的搜索詞元陣列（寫入時調用）"""
+    tokens = []
+    for field in SEARCH_FIELDS:
+        value = plan.get(field)
+        if isinstance(value, str):
+            tokens.extend(tokenize_text(value, include_unigrams=True, include_prefixes=True))
+    return list(dict.fromkeys(tokens))
+
+def build_query_tokens(query: str) -> List[str]:
+    """
+    將用戶輸入的查詢轉換為詞元列表
+
+    查詢只會以字面值詞元參與 $in 匹配，不會被解釋為正則表達式或查詢運算符。
+    """
+    if not query or not isinstance(query, str):
+        return []
+
+    query = query[:MAX_QUERY_LENGTH]
+    return tokenize_text(query, include_unigrams=False)[:MAX_QUERY_TOKENS]
@@ -0,0 +1,355 @@
+import os
+import re
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Dict, List, Optional
+import requests
+from flask import g, request
+from app.config.config import get_config
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+# 獲取配置
+config = get_config()
+
+# W3C Trace Context 請求頭
+TRACEPARENT_HEADER = 'traceparent'
+TRACEPARENT_PATTERN = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+# OTLP 的 span 類型
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+# OTLP 的狀態碼
+STATUS_UNSET = 0
+STATUS_ERROR = 2
+
+# 後台線程每次導出的最大 span 數和導出間隔
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+
+# 當前 span，子 span 以它為父節點
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """將屬性值轉換為 OTLP AnyValue"""
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+class Span:
+    """一個計時的操作，結束時交給導出處理器"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'kind', 'sampled',
+                 'start_ns', 'end_ns', 'attributes', 'status', 'status_message')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.kind = kind
+        self.sampled = sampled
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes) if sampled and attributes else {}
+        self.status = STATUS_UNSET
+        self.status_message = ''
+
+    def set_attribute(self, key: str, value: Any):
+        if self.sampled:
+            self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status = STATUS_ERROR
+        self.status_message = message
+
+    def record_exception(self, error: BaseException):
+        self.set_error(f'{type(error).__name__}: {error}')
+        self.set_attribute('exception.type', type(error).__name__)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            tracer.processor.on_end(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': _otlp_attributes(self.attributes),
+            'status': {'code': self.status, 'message': self.status_message} if self.status else {}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+class FileSpanExporter:
+    """每批 span 以一行 OTLP/JSON 導出請求追加到文件（可由收集器的 otlpjsonfile 接收器讀取）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, payload: Dict[str, Any]):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload, ensure_ascii=False, separators=(',', ':')) + '\n')
+
+class OtlpHttpSpanExporter:
+    """以 OTLP/HTTP JSON 格式發送到收集器的 /v1/traces"""
+
+    def __init__(self, endpoint: str):
+        self.url = endpoint.rstrip('/') + '/v1/traces'
+        self._session = requests.Session()
+
+    def export(self, payload: Dict[str, Any]):
+        response = self._session.post(self.url, json=payload, timeout=config.TRACING_EXPORT_TIMEOUT_SECONDS)
+        response.raise_for_status()
+
+class BatchSpanProcessor:
+    """
+    批量導出處理器
+
+    請求線程只把結束的 span 放入隊列，後台線程按批導出；隊列已滿時丟棄。
+    後台線程在每個進程首次使用時才啟動，gunicorn fork 出的工作進程會各自啟動。
+    """
+
+    def __init__(self, exporter):
+        self.exporter = exporter
+        self.dropped = 0
+        self._queue = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            self._queue = queue.Queue(config.TRACING_QUEUE_SIZE)
+            thread = threading.Thread(target=self._run, args=(self._queue,), name='span-exporter', daemon=True)
+            thread.start()
+            self._pid = pid
+
+    def on_end(self, span: Span):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self, span_queue):
+        while True:
+            batch = []
+            try:
+                batch.append(span_queue.get(timeout=EXPORT_INTERVAL_SECONDS))
+                while len(batch) < EXPORT_BATCH_SIZE:
+                    batch.append(span_queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._export(batch)
+
+    def flush(self):
+        """導出隊列中剩餘的 span（進程退出時調用）"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._export(batch)
+
+    def _export(self, batch: List[Span]):
+        payload = {
+            'resourceSpans': [{
+                'resource': {'attributes': _otlp_attributes({
+                    'service.name': config.TRACING_SERVICE_NAME,
+                    'process.pid': os.getpid()
+                })},
+                'scopeSpans': [{
+                    'scope': {'name': 'travo'},
+                    'spans': [span.to_otlp() for span in batch]
+                }]
+            }]
+        }
+        try:
+            self.exporter.export(payload)
+        except Exception as e:
+            logger.warning("導出追蹤數據失敗（%s 個 span）: %s", len(batch), e)
+
+class Tracer:
+    """創建 span 並維護當前 span 的上下文"""
+
+    def __init__(self):
+        self.processor = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def configure(self):
+        """按配置創建導出器；未啟用時所有 span 都不記錄"""
+        if not config.TRACING_ENABLED:
+            self.processor = None
+            return
+        if config.TRACING_EXPORTER == 'otlp':
+            exporter = OtlpHttpSpanExporter(config.TRACING_OTLP_ENDPOINT)
+            target = exporter.url
+        else:
+            exporter = FileSpanExporter(config.TRACING_FILE_PATH)
+            target = exporter.path
+        self.processor = BatchSpanProcessor(exporter)
+        logger.info("已啟用追蹤，導出到 %s，抽樣比例 %s", target, config.TRACING_SAMPLE_RATE)
+
+    def start_span(self, name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+                   trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                   sampled: Optional[bool] = None) -> Span:
+        """
+        開始一個 span（不設為當前 span）
+
+        未指定 trace_id 時以當前 span 為父節點；沒有當前 span 時開始新的追蹤並按比例抽樣。
+        """
+        if trace_id is None:
+            parent = _current_span.get()
+            if parent is not None:
+                trace_id, parent_id, sampled = parent.trace_id, parent.span_id, parent.sampled
+            else:
+                trace_id = os.urandom(16).hex()
+        if sampled is None:
+            sampled = random.random() < config.TRACING_SAMPLE_RATE
+        return Span(name, trace_id, parent_id, sampled and self.enabled, kind, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes):
+        """在代碼塊內開始一個 span 並設為當前 span"""
+        span = self.start_span(name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+# 全局追蹤器
+tracer = Tracer()
+
+def span(name: str, **attributes):
+    """with span('places.enrich_day', day=1): ..."""
+    return tracer.span(name, **attributes)
+
+def traced(name: Optional[str] = None, kind: int = SPAN_KIND_INTERNAL):
+    """裝飾器：函數執行期間記錄一個 span（默認以函數的限定名稱命名）"""
+    def decorator(f):
+        span_name = name or f.__qualname__
+
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # 未啟用追蹤時直接調用，不創建 span 也不生成追蹤ID
+            if not tracer.enabled:
+                return f(*args, **kwargs)
+            with tracer.span(span_name, kind):
+                return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+def current_span() -> Optional[Span]:
+    """當前 span（沒有時返回 None）"""
+    return _current_span.get()
+
+def set_attribute(key: str, value: Any):
+    """為當前 span 設置屬性"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+def _start_request_span():
+    incoming = TRACEPARENT_PATTERN.match(request.headers.get(TRACEPARENT_HEADER, ''))
+    route = request.url_rule.rule if request.url_rule is not None else request.path
+    attributes = {
+        'http.method': request.method,
+        'http.route': route,
+        'http.target': request.full_path,
+        'request.id': g.get('request_id')
+    }
+    if incoming:
+        trace_id, parent_id, flags = incoming.groups()
+        span = tracer.start_span(f'{request.method} {route}', SPAN_KIND_SERVER, attributes,
+                                 trace_id=trace_id, parent_id=parent_id, sampled=flags == '01')
+    else:
+        span = tracer.start_span(f'{request.method} {route}', SPAN_KIND_SERVER, attributes)
+    g.trace_span = span
+    g.trace_token = _current_span.set(span)
+
+def _finish_request_span(response):
+    span = g.get('trace_span')
+    if span is None:
+        return response
+    span.set_attribute('http.status_code', response.status_code)
+    if response.status_code >= 500:
+        span.set_error(f'HTTP {response.status_code}')
+    if span.sampled:
+        response.headers['X-Trace-ID'] = span.trace_id
+    # 串流響應輸出完成後才結束根 span
+    response.call_on_close(span.end)
+    return response
+
+def _clear_request_span(exc=None):
+    token = g.pop('trace_token', None)
+    if token is not None:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            _current_span.set(None)
+
+def init_tracing(app):
+    """為每個請求創建根 span（沿用上游的 traceparent）"""
+    tracer.configure()
+    if not tracer.enabled:
+        return
+    app.before_request(_start_request_span)
+    app.after_request(_finish_request_span)
+    app.teardown_request(_clear_request_span)
+
+@atexit.register
+def _flush_on_exit():
+    if tracer.processor is not None:
+        tracer.processor.flush()
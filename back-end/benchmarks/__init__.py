@@ -0,0 +1 @@
+"""性能基準測試（在 back-end 目錄下以 python -m benchmarks.<名稱> 運行）"""
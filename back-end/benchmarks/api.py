@@ -0,0 +1,387 @@
+"""
+API 熱路徑的端到端基準
+
+在進程內運行完整的 Flask 應用（包括所有中間件），上游使用 fake_upstreams 的假 OpenAI 和
+Google Places，數據庫使用 mongomock（默認）或 --mongo-uri 指定的本地 MongoDB（會清空其中的
+travo_benchmark 數據庫）。每個場景記錄延遲分佈、狀態碼和單次請求的內存峰值（tracemalloc）。
+
+場景：
+    generate_cold / generate_warm       生成行程（Places 緩存為空 / 已預熱）
+    list_user[_activities]@N            用戶擁有 N 個計劃時的列表（不含 / 含行程）
+    explore_uncached / explore_cached@N 公開計劃列表（響應緩存失效 / 命中），約一半計劃公開
+    search@N                            關鍵字搜索
+    activity_add / activity_update / activity_delete / activity_delete_by_index / plan_patch
+                                        活動修改端點
+
+用法：
+    python -m benchmarks.api [--scales 10,1000,100000] [--iterations 50] [--mongo-uri mongodb://localhost:27017]
+                             [--output results.json] [--baseline previous.json --threshold 0.2]
+
+tests/test_benchmarks.py 以極小規模運行全部場景，確認它們在測試中保持可用。
+mongomock 的查詢為全表掃描，100000 個計劃的場景較慢，可以用 --scales 縮小或使用本地 MongoDB。
+指定 --baseline 時，延遲中位數、p95 或內存峰值增幅超過閾值的場景會列出，並以退出碼 1 結束。
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from benchmarks.common import summarize, max_rss_kib, environment, write_results, compare
+from fake_upstreams import FakeUpstreamServer, UpstreamState, FaultProfile
+
+BENCHMARK_DB_NAME = "travo_benchmark"
+BENCHMARK_SECRET_KEY = "benchmark-secret-key-0123456789abcdef"
+DESTINATIONS = ("東京", "京都", "大阪", "台北", "首爾", "曼谷", "巴黎", "倫敦")
+BASE_TIME = datetime(2024, 6, 1)
+
+# 與基線比較的欄位
+REGRESSION_METRICS = {"median": "latency.median_ms", "p95": "latency.p95_ms", "memory": "memory.peak_kib"}
+
+def configure_environment(args, upstreams: FakeUpstreamServer):
+    """應用在導入時讀取配置，必須在導入 app 之前設置"""
+    os.environ.update({
+        "OPENAI_API_URL": upstreams.openai_url,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "GOOGLE_PLACES_API_URL": upstreams.places_url,
+        "GOOGLE_PLACES_API_KEY": "benchmark-places-key",
+        "PLACES_DISK_CACHE_PATH": "",
+        "MONGO_DB_NAME": BENCHMARK_DB_NAME,
+        "RATE_LIMIT_ENABLED": "false",
+        "PASSWORD_HASH_WORKERS": "0",
+        "TRACING_ENABLED": "false",
+        "PROFILING_ENABLED": "false",
+        "LOG_LEVEL": args.log_level
+    })
+    if args.mongo_uri:
+        os.environ["MONGO_URI"] = args.mongo_uri
+
+def use_database(mongo_uri):
+    """返回使用的數據庫類型；未指定 MongoDB 時將 mongomock 客戶端注入 Database"""
+    from app.models import db as db_module
+    from app.models.travel_plan import TravelPlan
+
+    if mongo_uri:
+        db_module.Database.get_instance().client.drop_database(BENCHMARK_DB_NAME)
+        backend = "mongodb"
+    else:
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("需要安裝 mongomock（pip install -r requirements-dev.txt），或使用 --mongo-uri 指定本地 MongoDB")
+        client = mongomock.MongoClient()
+        db_module.Database._client = client
+        db_module.Database._db = client[BENCHMARK_DB_NAME]
+        db_module.Database._pid = os.getpid()
+        backend = "mongomock"
+    TravelPlan._indexes_ensured = False
+    return backend
+
+def build_activity(day: int, index: int) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "name": f"景點 {day + 1}-{index + 1}",
+        "location": f"市中心 {index + 1} 丁目",
+        "type": "景點",
+        "time": f"{9 + index * 2:02d}:00",
+        "duration_minutes": 90,
+        "lat": 35.68 + index * 0.01,
+        "lng": 139.76 + index * 0.01,
+        "place_id": f"fake-{uuid.uuid4().hex[:24]}",
+        "address": "市中心 1 丁目 1 號",
+        "rating": 4.5,
+        "photos": [f"https://example.com/photo/{uuid.uuid4().hex}" for _ in range(3)],
+        "description": "著名的歷史景點，適合拍照和散步。"
+    }
+
+def build_plan(user_id, index: int, days: int, activities_per_day: int) -> dict:
+    """生成與 create_plan 寫入結構相同的計劃文檔（包括派生欄位）"""
+    from app.models.travel_plan import TravelPlan
+
+    destination = DESTINATIONS[index % len(DESTINATIONS)]
+    created_at = BASE_TIME - timedelta(minutes=index)
+    plan = {
+        "user_id": user_id,
+        "title": f"{destination}{days}日遊 #{index}",
+        "created_at": created_at,
+        "updated_at": created_at,
+        "is_public": index % 2 == 0,
+        "version": "1.0",
+        "destination": destination,
+        "start_date": "2024-07-01",
+        "end_date": (datetime(2024, 7, 1) + timedelta(days=days - 1)).strftime("%Y-%m-%d"),
+        "budget": "30000",
+        "travelers": 2,
+        "days": [{"day": day + 1, "date": "", "activities": [build_activity(day, i) for i in range(activities_per_day)]}
+                 for day in range(days)]
+    }
+    plan.update(TravelPlan.derived_fields(plan))
+    return plan
+
+def seed_plans(user_id, start: int, count: int, days: int, activities_per_day: int, batch_size: int = 1000):
+    """直接批量寫入計劃（繞過 API），之後重置計數器和響應緩存"""
+    from app.models.travel_plan import TravelPlan
+    from app.utils.response_cache import response_cache
+
+    collection = TravelPlan.get_collection()
+    for offset in range(start, start + count, batch_size):
+        size = min(batch_size, start + count - offset)
+        collection.insert_many([build_plan(user_id, offset + i, days, activities_per_day) for i in range(size)])
+    TravelPlan.reset_counts()
+    response_cache.invalidate_all()
+
+class Runner:
+    """執行場景並記錄延遲、狀態碼和內存"""
+
+    def __init__(self, client, iterations: int, warmup: int, memory_iterations: int):
+        self.client = client
+        self.iterations = iterations
+        self.warmup = warmup
+        self.memory_iterations = memory_iterations
+        self.results = []
+
+    def request(self, method: str, url: str, **kwargs):
+        """發送請求並讀完響應體（包括串流響應），返回 (毫秒, 狀態碼, 響應 JSON)"""
+        started = time.perf_counter()
+        response = self.client.open(url, method=method, **kwargs)
+        body = response.get_data()
+        response.close()
+        elapsed = (time.perf_counter() - started) * 1000
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        return elapsed, response.status_code, payload
+
+    def run(self, name: str, fn, iterations: int = None, scale: int = None):
+        """
+        fn 執行一次場景並返回 (毫秒, 狀態碼)；計時只包括 fn 內的請求，
+        內存峰值則包括 fn 的全部工作（例如修改場景的準備請求）。
+        """
+        iterations = iterations or self.iterations
+        for _ in range(self.warmup):
+            fn()
+
+        samples = []
+        statuses = Counter()
+        for _ in range(iterations):
+            elapsed, status = fn()
+            samples.append(elapsed)
+            statuses[str(status)] += 1
+
+        memory = None
+        if self.memory_iterations:
+            gc.collect()
+            tracemalloc.start()
+            baseline = tracemalloc.get_traced_memory()[0]
+            peak = 0
+            for _ in range(self.memory_iterations):
+                tracemalloc.reset_peak()
+                fn()
+                peak = max(peak, tracemalloc.get_traced_memory()[1] - baseline)
+            retained = tracemalloc.get_traced_memory()[0] - baseline
+            tracemalloc.stop()
+            memory = {"peak_kib": round(peak / 1024, 1), "retained_kib": round(retained / 1024, 1)}
+
+        result = {
+            "name": f"{name}@{scale}" if scale is not None else name,
+            "scenario": name,
+            "scale": scale,
+            "latency": summarize(samples),
+            "status_codes": dict(statuses),
+            "memory": memory
+        }
+        self.results.append(result)
+        print(f"{result['name']}: 中位數 {result['latency']['median_ms']} ms，p95 {result['latency']['p95_ms']} ms，"
+              f"狀態碼 {result['status_codes']}", file=sys.stderr)
+        return result
+
+def token_headers(app, user_id) -> dict:
+    from app.api.auth import generate_token
+    with app.app_context():
+        return {"Authorization": f"Bearer {generate_token(str(user_id))}"}
+
+def run_generate(runner: Runner, headers: dict, iterations: int):
+    from app.utils import google_places_service
+
+    counter = {"n": 0}
+
+    def generate(destination):
+        body = {"destination": destination, "start_date": "2024-07-01", "end_date": "2024-07-03",
+                "interests": ["文化", "美食"], "preference": "緊湊", "companions": "朋友"}
+        elapsed, status, _ = runner.request("POST", "/api/travel-plans/generate", json=body, headers=headers)
+        return elapsed, status
+
+    def cold():
+        # 每次使用新目的地並清空 Places 緩存，所有搜索和詳情都需要請求上游
+        counter["n"] += 1
+        google_places_service.place_search_cache.clear()
+        google_places_service.place_details_cache.clear()
+        return generate(f"城市{counter['n']}")
+
+    runner.run("generate_cold", cold, iterations)
+    runner.run("generate_warm", lambda: generate("東京"), iterations)
+
+def run_reads(runner: Runner, headers: dict, scale: int):
+    from app.utils.response_cache import response_cache
+
+    queries = iter(DESTINATIONS * (runner.iterations + runner.warmup + runner.memory_iterations + 1))
+
+    def get(url, **kwargs):
+        elapsed, status, _ = runner.request("GET", url, **kwargs)
+        return elapsed, status
+
+    def explore_uncached():
+        response_cache.invalidate_all()
+        return get("/api/travel-plans/public?limit=12")
+
+    runner.run("list_user", lambda: get("/api/travel-plans?limit=10", headers=headers), scale=scale)
+    runner.run("list_user_activities",
+               lambda: get("/api/travel-plans?limit=10&include_activities=true", headers=headers), scale=scale)
+    runner.run("explore_uncached", explore_uncached, scale=scale)
+    runner.run("explore_cached", lambda: get("/api/travel-plans/public?limit=12"), scale=scale)
+    runner.run("search", lambda: get(f"/api/travel-plans/search?q={next(queries)}&limit=10"), scale=scale)
+
+def run_mutations(runner: Runner, headers: dict, plan_id: str):
+    base = f"/api/travel-plans/{plan_id}"
+    added = []
+
+    def add():
+        body = {"day_index": 0, "activity": dict(build_activity(0, 9), id=None)}
+        elapsed, status, payload = runner.request("POST", f"{base}/activities", json=body, headers=headers)
+        if payload and payload.get("activity_id"):
+            added.append(payload["activity_id"])
+        return elapsed, status
+
+    def next_activity():
+        # 隊列為空時先添加一個（不計時）
+        if not added:
+            add()
+        return added.pop()
+
+    def update():
+        activity_id = next_activity()
+        # PUT 以請求體整體替換活動，與前端一樣帶上原ID
+        body = {"activity": dict(build_activity(0, 10), id=activity_id, name="更新的景點")}
+        elapsed, status, _ = runner.request("PUT", f"{base}/activities/{activity_id}", json=body, headers=headers)
+        added.insert(0, activity_id)
+        return elapsed, status
+
+    def delete():
+        elapsed, status, _ = runner.request("DELETE", f"{base}/activities/{next_activity()}", headers=headers)
+        return elapsed, status
+
+    def delete_by_index():
+        # 添加到第一天末尾後按索引刪除，計劃大小保持不變
+        add()
+        added.pop()
+        _, _, payload = runner.request("GET", base, headers=headers)
+        last_index = len(payload["plan"]["days"][0]["activities"]) - 1
+        elapsed, status, _ = runner.request("DELETE", f"{base}/days/0/activities/{last_index}", headers=headers)
+        return elapsed, status
+
+    def patch():
+        activity_id = next_activity()
+        operations = [{"op": "update_activity", "activity_id": activity_id, "fields": {"time": "11:00"}}]
+        elapsed, status, _ = runner.request("PATCH", base, json={"operations": operations}, headers=headers)
+        added.insert(0, activity_id)
+        return elapsed, status
+
+    runner.run("activity_add", add)
+    runner.run("activity_update", update)
+    runner.run("plan_patch", patch)
+    runner.run("activity_delete", delete)
+    runner.run("activity_delete_by_index", delete_by_index)
+
+def main():
+    parser = argparse.ArgumentParser(description="API 熱路徑的端到端基準")
+    parser.add_argument("--scales", default="10,1000,100000", help="列表場景的計劃數量，以逗號分隔")
+    parser.add_argument("--iterations", type=int, default=50, help="每個場景的計時次數")
+    parser.add_argument("--generate-iterations", type=int, default=10, help="生成場景的計時次數")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--memory-iterations", type=int, default=5, help="測量內存峰值的次數（0 表示不測量）")
+    parser.add_argument("--days", type=int, default=3, help="預先寫入的計劃天數")
+    parser.add_argument("--activities", type=int, default=4, help="預先寫入的計劃每天活動數")
+    parser.add_argument("--mongo-uri", default=None, help="使用本地 MongoDB 代替 mongomock")
+    parser.add_argument("--openai-faults", default="", help="假 OpenAI 的故障設置（見 fake_upstreams）")
+    parser.add_argument("--places-faults", default="", help="假 Places 的故障設置")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--output", default=None, help="將結果寫入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="與之前的結果文件比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允許的相對退化，默認 20%%")
+    parser.add_argument("--skip", default="", help="跳過的場景組：generate,reads,mutations")
+    args = parser.parse_args()
+
+    scales = sorted(int(scale) for scale in args.scales.split(",") if scale.strip())
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+    state = UpstreamState(faults={"openai": FaultProfile.parse(args.openai_faults),
+                                  "places": FaultProfile.parse(args.places_faults)}, seed=1)
+
+    with FakeUpstreamServer(state) as upstreams:
+        configure_environment(args, upstreams)
+        from bson.objectid import ObjectId
+        from app import create_app
+        from app.models.travel_plan import TravelPlan
+
+        backend = use_database(args.mongo_uri)
+        app = create_app({"SECRET_KEY": BENCHMARK_SECRET_KEY})
+        runner = Runner(app.test_client(), args.iterations, args.warmup, args.memory_iterations)
+
+        started = time.perf_counter()
+        if "generate" not in skip:
+            run_generate(runner, token_headers(app, ObjectId()), args.generate_iterations)
+
+        if "mutations" not in skip:
+            owner = ObjectId()
+            plan_id, error = TravelPlan.create_plan(owner, build_plan(owner, 0, 7, 6))
+            if error:
+                sys.exit(f"創建修改場景的計劃失敗: {error}")
+            run_mutations(runner, token_headers(app, owner), str(plan_id))
+
+        if "reads" not in skip:
+            reader = ObjectId()
+            headers = token_headers(app, reader)
+            seeded = 0
+            for scale in scales:
+                seed_started = time.perf_counter()
+                seed_plans(reader, seeded, scale - seeded, args.days, args.activities)
+                print(f"已寫入 {scale} 個計劃（{time.perf_counter() - seed_started:.1f} 秒）", file=sys.stderr)
+                seeded = scale
+                run_reads(runner, headers, scale)
+
+        results = {
+            "benchmark": "api",
+            "environment": dict(environment(), datastore=backend),
+            "parameters": {
+                "scales": scales,
+                "iterations": args.iterations,
+                "generate_iterations": args.generate_iterations,
+                "warmup": args.warmup,
+                "memory_iterations": args.memory_iterations,
+                "plan_shape": {"days": args.days, "activities_per_day": args.activities},
+                "upstream_faults": {name: injector.profile.to_dict() for name, injector in state.injectors.items()}
+            },
+            "duration_seconds": round(time.perf_counter() - started, 1),
+            "max_rss_kib": max_rss_kib(),
+            "upstream_requests": state.snapshot(),
+            "results": runner.results
+        }
+
+    write_results(results, args.output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(runner.results, baseline, REGRESSION_METRICS, args.threshold)
+        for regression in regressions:
+            print(f"退化: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""基準測試和壓力測試共用的統計和結果比較"""
+import json
+import math
+import os
+import platform
+from typing import Dict, List, Optional
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """最近秩百分位數（sorted_samples 須已排序，q 為 0 到 100）"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """延遲樣本（毫秒）的統計"""
+    samples = sorted(samples_ms)
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples), 3),
+        "median_ms": round(percentile(samples, 50), 3),
+        "p90_ms": round(percentile(samples, 90), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+        "min_ms": round(samples[0], 3),
+        "max_ms": round(samples[-1], 3)
+    }
+
+def max_rss_kib() -> Optional[int]:
+    """當前進程的峰值常駐內存（KiB，不支持的平台返回 None）"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 以字節為單位，Linux 以 KiB 為單位
+    return rss // 1024 if platform.system() == "Darwin" else rss
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+def write_results(results: dict, output: Optional[str]):
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+def compare(results: List[dict], baseline: List[dict], metrics: Dict[str, str], threshold: float) -> List[str]:
+    """
+    與基線結果比較，返回超過閾值的退化描述
+
+    Args:
+        results / baseline: 結果列表，每項以 "name" 標識
+        metrics: {顯示名稱: 點分隔的欄位路徑}，例如 {"p95": "latency.p95_ms"}
+        threshold: 允許的相對增幅，例如 0.2 表示 20%
+    """
+    def lookup(entry, path):
+        for key in path.split("."):
+            if not isinstance(entry, dict) or key not in entry:
+                return None
+            entry = entry[key]
+        return entry
+
+    previous = {entry["name"]: entry for entry in baseline}
+    regressions = []
+    for entry in results:
+        old = previous.get(entry["name"])
+        if old is None:
+            continue
+        for label, path in metrics.items():
+            new_value, old_value = lookup(entry, path), lookup(old, path)
+            if not new_value or not old_value:
+                continue
+            if new_value > old_value * (1 + threshold):
+                regressions.append(f"{entry['name']} {label}: {old_value} → {new_value} "
+                                   f"(+{(new_value / old_value - 1) * 100:.0f}%)")
+    return regressions
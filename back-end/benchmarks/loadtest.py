@@ -0,0 +1,498 @@
+"""
+混合流量壓力測試
+
+以 HTTP 請求已部署的服務（例如 Docker 映像中的 gunicorn --workers 1 --threads 8），
+模擬三類用戶的會話：
+    explore     匿名瀏覽公開計劃：列表、翻頁、查看詳情、搜索
+    edit        登入用戶編輯自己的計劃：創建、查看、增改刪活動、批量修改
+    generate    登入用戶生成行程後查看結果
+
+負載以若干階段遞增，每個階段運行 --stage-duration 秒：
+    開放模型（--rates 0.5,1,2,4）  會話按泊松過程以指定速率（每秒會話數）到達，不受服務速度影響
+    封閉模型（--users 1,4,8,16）   指定數量的用戶循環執行會話，每個請求之間有思考時間
+每個階段報告吞吐量、各端點的延遲分位數和錯誤率，並按以下條件判斷飽和點：
+錯誤率超過 --max-error-rate、非生成端點的 p95 超過 --slo-p95-ms、
+（封閉模型）吞吐量增幅低於用戶數增幅的 --min-scaling 倍，或（開放模型）進行中的會話達到上限而丟棄到達。
+
+準備（在 back-end 目錄下）：
+    python -m fake_upstreams --port 8090 --openai "latency=lognormal:8000:0.4"
+    docker build -t travo-api .
+    docker run --rm -p 8080:8080 --add-host host.docker.internal:host-gateway \\
+        -e MONGO_URI=mongodb://host.docker.internal:27017 -e GUNICORN_WORKERS=1 -e GUNICORN_THREADS=8 \\
+        -e OPENAI_API_URL=http://host.docker.internal:8090/v1/chat/completions -e OPENAI_API_KEY=fake \\
+        -e GOOGLE_PLACES_API_URL=http://host.docker.internal:8090/maps/api/place -e GOOGLE_PLACES_API_KEY=fake \\
+        -e RATE_LIMIT_ENABLED=false travo-api
+
+用法：
+    python -m benchmarks.loadtest --base-url http://localhost:8080 --upstreams-url http://localhost:8090 \\
+        --mix explore=70,edit=25,generate=5 --rates 0.5,1,2,4,8 --stage-duration 60 --output load.json
+
+限流開啟時同一帳號的生成請求很快會收到 429，結果中以 rate_limited 單獨統計。
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+from benchmarks.api import DESTINATIONS, build_activity
+from benchmarks.common import summarize, environment, write_results, compare
+
+PERSONAS = ("explore", "edit", "generate")
+GENERATE_ENDPOINT = "POST /api/travel-plans/generate"
+
+# 與基線比較的欄位（結果以 "端點@負載" 標識）
+REGRESSION_METRICS = {"p95": "latency.p95_ms", "error_rate": "error_rate"}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """解析 "explore=70,edit=25,generate=5" 格式的用戶比例"""
+    mix = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PERSONAS:
+            raise argparse.ArgumentTypeError(f"未知的用戶類型: {name}（可用: {', '.join(PERSONAS)}）")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"無效的比例: {item}")
+    if not mix or sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("用戶比例之和必須大於 0")
+    return mix
+
+def parse_levels(value: str) -> List[float]:
+    try:
+        levels = [float(level) for level in value.split(",") if level.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"無效的負載列表: {value}")
+    if not levels or any(level <= 0 for level in levels):
+        raise argparse.ArgumentTypeError("負載必須為正數")
+    return levels
+
+def classify(status: int) -> str:
+    if status < 400:
+        return "ok"
+    if status == 429:
+        return "rate_limited"
+    return "client_error" if status < 500 else "server_error"
+
+class Recorder:
+    """線程安全地收集一個階段內各端點的延遲和結果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+        self.sessions = Counter()
+        self.window_requests = None
+
+    def close_window(self):
+        """負載窗口結束（之後完成的請求仍計入延遲，但不計入吞吐量）"""
+        with self._lock:
+            self.window_requests = sum(sum(outcomes.values()) for outcomes in self.outcomes.values())
+
+    def record(self, endpoint: str, elapsed_ms: float, outcome: str):
+        with self._lock:
+            if outcome == "ok":
+                self.latencies[endpoint].append(elapsed_ms)
+            self.outcomes[endpoint][outcome] += 1
+
+    def count_session(self, event: str):
+        with self._lock:
+            self.sessions[event] += 1
+
+    def report(self, window: float, elapsed: float, slo_p95_ms: float) -> dict:
+        """階段結果：吞吐量按負載窗口內完成的請求計算，只有成功請求計入延遲分佈"""
+        with self._lock:
+            endpoints = []
+            all_latencies, non_generate = [], []
+            total, failed = 0, 0
+            for endpoint in sorted(self.outcomes):
+                outcomes = self.outcomes[endpoint]
+                count = sum(outcomes.values())
+                errors = count - outcomes["ok"]
+                total += count
+                failed += errors
+                latencies = self.latencies[endpoint]
+                all_latencies.extend(latencies)
+                if endpoint != GENERATE_ENDPOINT:
+                    non_generate.extend(latencies)
+                endpoints.append({
+                    "name": endpoint,
+                    "requests": count,
+                    "throughput_rps": round(count / elapsed, 3) if elapsed else 0,
+                    "error_rate": round(errors / count, 4) if count else 0,
+                    "outcomes": dict(outcomes),
+                    "latency": summarize(latencies)
+                })
+            interactive = summarize(non_generate)
+            window_requests = total if self.window_requests is None else self.window_requests
+            return {
+                "elapsed_seconds": round(elapsed, 1),
+                "drain_seconds": round(elapsed - window, 1),
+                "sessions": dict(self.sessions),
+                "requests": total,
+                "throughput_rps": round(window_requests / window, 3) if window else 0,
+                "error_rate": round(failed / total, 4) if total else 0,
+                "latency": summarize(all_latencies),
+                "interactive_latency": interactive,
+                "slo_breached": interactive.get("p95_ms", 0) > slo_p95_ms,
+                "endpoints": endpoints
+            }
+
+class Client:
+    """一個虛擬用戶的 HTTP 會話"""
+
+    def __init__(self, base_url: str, timeout: float, token: Optional[str] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def call(self, recorder: Recorder, endpoint: str, method: str, path: str, **kwargs) -> Optional[dict]:
+        """發送請求並記錄到 recorder（endpoint 為路徑模板），成功時返回響應 JSON"""
+        started = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=self.timeout, **kwargs)
+            body = response.content
+            outcome = classify(response.status_code)
+        except requests.Timeout:
+            body, outcome = None, "timeout"
+        except requests.RequestException:
+            body, outcome = None, "connection_error"
+        recorder.record(endpoint, (time.perf_counter() - started) * 1000, outcome)
+        if outcome != "ok" or not body:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return None
+
+    def close(self):
+        self.session.close()
+
+class LoadTest:
+    """執行會話腳本並按階段收集結果"""
+
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self._rng_lock = threading.Lock()
+        self.accounts = []
+        self.personas = list(args.mix)
+        self.weights = [args.mix[name] for name in self.personas]
+
+    def new_random(self) -> random.Random:
+        # 每個會話使用獨立的隨機數生成器，種子從共享序列抽取
+        with self._rng_lock:
+            return random.Random(self.rng.getrandbits(64))
+
+    def think(self, rng: random.Random, stop: threading.Event):
+        """指數分佈的思考時間；階段結束時提前返回"""
+        if self.args.think_time > 0:
+            stop.wait(rng.expovariate(1 / self.args.think_time))
+
+    # ---- 準備 ----
+
+    def setup(self):
+        """註冊帳號並寫入公開計劃，供瀏覽和編輯會話使用（不計入結果）"""
+        recorder = Recorder()
+        anonymous = Client(self.args.base_url, self.args.timeout)
+        run_id = uuid.uuid4().hex[:8]
+        for index in range(self.args.accounts):
+            payload = anonymous.call(recorder, "setup.register", "POST", "/api/auth/register", json={
+                "email": f"load-{run_id}-{index}@example.com",
+                "password": f"LoadTest-{run_id}-password",
+                "username": f"load-{run_id}-{index}"
+            })
+            if payload and payload.get("token"):
+                self.accounts.append(payload["token"])
+        anonymous.close()
+        if not self.accounts and set(self.personas) - {"explore"}:
+            sys.exit(f"無法註冊測試帳號，請確認服務可訪問: {dict(recorder.outcomes)}")
+
+        for index in range(self.args.seed_plans if self.accounts else 0):
+            client = Client(self.args.base_url, self.args.timeout, self.accounts[index % len(self.accounts)])
+            client.call(recorder, "setup.create", "POST", "/api/travel-plans", json=self.plan_body(index, True))
+            client.close()
+        print(f"已準備 {len(self.accounts)} 個帳號和 {self.args.seed_plans} 個公開計劃", file=sys.stderr)
+
+    @staticmethod
+    def plan_body(index: int, public: bool) -> dict:
+        destination = DESTINATIONS[index % len(DESTINATIONS)]
+        return {
+            "title": f"{destination}三日遊 #{index}",
+            "destination": destination,
+            "start_date": "2024-07-01",
+            "end_date": "2024-07-03",
+            "budget": "30000",
+            "travelers": 2,
+            "is_public": public,
+            "days": [{"day": day + 1, "date": f"2024-07-0{day + 1}",
+                      "activities": [build_activity(day, i) for i in range(4)]} for day in range(3)]
+        }
+
+    # ---- 會話腳本 ----
+
+    def explore(self, recorder: Recorder, rng: random.Random, stop: threading.Event):
+        client = Client(self.args.base_url, self.args.timeout)
+        try:
+            payload = client.call(recorder, "GET /api/travel-plans/public", "GET", "/api/travel-plans/public?limit=12")
+            plans = (payload or {}).get("plans") or []
+            self.think(rng, stop)
+            if rng.random() < 0.4 and not stop.is_set():
+                client.call(recorder, "GET /api/travel-plans/public?page", "GET",
+                            "/api/travel-plans/public?limit=12&page=2")
+                self.think(rng, stop)
+            for plan in rng.sample(plans, min(len(plans), rng.randint(1, 3))):
+                if stop.is_set():
+                    break
+                client.call(recorder, "GET /api/plans/public/:id", "GET", f"/api/plans/public/{plan['id']}")
+                self.think(rng, stop)
+            if rng.random() < 0.5 and not stop.is_set():
+                client.call(recorder, "GET /api/travel-plans/search", "GET", "/api/travel-plans/search",
+                            params={"q": rng.choice(DESTINATIONS), "limit": 10})
+        finally:
+            client.close()
+
+    def edit(self, recorder: Recorder, rng: random.Random, stop: threading.Event):
+        client = Client(self.args.base_url, self.args.timeout, rng.choice(self.accounts))
+        try:
+            client.call(recorder, "GET /api/travel-plans", "GET", "/api/travel-plans?limit=10")
+            self.think(rng, stop)
+            created = client.call(recorder, "POST /api/travel-plans", "POST", "/api/travel-plans",
+                                  json=self.plan_body(rng.randrange(1000), rng.random() < 0.3))
+            if not created:
+                return
+            base = f"/api/travel-plans/{created['plan_id']}"
+            client.call(recorder, "GET /api/travel-plans/:id", "GET", base)
+            for _ in range(rng.randint(1, 3)):
+                if stop.is_set():
+                    break
+                self.think(rng, stop)
+                added = client.call(recorder, "POST /api/travel-plans/:id/activities", "POST", f"{base}/activities",
+                                    json={"day_index": rng.randrange(3), "activity": dict(build_activity(0, 5), id=None)})
+                if not added:
+                    continue
+                activity_id = added["activity_id"]
+                self.think(rng, stop)
+                activity = dict(build_activity(0, 6), id=activity_id, name="調整後的景點")
+                client.call(recorder, "PUT /api/travel-plans/:id/activities/:id", "PUT",
+                            f"{base}/activities/{activity_id}", json={"activity": activity})
+                self.think(rng, stop)
+                if rng.random() < 0.5:
+                    operations = [{"op": "update_activity", "activity_id": activity_id, "fields": {"time": "15:30"}},
+                                  {"op": "update_plan", "fields": {"title": "調整後的行程"}}]
+                    client.call(recorder, "PATCH /api/travel-plans/:id", "PATCH", base, json={"operations": operations})
+                else:
+                    client.call(recorder, "DELETE /api/travel-plans/:id/activities/:id", "DELETE",
+                                f"{base}/activities/{activity_id}")
+        finally:
+            client.close()
+
+    def generate(self, recorder: Recorder, rng: random.Random, stop: threading.Event):
+        client = Client(self.args.base_url, self.args.generate_timeout, rng.choice(self.accounts))
+        try:
+            body = {"destination": rng.choice(DESTINATIONS), "start_date": "2024-07-01", "end_date": "2024-07-03",
+                    "interests": ["文化", "美食"], "preference": rng.choice(["輕鬆", "緊湊"]), "companions": "朋友"}
+            created = client.call(recorder, GENERATE_ENDPOINT, "POST", "/api/travel-plans/generate", json=body)
+            if not created or stop.is_set():
+                return
+            self.think(rng, stop)
+            client.call(recorder, "GET /api/travel-plans/:id", "GET", f"/api/travel-plans/{created['plan_id']}")
+        finally:
+            client.close()
+
+    def session(self, recorder: Recorder, stop: threading.Event):
+        rng = self.new_random()
+        persona = rng.choices(self.personas, self.weights)[0]
+        recorder.count_session(f"{persona}_started")
+        try:
+            getattr(self, persona)(recorder, rng, stop)
+            recorder.count_session("completed")
+        except Exception as e:  # 腳本錯誤不應中斷整個階段
+            recorder.count_session("failed")
+            print(f"{persona} 會話異常: {e!r}", file=sys.stderr)
+
+    # ---- 負載模型 ----
+
+    def run_open(self, rate: float) -> Recorder:
+        """開放模型：會話按泊松過程到達，進行中的會話達到上限時丟棄新到達"""
+        recorder = Recorder()
+        stop = threading.Event()
+        in_flight = threading.Semaphore(self.args.max_sessions)
+        rng = self.new_random()
+
+        def run(task_stop):
+            try:
+                self.session(recorder, task_stop)
+            finally:
+                in_flight.release()
+
+        with ThreadPoolExecutor(max_workers=self.args.max_sessions, thread_name_prefix="session") as executor:
+            deadline = time.monotonic() + self.args.stage_duration
+            next_arrival = time.monotonic()
+            while True:
+                next_arrival += rng.expovariate(rate)
+                if next_arrival >= deadline:
+                    break
+                time.sleep(max(0.0, next_arrival - time.monotonic()))
+                if in_flight.acquire(blocking=False):
+                    executor.submit(run, stop)
+                else:
+                    recorder.count_session("dropped")
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            recorder.close_window()
+            # 停止到達後等待進行中的會話完成（跳過剩餘的思考時間）
+            stop.set()
+        return recorder
+
+    def run_closed(self, users: int) -> Recorder:
+        """封閉模型：固定數量的用戶循環執行會話"""
+        recorder = Recorder()
+        stop = threading.Event()
+
+        def user():
+            while not stop.is_set():
+                self.session(recorder, stop)
+                self.think(self.new_random(), stop)
+
+        threads = [threading.Thread(target=user, name=f"user-{n}", daemon=True) for n in range(int(users))]
+        for thread in threads:
+            thread.start()
+        stop.wait(self.args.stage_duration)
+        recorder.close_window()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        return recorder
+
+def upstream_stats(url: Optional[str], method: str = "GET") -> Optional[dict]:
+    if not url:
+        return None
+    try:
+        return requests.request(method, f"{url.rstrip('/')}/_stats", timeout=5).json()
+    except (requests.RequestException, ValueError):
+        return None
+
+def find_saturation(stages: List[dict], model: str, args) -> dict:
+    """第一個滿足任一飽和條件的階段，以及之前最後一個可持續的負載"""
+    previous = None
+    for stage in stages:
+        reasons = []
+        if stage["error_rate"] > args.max_error_rate:
+            reasons.append(f"錯誤率 {stage['error_rate']:.2%} 超過 {args.max_error_rate:.2%}")
+        if stage["slo_breached"]:
+            reasons.append(f"非生成端點 p95 {stage['interactive_latency']['p95_ms']} ms 超過 {args.slo_p95_ms} ms")
+        if stage["sessions"].get("dropped"):
+            reasons.append(f"丟棄 {stage['sessions']['dropped']} 個到達的會話")
+        # 開放模型的到達速率固定，飽和表現為延遲上升和丟棄；吞吐量停滯只在封閉模型中判斷
+        if model == "closed" and previous and previous["throughput_rps"]:
+            load_growth = stage["offered"] / previous["offered"] - 1
+            throughput_growth = stage["throughput_rps"] / previous["throughput_rps"] - 1
+            if load_growth > 0 and throughput_growth < load_growth * args.min_scaling:
+                reasons.append(f"負載增加 {load_growth:.0%} 而吞吐量只增加 {throughput_growth:.0%}")
+        if reasons:
+            return {
+                "saturated": True,
+                "offered": stage["offered"],
+                "reasons": reasons,
+                "max_sustainable_offered": previous["offered"] if previous else None,
+                "max_sustainable_throughput_rps": previous["throughput_rps"] if previous else None
+            }
+        previous = stage
+    return {
+        "saturated": False,
+        "max_sustainable_offered": previous["offered"] if previous else None,
+        "max_sustainable_throughput_rps": previous["throughput_rps"] if previous else None
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="以混合流量壓測已部署的服務")
+    parser.add_argument("--base-url", default="http://localhost:8080", help="被測服務的地址")
+    parser.add_argument("--upstreams-url", default=None, help="fake_upstreams 的地址，用於記錄上游請求統計")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("explore=70,edit=25,generate=5"),
+                        help="用戶類型比例，例如 explore=70,edit=25,generate=5")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rates", type=parse_levels, default=None, help="開放模型：各階段每秒到達的會話數")
+    load.add_argument("--users", type=parse_levels, default=None, help="封閉模型：各階段的並發用戶數")
+    parser.add_argument("--stage-duration", type=float, default=60, help="每個階段的秒數")
+    parser.add_argument("--think-time", type=float, default=2.0, help="請求之間的平均思考時間（秒，指數分佈，0 表示不等待）")
+    parser.add_argument("--max-sessions", type=int, default=200, help="開放模型中同時進行的會話上限")
+    parser.add_argument("--accounts", type=int, default=20, help="預先註冊的帳號數")
+    parser.add_argument("--seed-plans", type=int, default=50, help="預先寫入的公開計劃數")
+    parser.add_argument("--timeout", type=float, default=30, help="一般請求的超時秒數")
+    parser.add_argument("--generate-timeout", type=float, default=180, help="生成請求的超時秒數")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="判斷飽和的錯誤率閾值")
+    parser.add_argument("--slo-p95-ms", type=float, default=1000, help="判斷飽和的非生成端點 p95 閾值（毫秒）")
+    parser.add_argument("--min-scaling", type=float, default=0.5, help="封閉模型中吞吐量增幅低於用戶數增幅的此倍數時判斷為飽和")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=None, help="將結果寫入 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="與之前的結果文件比較")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允許的相對退化，默認 20%%")
+    args = parser.parse_args()
+
+    model = "closed" if args.users else "open"
+    levels = args.users or args.rates or [0.5, 1, 2, 4]
+    test = LoadTest(args)
+    test.setup()
+
+    stages, flattened = [], []
+    started = time.perf_counter()
+    for level in levels:
+        upstream_stats(args.upstreams_url, "DELETE")
+        stage_started = time.perf_counter()
+        recorder = test.run_open(level) if model == "open" else test.run_closed(level)
+        stage = dict(offered=level, **recorder.report(args.stage_duration, time.perf_counter() - stage_started,
+                                                      args.slo_p95_ms))
+        stage["upstream_requests"] = upstream_stats(args.upstreams_url)
+        stages.append(stage)
+        for endpoint in stage["endpoints"]:
+            flattened.append(dict(endpoint, name=f"{endpoint['name']}@{level:g}"))
+        print(f"負載 {level:g}: {stage['throughput_rps']} 請求/秒，錯誤率 {stage['error_rate']:.2%}，"
+              f"p95 {stage['latency'].get('p95_ms', 0)} ms，會話 {stage['sessions']}", file=sys.stderr)
+
+    results = {
+        "benchmark": "loadtest",
+        "environment": environment(),
+        "parameters": {
+            "base_url": args.base_url,
+            "model": model,
+            "levels": levels,
+            "unit": "users" if model == "closed" else "sessions_per_second",
+            "mix": args.mix,
+            "stage_duration_seconds": args.stage_duration,
+            "think_time_seconds": args.think_time,
+            "max_sessions": args.max_sessions,
+            "accounts": len(test.accounts),
+            "seed_plans": args.seed_plans,
+            "seed": args.seed
+        },
+        "duration_seconds": round(time.perf_counter() - started, 1),
+        "saturation": find_saturation(stages, model, args),
+        "stages": stages,
+        "results": flattened
+    }
+    write_results(results, args.output)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(flattened, baseline, REGRESSION_METRICS, args.threshold)
+        for regression in regressions:
+            print(f"退化: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+14 天旅行計劃的序列化基準
+
+比較兩種響應序列化方式：
+    before  遞歸 convert_datetime + 逐欄位 isoformat/str 格式化 + Flask 默認 JSON 提供者
+    after   直接將數據庫文檔交給 FastJSONProvider（orjson）
+
+用法：
+    python -m benchmarks.serialization [--days 14] [--activities 6] [--repeat 200] [--output results.json]
+"""
+import argparse
+import copy
+import json
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta
+from bson.objectid import ObjectId
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.utils.json_provider import FastJSONProvider, orjson
+
+def build_plan(days: int = 14, activities_per_day: int = 6):
+    """生成與 enrich_travel_plan 輸出結構相同的計劃文檔"""
+    now = datetime.utcnow()
+    plan = {
+        "_id": ObjectId(),
+        "user_id": ObjectId(),
+        "title": "東京深度遊",
+        "destination": "東京",
+        "start_date": "2024-04-01",
+        "end_date": (datetime(2024, 4, 1) + timedelta(days=days - 1)).strftime("%Y-%m-%d"),
+        "budget": "30000",
+        "travelers": 2,
+        "created_at": now,
+        "updated_at": now,
+        "is_public": True,
+        "version": 1,
+        "days": []
+    }
+    for day in range(days):
+        activities = []
+        for index in range(activities_per_day):
+            activities.append({
+                "id": str(uuid.uuid4()),
+                "name": f"景點 {day + 1}-{index + 1}",
+                "location": f"東京都千代田區 {index + 1} 丁目",
+                "type": "景點",
+                "time": f"{9 + index * 2:02d}:00",
+                "duration_minutes": 90,
+                "lat": 35.68 + index * 0.01,
+                "lng": 139.76 + index * 0.01,
+                "place_id": f"ChIJ{uuid.uuid4().hex[:23]}",
+                "address": "日本東京都千代田區丸之內 1 丁目",
+                "rating": 4.5,
+                "opening_hours": [f"星期{weekday}: 09:00 – 18:00" for weekday in "一二三四五六日"],
+                "photos": [f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference={uuid.uuid4().hex}"
+                           for _ in range(3)],
+                "description": "著名的歷史景點，適合拍照和散步。" * 3,
+                "fetched_at": now
+            })
+        plan["days"].append({"day": day + 1, "date": "", "activities": activities})
+    return plan
+
+def convert_datetime(obj):
+    """舊的遞歸日期時間轉換（enrich_travel_plan 曾在返回前對整個計劃執行）"""
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            if isinstance(value, datetime):
+                obj[key] = value.isoformat()
+            elif isinstance(value, (dict, list)):
+                convert_datetime(value)
+    elif isinstance(obj, list):
+        for i, item in enumerate(obj):
+            if isinstance(item, datetime):
+                obj[i] = item.isoformat()
+            elif isinstance(item, (dict, list)):
+                convert_datetime(item)
+    return obj
+
+def serialize_before(provider, plan):
+    # convert_datetime 會原地修改文檔，調用方需傳入副本
+    plan = convert_datetime(plan)
+    formatted_plan = {
+        'plan_id': str(plan['_id']),
+        'user_id': str(plan['user_id']),
+        'title': plan['title'],
+        'created_at': plan['created_at'],
+        'updated_at': plan['updated_at'],
+        'is_public': plan['is_public'],
+        'version': plan['version'],
+        'destination': plan['destination'],
+        'start_date': plan['start_date'],
+        'end_date': plan['end_date'],
+        'budget': plan.get('budget', '0'),
+        'travelers': plan.get('travelers', 1),
+        'days': plan['days']
+    }
+    return provider.dumps({'success': True, 'plan': formatted_plan}, separators=(',', ':')).encode('utf-8')
+
+def serialize_after(provider, plan):
+    formatted_plan = {
+        'plan_id': plan['_id'],
+        'user_id': plan['user_id'],
+        'title': plan['title'],
+        'created_at': plan['created_at'],
+        'updated_at': plan['updated_at'],
+        'is_public': plan['is_public'],
+        'version': plan['version'],
+        'destination': plan['destination'],
+        'start_date': plan['start_date'],
+        'end_date': plan['end_date'],
+        'budget': plan.get('budget', '0'),
+        'travelers': plan.get('travelers', 1),
+        'days': plan['days']
+    }
+    return provider.dumps_bytes({'success': True, 'plan': formatted_plan})
+
+def measure(func, repeat):
+    """返回每次調用的耗時統計（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "mean_ms": round(statistics.fmean(samples), 4),
+        "median_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 4),
+        "min_ms": round(samples[0], 4)
+    }
+
+def run(days=14, activities_per_day=6, repeat=200):
+    app = Flask(__name__)
+    before_provider = DefaultJSONProvider(app)
+    after_provider = FastJSONProvider(app)
+    plan = build_plan(days, activities_per_day)
+
+    before_body = serialize_before(before_provider, copy.deepcopy(plan))
+    after_body = serialize_after(after_provider, plan)
+    # 兩種方式輸出的內容必須一致（鍵順序和轉義方式可以不同）
+    assert json.loads(before_body) == json.loads(after_body)
+
+    # 預先複製文檔，避免把 deepcopy 的耗時計入舊方式
+    copies = iter([copy.deepcopy(plan) for _ in range(repeat)])
+    results = {
+        "benchmark": "serialization",
+        "plan": {"days": days, "activities_per_day": activities_per_day},
+        "serializer": "orjson" if orjson is not None else "json",
+        "repeat": repeat,
+        "before": {**measure(lambda: serialize_before(before_provider, next(copies)), repeat), "bytes": len(before_body)},
+        "after": {**measure(lambda: serialize_after(after_provider, plan), repeat), "bytes": len(after_body)}
+    }
+    results["speedup"] = round(results["before"]["median_ms"] / results["after"]["median_ms"], 2)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="旅行計劃序列化基準")
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--activities", type=int, default=6, help="每天的活動數量")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--output", default=None, help="將結果寫入 JSON 文件")
+    args = parser.parse_args()
+
+    results = run(args.days, args.activities, args.repeat)
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+"""
+OpenAI 和 Google Places 的本地假上游（用於離線基準測試和壓力測試）
+
+在 back-end 目錄下運行：
+    python -m fake_upstreams --port 8090 --openai "latency=lognormal:8000:0.4" --places "latency=lognormal:120:0.5"
+
+並將應用指向假上游：
+    OPENAI_API_URL=http://localhost:8090/v1/chat/completions
+    GOOGLE_PLACES_API_URL=http://localhost:8090/maps/api/place
+"""
+from fake_upstreams.faults import FaultProfile, LatencyDistribution
+from fake_upstreams.server import UpstreamState, FakeUpstreamServer, create_fake_app, load_fixtures
@@ -0,0 +1,33 @@
+"""python -m fake_upstreams 的命令行入口"""
+import os
+import argparse
+import logging
+from werkzeug.serving import run_simple
+
+from fake_upstreams.faults import FaultProfile
+from fake_upstreams.server import UpstreamState, create_fake_app, load_fixtures
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 和 Google Places 的本地假上游")
+    parser.add_argument("--host", default=os.getenv("FAKE_UPSTREAMS_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("FAKE_UPSTREAMS_PORT", "8090")))
+    parser.add_argument("--seed", type=int, default=int(os.getenv("FAKE_UPSTREAMS_SEED", "0")),
+                        help="隨機數種子，相同的種子和請求順序得到相同的延遲和故障")
+    parser.add_argument("--openai", default=os.getenv("FAKE_UPSTREAMS_OPENAI", ""),
+                        help='OpenAI 的故障設置，例如 "latency=lognormal:8000:0.4,rate_limit_rate=0.02,truncate_rate=0.01"')
+    parser.add_argument("--places", default=os.getenv("FAKE_UPSTREAMS_PLACES", ""),
+                        help='Places 的故障設置，例如 "latency=uniform:50:200,error_rate=0.01"')
+    parser.add_argument("--fixtures", default=os.getenv("FAKE_UPSTREAMS_FIXTURES", ""),
+                        help="錄製的回應文件（JSON），未錄製的請求使用生成的回應")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    state = UpstreamState(
+        faults={'openai': FaultProfile.parse(args.openai), 'places': FaultProfile.parse(args.places)},
+        fixtures=load_fixtures(args.fixtures),
+        seed=args.seed
+    )
+    run_simple(args.host, args.port, create_fake_app(state), threaded=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""OpenAI chat completions 假端點（包括串流輸出）"""
+import re
+import json
+import time
+import uuid
+import hashlib
+from flask import Blueprint, Response, jsonify, request
+
+from fake_upstreams.faults import OUTCOME_ERROR, OUTCOME_RATE_LIMITED, OUTCOME_TRUNCATED
+from fake_upstreams.server import get_state
+
+chat_bp = Blueprint('fake_openai', __name__)
+
+# 從 gpt_service.create_prompt 生成的提示中讀取天數、目的地和行程偏好
+DAYS_PATTERN = re.compile(r'\*\*(\d+)\s*天的\s*(.+?)\s*旅遊行程\*\*')
+PREFERENCE_PATTERN = re.compile(r'行程偏好\*\*：\s*(\S+?)（')
+ACTIVITIES_PER_DAY = {'輕鬆': 3, '緊湊': 4, '無限制': 5}
+ACTIVITY_TYPES = ('景點', '餐廳', '景點', '購物', '景點')
+
+# 串流輸出時每個片段的字符數
+STREAM_CHUNK_CHARS = 16
+
+def _coordinates(destination: str):
+    """按目的地名稱生成固定的中心坐標"""
+    digest = int(hashlib.sha1(destination.encode('utf-8')).hexdigest(), 16)
+    return -50 + (digest % 10000) / 100, -170 + ((digest >> 20) % 34000) / 100
+
+def build_itinerary(prompt: str) -> dict:
+    """按提示生成與真實模型輸出結構相同的行程"""
+    match = DAYS_PATTERN.search(prompt)
+    days, destination = (int(match.group(1)), match.group(2)) if match else (3, '東京')
+    preference = PREFERENCE_PATTERN.search(prompt)
+    per_day = ACTIVITIES_PER_DAY.get(preference.group(1) if preference else '', 3)
+    lat, lng = _coordinates(destination)
+
+    itinerary = {'days': []}
+    for day in range(1, days + 1):
+        schedule = []
+        for index in range(per_day):
+            schedule.append({
+                'time': f'{9 + index * 3:02d}:00',
+                'type': ACTIVITY_TYPES[index % len(ACTIVITY_TYPES)],
+                'name': f'{destination}景點{day}-{index + 1}',
+                'lat': round(lat + day * 0.01, 4),
+                'lng': round(lng + index * 0.01, 4)
+            })
+        itinerary['days'].append({'day': day, 'schedule': schedule})
+    return itinerary
+
+def generate_content(prompt: str) -> str:
+    # 真實模型通常以 Markdown 代碼塊包裹 JSON，gpt_service 按第一個 { 和最後一個 } 提取
+    return '```json\n' + json.dumps(build_itinerary(prompt), ensure_ascii=False, indent=2) + '\n```'
+
+def _error(status: int, error_type: str, message: str, headers=None):
+    response = jsonify({'error': {'message': message, 'type': error_type, 'param': None, 'code': None}})
+    response.status_code = status
+    response.headers.extend(headers or {})
+    return response
+
+def _usage(prompt: str, content: str) -> dict:
+    # 粗略按每 4 個字符一個 token 估算
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(content) // 4)
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens}
+
+def _stream(completion_id: str, model: str, content: str, finish_reason: str, chunk_delay: float):
+    created = int(time.time())
+
+    def event(delta, reason=None):
+        chunk = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                 'choices': [{'index': 0, 'delta': delta, 'finish_reason': reason}]}
+        return f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'
+
+    yield event({'role': 'assistant', 'content': ''})
+    for start in range(0, len(content), STREAM_CHUNK_CHARS):
+        if chunk_delay:
+            time.sleep(chunk_delay)
+        yield event({'content': content[start:start + STREAM_CHUNK_CHARS]})
+    yield event({}, finish_reason)
+    yield 'data: [DONE]\n\n'
+
+@chat_bp.route('/v1/chat/completions', methods=['POST'])
+def chat_completions():
+    state = get_state()
+    injector = state.injectors['openai']
+    if not request.headers.get('Authorization', '').startswith('Bearer '):
+        state.record('openai.chat', 'unauthorized')
+        return _error(401, 'invalid_request_error', 'You didn\'t provide an API key.')
+
+    body = request.get_json(silent=True) or {}
+    model = body.get('model', 'gpt-4-turbo')
+    messages = body.get('messages') or []
+    prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+
+    delay, outcome = injector.draw()
+    state.record('openai.chat', outcome)
+    time.sleep(delay)
+    if outcome == OUTCOME_ERROR:
+        return _error(500, 'server_error', 'The server had an error while processing your request.')
+    if outcome == OUTCOME_RATE_LIMITED:
+        return _error(429, 'requests', 'Rate limit reached for requests.',
+                      {'Retry-After': '1', 'x-ratelimit-remaining-requests': '0'})
+
+    fixture = state.next_chat_fixture()
+    if isinstance(fixture, dict):
+        # 完整的錄製回應原樣返回（不支持串流和截斷）
+        return jsonify(fixture)
+    content = fixture if fixture is not None else generate_content(prompt)
+
+    finish_reason = 'stop'
+    if outcome == OUTCOME_TRUNCATED:
+        content = content[:int(len(content) * injector.uniform(0.3, 0.9))]
+        finish_reason = 'length'
+
+    completion_id = f'chatcmpl-fake{uuid.uuid4().hex[:20]}'
+    if body.get('stream'):
+        chunk_delay = injector.profile.stream_chunk_ms / 1000
+        return Response(_stream(completion_id, model, content, finish_reason, chunk_delay),
+                        mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+    return jsonify({
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content},
+                     'finish_reason': finish_reason}],
+        'usage': _usage(prompt, content)
+    })
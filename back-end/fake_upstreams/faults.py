@@ -0,0 +1,136 @@
+"""延遲分佈和故障注入設置"""
+import math
+import random
+import threading
+from typing import Any, Dict
+
+# 延遲分佈（毫秒）：
+#   fixed:50            固定 50 ms
+#   uniform:20:80       20 到 80 ms 均勻分佈
+#   normal:100:20       平均 100 ms、標準差 20 ms（小於 0 時取 0）
+#   lognormal:300:0.5   中位數 300 ms、對數標準差 0.5（長尾，接近真實 API）
+#   exp:100             平均 100 ms 的指數分佈
+LATENCY_KINDS = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+
+class LatencyDistribution:
+    """按設置字符串抽取延遲秒數"""
+
+    def __init__(self, spec: str = 'fixed:0'):
+        kind, *params = spec.split(':')
+        if kind not in LATENCY_KINDS or len(params) != LATENCY_KINDS[kind]:
+            raise ValueError(f"無效的延遲分佈: {spec}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(param) for param in params]
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == 'fixed':
+            ms = self.params[0]
+        elif self.kind == 'uniform':
+            ms = rng.uniform(*self.params)
+        elif self.kind == 'normal':
+            ms = rng.gauss(*self.params)
+        elif self.kind == 'lognormal':
+            median, sigma = self.params
+            ms = rng.lognormvariate(math.log(median), sigma) if median > 0 else 0
+        else:
+            ms = rng.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0
+        return max(ms, 0) / 1000
+
+class FaultProfile:
+    """
+    一個上游服務的故障設置
+
+    每個請求依次按比例判斷：服務器錯誤（HTTP 500）、限流（OpenAI 返回 429，
+    Places 返回 OVER_QUERY_LIMIT）、截斷輸出（OpenAI 內容在中途截斷並以 length 結束，
+    Places 響應體截斷為無效 JSON）。比例為 0 到 1 之間的小數。
+    """
+
+    FIELDS = ('latency', 'error_rate', 'rate_limit_rate', 'truncate_rate', 'stream_chunk_ms')
+
+    def __init__(self, latency: str = 'fixed:0', error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 truncate_rate: float = 0.0, stream_chunk_ms: float = 0.0):
+        self.latency = LatencyDistribution(latency)
+        self.error_rate = float(error_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self.truncate_rate = float(truncate_rate)
+        self.stream_chunk_ms = float(stream_chunk_ms)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'FaultProfile':
+        """
+        解析 "latency=lognormal:300:0.5,error_rate=0.01,rate_limit_rate=0.02" 形式的設置
+
+        Raises:
+            ValueError: 格式或欄位名稱無效時
+        """
+        values = {}
+        for item in (spec or '').split(','):
+            item = item.strip()
+            if not item:
+                continue
+            if '=' not in item:
+                raise ValueError(f"無效的故障設置: {item}")
+            key, value = item.split('=', 1)
+            key = key.strip()
+            if key not in cls.FIELDS:
+                raise ValueError(f"未知的故障設置欄位: {key}")
+            values[key] = value.strip()
+        return cls(**values)
+
+    @classmethod
+    def from_value(cls, value: Any) -> 'FaultProfile':
+        """接受設置字符串或字典（控制端點的請求體）"""
+        if isinstance(value, dict):
+            unknown = set(value) - set(cls.FIELDS)
+            if unknown:
+                raise ValueError(f"未知的故障設置欄位: {', '.join(sorted(unknown))}")
+            return cls(**value)
+        return cls.parse(value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'latency': self.latency.spec,
+            'error_rate': self.error_rate,
+            'rate_limit_rate': self.rate_limit_rate,
+            'truncate_rate': self.truncate_rate,
+            'stream_chunk_ms': self.stream_chunk_ms
+        }
+
+# 判斷結果
+OUTCOME_OK = 'ok'
+OUTCOME_ERROR = 'error'
+OUTCOME_RATE_LIMITED = 'rate_limited'
+OUTCOME_TRUNCATED = 'truncated'
+
+class FaultInjector:
+    """
+    按故障設置為每個請求抽取延遲和結果
+
+    使用固定種子的隨機數生成器，同樣的請求順序得到同樣的結果，便於重現基準測試。
+    """
+
+    def __init__(self, profile: FaultProfile, seed: int = 0):
+        self.profile = profile
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def draw(self):
+        """返回 (延遲秒數, 結果)"""
+        profile = self.profile
+        with self._lock:
+            delay = profile.latency.sample(self._rng)
+            roll = self._rng.random()
+        if roll < profile.error_rate:
+            return delay, OUTCOME_ERROR
+        roll -= profile.error_rate
+        if roll < profile.rate_limit_rate:
+            return delay, OUTCOME_RATE_LIMITED
+        roll -= profile.rate_limit_rate
+        if roll < profile.truncate_rate:
+            return delay, OUTCOME_TRUNCATED
+        return delay, OUTCOME_OK
+
+    def uniform(self, low: float, high: float) -> float:
+        with self._lock:
+            return self._rng.uniform(low, high)
@@ -0,0 +1,122 @@
+"""Google Places textsearch、details 和 photo 假端點"""
+import time
+import hashlib
+from flask import Blueprint, Response, jsonify, request
+
+from fake_upstreams.faults import OUTCOME_ERROR, OUTCOME_RATE_LIMITED, OUTCOME_TRUNCATED
+from fake_upstreams.server import get_state
+
+places_bp = Blueprint('fake_places', __name__, url_prefix='/maps/api/place')
+
+# 1x1 像素的 PNG，照片端點返回的內容
+PHOTO_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010806000000'
+    '1f15c4890000000d49444154789c6360f8cfc0f01f0005000201e5279ae80000000049454e44ae426082'
+)
+
+WEEKDAYS = ('星期一', '星期二', '星期三', '星期四', '星期五', '星期六', '星期日')
+
+def _digest(value: str) -> int:
+    return int(hashlib.sha1(value.encode('utf-8')).hexdigest(), 16)
+
+def build_place(query: str) -> dict:
+    """按查詢字符串生成固定的搜索結果（同一查詢總是得到同一地點）"""
+    digest = _digest(query)
+    place_id = f'fake-{digest % (16 ** 24):024x}'
+    name = query.split(' ', 1)[-1] or query
+    return {
+        'place_id': place_id,
+        'name': name,
+        'formatted_address': f'{query} {digest % 100 + 1} 號',
+        'geometry': {'location': {'lat': round(-50 + (digest % 10000) / 100, 6),
+                                  'lng': round(-170 + ((digest >> 20) % 34000) / 100, 6)}},
+        'rating': round(3.5 + (digest % 16) / 10, 1),
+        'types': ['tourist_attraction', 'point_of_interest', 'establishment'],
+        'photos': [{'photo_reference': f'{place_id}-{n}', 'height': 800, 'width': 1200} for n in range(3)]
+    }
+
+def build_details(place: dict) -> dict:
+    details = dict(place)
+    details['opening_hours'] = {'open_now': True, 'weekday_text': [f'{day}: 09:00 – 18:00' for day in WEEKDAYS]}
+    return details
+
+def _fault_response(state, route: str):
+    """抽取延遲和故障，返回故障響應或 (None, 結果)"""
+    delay, outcome = state.injectors['places'].draw()
+    state.record(route, outcome)
+    time.sleep(delay)
+    if outcome == OUTCOME_ERROR:
+        return Response('Internal Server Error', status=500), outcome
+    return None, outcome
+
+def _json(state, payload: dict, outcome: str):
+    response = jsonify(payload)
+    if outcome == OUTCOME_TRUNCATED:
+        # 響應體在中途截斷，客戶端解析 JSON 時失敗
+        body = response.get_data()
+        response.set_data(body[:int(len(body) * state.injectors['places'].uniform(0.3, 0.9))])
+    return response
+
+def _denied(payload_key: str):
+    return jsonify({payload_key: [] if payload_key == 'results' else {}, 'status': 'REQUEST_DENIED',
+                    'error_message': 'The provided API key is invalid.'})
+
+def _over_query_limit(payload_key: str):
+    return jsonify({payload_key: [] if payload_key == 'results' else {}, 'status': 'OVER_QUERY_LIMIT',
+                    'error_message': 'You have exceeded your rate-limit for this API.'})
+
+@places_bp.route('/textsearch/json')
+def textsearch():
+    state = get_state()
+    if not request.args.get('key'):
+        return _denied('results')
+    failure, outcome = _fault_response(state, 'places.textsearch')
+    if failure is not None:
+        return failure
+    if outcome == OUTCOME_RATE_LIMITED:
+        return _over_query_limit('results')
+
+    query = request.args.get('query', '')
+    recorded = (state.fixtures.get('textsearch') or {}).get(query)
+    if recorded is not None:
+        return _json(state, recorded, outcome)
+    if not query.strip():
+        return jsonify({'html_attributions': [], 'results': [], 'status': 'INVALID_REQUEST'})
+
+    place = build_place(query)
+    state.places[place['place_id']] = place
+    return _json(state, {'html_attributions': [], 'results': [place], 'status': 'OK'}, outcome)
+
+@places_bp.route('/details/json')
+def details():
+    state = get_state()
+    if not request.args.get('key'):
+        return _denied('result')
+    failure, outcome = _fault_response(state, 'places.details')
+    if failure is not None:
+        return failure
+    if outcome == OUTCOME_RATE_LIMITED:
+        return _over_query_limit('result')
+
+    place_id = request.args.get('place_id', '')
+    recorded = (state.fixtures.get('details') or {}).get(place_id)
+    if recorded is not None:
+        return _json(state, recorded, outcome)
+    # 未經過搜索的地點ID（例如假上游重啟後）按ID生成
+    place = state.places.get(place_id) or dict(build_place(place_id), place_id=place_id)
+    return _json(state, {'html_attributions': [], 'result': build_details(place), 'status': 'OK'}, outcome)
+
+@places_bp.route('/photo')
+def photo():
+    state = get_state()
+    if not request.args.get('key') or not request.args.get('photoreference'):
+        return Response('Bad Request', status=400)
+    failure, outcome = _fault_response(state, 'places.photo')
+    if failure is not None:
+        return failure
+    if outcome == OUTCOME_RATE_LIMITED:
+        return Response('Too Many Requests', status=429)
+    body = PHOTO_BYTES
+    if outcome == OUTCOME_TRUNCATED:
+        body = body[:len(body) // 2]
+    return Response(body, mimetype='image/png', headers={'Cache-Control': 'public, max-age=86400'})
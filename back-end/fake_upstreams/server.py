@@ -0,0 +1,161 @@
+"""假上游服務的應用、共享狀態和控制端點"""
+import json
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Optional
+from flask import Flask, current_app, jsonify, request
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from fake_upstreams.faults import FaultInjector, FaultProfile
+
+# 設置日誌
+logger = logging.getLogger(__name__)
+
+UPSTREAMS = ('openai', 'places')
+
+class UpstreamState:
+    """
+    假上游的共享狀態：故障設置、錄製的回應和請求統計
+
+    Args:
+        faults: {'openai': FaultProfile 或設置字符串, 'places': ...}
+        fixtures: 錄製的回應 {'chat': [內容或完整回應...], 'textsearch': {查詢: 回應}, 'details': {地點ID: 回應}}
+        seed: 隨機數種子，相同的種子和請求順序得到相同的延遲和故障
+    """
+
+    def __init__(self, faults: Optional[Dict[str, Any]] = None, fixtures: Optional[Dict[str, Any]] = None,
+                 seed: int = 0):
+        self.seed = seed
+        self.fixtures = fixtures or {}
+        self.injectors = {}
+        self.stats = Counter()
+        # 生成的地點按 place_id 保存，詳情查詢返回與搜索一致的名稱和坐標
+        self.places = {}
+        self._chat_index = 0
+        self._lock = threading.Lock()
+        faults = faults or {}
+        for index, name in enumerate(UPSTREAMS):
+            profile = faults.get(name) or FaultProfile()
+            if not isinstance(profile, FaultProfile):
+                profile = FaultProfile.from_value(profile)
+            self.injectors[name] = FaultInjector(profile, seed + index)
+
+    def set_faults(self, name: str, profile: FaultProfile):
+        """替換故障設置並重置隨機數序列"""
+        self.injectors[name] = FaultInjector(profile, self.seed + UPSTREAMS.index(name))
+
+    def record(self, route: str, outcome: str):
+        with self._lock:
+            self.stats[f'{route}:{outcome}'] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats.clear()
+
+    def next_chat_fixture(self):
+        """按順序循環返回錄製的 chat 回應，沒有錄製時返回 None"""
+        chat = self.fixtures.get('chat') or []
+        if not chat:
+            return None
+        with self._lock:
+            fixture = chat[self._chat_index % len(chat)]
+            self._chat_index += 1
+        return fixture
+
+def get_state() -> UpstreamState:
+    return current_app.extensions['fake_upstreams']
+
+def load_fixtures(path: Optional[str]) -> Dict[str, Any]:
+    """讀取錄製的回應文件（JSON）"""
+    if not path:
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def faults_view():
+    """GET 返回當前故障設置；PUT 以 {"openai": ..., "places": ...} 替換（值為設置字符串或字典）"""
+    state = get_state()
+    if request.method == 'PUT':
+        body = request.get_json(silent=True) or {}
+        try:
+            profiles = {name: FaultProfile.from_value(value) for name, value in body.items() if name in UPSTREAMS}
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        for name, profile in profiles.items():
+            state.set_faults(name, profile)
+            logger.info("已更新 %s 的故障設置: %s", name, profile.to_dict())
+    return jsonify({name: injector.profile.to_dict() for name, injector in state.injectors.items()})
+
+def stats_view():
+    """GET 返回各路由按結果分類的請求數；DELETE 清零"""
+    state = get_state()
+    if request.method == 'DELETE':
+        state.reset_stats()
+    return jsonify(state.snapshot())
+
+def create_fake_app(state: Optional[UpstreamState] = None) -> Flask:
+    """創建同時提供 OpenAI 和 Google Places 假端點的應用"""
+    from fake_upstreams.chat import chat_bp
+    from fake_upstreams.places import places_bp
+
+    app = Flask(__name__)
+    app.json.ensure_ascii = False
+    app.extensions['fake_upstreams'] = state or UpstreamState()
+    app.register_blueprint(chat_bp)
+    app.register_blueprint(places_bp)
+    app.add_url_rule('/_faults', 'faults', faults_view, methods=['GET', 'PUT'])
+    app.add_url_rule('/_stats', 'stats', stats_view, methods=['GET', 'DELETE'])
+    return app
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """不輸出訪問日誌（在基準測試進程內運行時避免干擾結果輸出）"""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+class FakeUpstreamServer:
+    """
+    在後台線程中運行假上游（供基準測試在同一進程內使用）
+
+    用法：
+        with FakeUpstreamServer(UpstreamState(seed=1)) as server:
+            os.environ['OPENAI_API_URL'] = server.openai_url
+    """
+
+    def __init__(self, state: Optional[UpstreamState] = None, host: str = '127.0.0.1', port: int = 0):
+        self.state = state or UpstreamState()
+        self.app = create_fake_app(self.state)
+        self._server = make_server(host, port, self.app, threaded=True, request_handler=QuietRequestHandler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name='fake-upstreams', daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://{self._server.host}:{self._server.port}'
+
+    @property
+    def openai_url(self) -> str:
+        return f'{self.url}/v1/chat/completions'
+
+    @property
+    def places_url(self) -> str:
+        return f'{self.url}/maps/api/place'
+
+    def start(self) -> 'FakeUpstreamServer':
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
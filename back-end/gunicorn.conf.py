@@ -0,0 +1,58 @@
+"""
+Gunicorn 配置
+
+工作進程數 × 線程數均可通過環境變數調整，默認使用所有 CPU 核心：
+    GUNICORN_WORKERS   工作進程數（默認為 CPU 核心數）
+    GUNICORN_THREADS   每個工作進程的線程數（默認 8）
+    GUNICORN_TIMEOUT   工作進程超時秒數（默認 0，生成行程可能耗時較長）
+
+MongoDB 客戶端在每個工作進程首次訪問數據庫時才創建，
+MONGO_MAX_POOL_SIZE 應不小於 GUNICORN_THREADS。
+"""
+import os
+import multiprocessing
+
+bind = f":{os.getenv('PORT', '8080')}"
+
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '0'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+
+# 定期回收工作進程以釋放緩存佔用的內存（0 表示不回收）
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', '0'))
+
+# 預加載應用可以共享只讀內存；數據庫客戶端在 fork 後才創建，因此是安全的
+preload_app = os.getenv('GUNICORN_PRELOAD', 'false').lower() in ('true', '1', 't')
+
+accesslog = '-'
+errorlog = '-'
+
+def post_fork(server, worker):
+    """工作進程 fork 後丟棄從主進程繼承的數據庫客戶端、緩存和限流連接、密碼哈希進程池以及 Places 磁盤緩存連接"""
+    from app.models.db import Database
+    from app.utils.response_cache import response_cache
+    from app.utils.rate_limit import rate_limiter
+    from app.utils.password_hasher import password_hasher
+    from app.utils.places_disk_cache import places_disk_cache
+    from app.utils import logging_setup
+    if preload_app:
+        # 預加載時日誌監聽線程在主進程中啟動，不會隨 fork 複製到工作進程
+        logging_setup.reset_after_fork()
+    Database.reset_after_fork()
+    response_cache.reset()
+    rate_limiter.reset()
+    password_hasher.reset()
+    places_disk_cache.reset()
+    server.log.info(f"工作進程 {worker.pid} 已啟動")
+
+def worker_exit(server, worker):
+    """工作進程退出時關閉數據庫連接和密碼哈希進程池"""
+    from app.models.db import Database
+    from app.utils.password_hasher import password_hasher
+    Database.get_instance().close()
+    password_hasher.shutdown()
+    server.log.info(f"工作進程 {worker.pid} 已退出，數據庫連接已關閉")
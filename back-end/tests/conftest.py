@@ -0,0 +1,86 @@
+"""共用的測試夾具：以 mongomock 代替 MongoDB 的應用和客戶端"""
+import os
+import uuid
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app import create_app
+from app.models.db import Database
+from app.models.travel_plan import TravelPlan
+from app.utils.response_cache import response_cache
+
+mongomock = pytest.importorskip('mongomock')
+
+TEST_DB_NAME = 'travel_planner_test'
+
+@pytest.fixture
+def database():
+    """將 mongomock 客戶端注入 Database，測試結束後恢復"""
+    saved = (Database._client, Database._db, Database._pid)
+    client = mongomock.MongoClient()
+    Database._client = client
+    Database._db = client[TEST_DB_NAME]
+    Database._pid = os.getpid()
+    TravelPlan._indexes_ensured = False
+    yield Database._db
+    Database._client, Database._db, Database._pid = saved
+    TravelPlan._indexes_ensured = False
+
+@pytest.fixture
+def app(database):
+    # 響應緩存是進程級單例，每個測試從空緩存開始
+    response_cache.reset()
+    yield create_app({'TESTING': True, 'SECRET_KEY': 'test-secret-key-0123456789abcdef'})
+    response_cache.reset()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def auth_headers(app):
+    """返回 (用戶ID, 帶令牌的請求頭)"""
+    from app.api.auth import generate_token
+
+    user_id = ObjectId()
+    with app.app_context():
+        token = generate_token(str(user_id))
+    return user_id, {'Authorization': f'Bearer {token}'}
+
+def build_days(day_count=2, activities_per_day=2):
+    return [
+        {
+            'day': day + 1,
+            'date': f'2024-07-0{day + 1}',
+            'activities': [
+                {'id': str(uuid.uuid4()), 'name': f'景點 {day + 1}-{index + 1}', 'time': f'{9 + index:02d}:00'}
+                for index in range(activities_per_day)
+            ]
+        }
+        for day in range(day_count)
+    ]
+
+def insert_plan(user_id, created_at=None, **fields):
+    """直接寫入一個計劃文檔（包括派生欄位），返回寫入的文檔"""
+    created_at = created_at or datetime(2024, 6, 1)
+    plan = {
+        '_id': ObjectId(),
+        'user_id': user_id,
+        'title': '東京兩日遊',
+        'destination': '東京',
+        'start_date': '2024-07-01',
+        'end_date': '2024-07-02',
+        'budget': '1000',
+        'travelers': 2,
+        'is_public': True,
+        'version': '1.0',
+        'created_at': created_at,
+        'updated_at': created_at,
+        'days': build_days(),
+        **fields
+    }
+    plan.update(TravelPlan.derived_fields(plan))
+    TravelPlan.get_collection().insert_one(plan)
+    return plan
@@ -0,0 +1,95 @@
+"""find_by_id 的活動ID修復"""
+import copy
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.models.db import READ_PROFILE_PUBLIC
+from app.models.travel_plan import TravelPlan
+from app.utils.plan_patch import UUID_PATTERN
+
+from conftest import build_days
+
+@pytest.fixture
+def legacy_plan(database):
+    """活動ID缺失或不是UUID格式的舊計劃"""
+    days = build_days()
+    days[0]['activities'][0]['id'] = 'legacy-1'
+    del days[1]['activities'][1]['id']
+    plan = {
+        '_id': ObjectId(), 'user_id': ObjectId(), 'title': '舊計劃', 'is_public': True, 'version': '1.0',
+        'destination': '東京', 'start_date': '2024-07-01', 'end_date': '2024-07-02',
+        'created_at': datetime(2024, 1, 1), 'updated_at': datetime(2024, 1, 1), 'days': days
+    }
+    TravelPlan.get_collection().insert_one(copy.deepcopy(plan))
+    return plan
+
+@pytest.fixture
+def stale_replica(database, monkeypatch, legacy_plan):
+    """匿名讀取使用的副本：停留在計劃被擁有者修改之前的版本"""
+    replica = database.client['replica']['travel_plans']
+    replica.insert_one(copy.deepcopy(legacy_plan))
+    get_collection = TravelPlan.get_collection
+
+    def collection_for(read_profile=None):
+        return replica if read_profile == READ_PROFILE_PUBLIC else get_collection(read_profile)
+
+    monkeypatch.setattr(TravelPlan, 'get_collection', collection_for)
+    return replica
+
+def stored_ids(plan_id):
+    plan = TravelPlan.get_collection().find_one({'_id': plan_id})
+    return [[activity['id'] for activity in day['activities']] for day in plan['days']]
+
+def test_primary_read_saves_repaired_ids(legacy_plan):
+    plan = TravelPlan.find_by_id(str(legacy_plan['_id']))
+    returned = [[activity['id'] for activity in day['activities']] for day in plan['days']]
+    assert all(UUID_PATTERN.match(activity_id) for day in returned for activity_id in day)
+    assert stored_ids(legacy_plan['_id']) == returned
+    # 有效的ID保持不變
+    assert returned[0][1] == legacy_plan['days'][0]['activities'][1]['id']
+
+def test_replica_read_never_writes_stale_document(legacy_plan, stale_replica):
+    TravelPlan.get_collection().update_one(
+        {'_id': legacy_plan['_id']},
+        {'$set': {'title': '擁有者剛修改的標題', 'updated_at': datetime(2024, 1, 2)}}
+    )
+    plan = TravelPlan.find_by_id(legacy_plan['_id'], read_profile=READ_PROFILE_PUBLIC)
+    stored = TravelPlan.get_collection().find_one({'_id': legacy_plan['_id']})
+    assert plan['title'] == stored['title'] == '擁有者剛修改的標題'
+    assert [[activity['id'] for activity in day['activities']] for day in plan['days']] == stored_ids(legacy_plan['_id'])
+    assert stale_replica.find_one({'_id': legacy_plan['_id']})['days'] == legacy_plan['days']
+
+def test_replica_read_without_repair_stays_on_replica(legacy_plan, stale_replica):
+    TravelPlan.find_by_id(legacy_plan['_id'])
+    stale_replica.update_one({'_id': legacy_plan['_id']}, {'$set': {
+        'title': '副本', 'days': TravelPlan.get_collection().find_one({'_id': legacy_plan['_id']})['days']
+    }})
+    assert TravelPlan.find_by_id(legacy_plan['_id'], read_profile=READ_PROFILE_PUBLIC)['title'] == '副本'
+
+def test_public_detail_keeps_owner_edits(client, legacy_plan, stale_replica):
+    TravelPlan.get_collection().update_one(
+        {'_id': legacy_plan['_id']}, {'$set': {'title': '擁有者剛修改的標題', 'updated_at': datetime(2024, 1, 2)}}
+    )
+    response = client.get(f"/api/plans/public/{legacy_plan['_id']}")
+    assert response.status_code == 200
+    stored = TravelPlan.get_collection().find_one({'_id': legacy_plan['_id']})
+    assert stored['title'] == '擁有者剛修改的標題'
+    assert [a['id'] for a in response.get_json()['plan']['days'][0]['activities']] == stored_ids(legacy_plan['_id'])[0]
+
+def test_repair_changes_etag_and_cached_responses(client, legacy_plan):
+    url = f"/api/plans/public/{legacy_plan['_id']}?fields=days.activities.id"
+    # 部分欄位的讀取不經過修復，返回舊ID
+    before = client.get(url)
+    assert before.get_json()['plan']['days'][0]['activities'][0]['id'] == 'legacy-1'
+    etag = before.headers['ETag']
+
+    client.get(f"/api/plans/public/{legacy_plan['_id']}")
+    assert TravelPlan.get_collection().find_one({'_id': legacy_plan['_id']})['updated_at'] > legacy_plan['updated_at']
+
+    # 持有舊 ETag 的客戶端必須拿到新的ID，而不是 304 或緩存中的舊響應
+    after = client.get(url, headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != etag
+    assert after.get_json()['plan']['days'][0]['activities'][0]['id'] == stored_ids(legacy_plan['_id'])[0][0]
@@ -0,0 +1,33 @@
+"""以極小規模運行端到端基準，確認每個場景都能跑通並返回成功狀態碼"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('mongomock')
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'generate_cold', 'generate_warm',
+    'activity_add', 'activity_update', 'plan_patch', 'activity_delete', 'activity_delete_by_index',
+    'list_user@5', 'list_user_activities@5', 'explore_uncached@5', 'explore_cached@5', 'search@5'
+}
+
+def test_api_benchmark_scenarios(tmp_path):
+    output = tmp_path / 'results.json'
+    # 應用在導入時讀取環境變數，基準必須在獨立進程中運行
+    completed = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.api', '--scales', '5', '--iterations', '2',
+         '--generate-iterations', '1', '--warmup', '0', '--memory-iterations', '1', '--output', str(output)],
+        cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+
+    results = {result['name']: result for result in json.loads(output.read_text(encoding='utf-8'))['results']}
+    assert set(results) == SCENARIOS
+    for name, result in results.items():
+        assert all(status.startswith('2') for status in result['status_codes']), (name, result['status_codes'])
+        assert result['memory'] is not None
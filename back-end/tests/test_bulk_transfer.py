@@ -0,0 +1,91 @@
+"""NDJSON 導出和導入"""
+import json
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.utils.bulk_transfer import export_plans, import_plans
+
+from conftest import build_days
+
+mongomock = pytest.importorskip('mongomock')
+
+def make_plans(count):
+    return [{'_id': ObjectId(), 'title': f'計劃 {index}', 'days': build_days(1, 1)} for index in range(count)]
+
+@pytest.fixture
+def source():
+    return mongomock.MongoClient().db.travel_plans
+
+@pytest.fixture
+def target():
+    return mongomock.MongoClient().db.travel_plans
+
+class FlakyCollection:
+    """拒絕 reject 集合中的文檔（模擬非重複鍵的寫入錯誤），其餘寫入真實集合"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.reject = set()
+
+    def insert_many(self, docs, ordered=True):
+        errors = [{'index': index, 'code': 121, 'errmsg': 'Document failed validation'}
+                  for index, doc in enumerate(docs) if doc['title'] in self.reject]
+        accepted = [doc for doc in docs if doc['title'] not in self.reject]
+        if accepted:
+            self.collection.insert_many(accepted, ordered=False)
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(accepted)})
+        return type('Result', (), {'inserted_ids': [doc['_id'] for doc in docs]})()
+
+@pytest.mark.parametrize('name', ['plans.ndjson', 'plans.ndjson.gz'])
+def test_round_trip(tmp_path, source, target, name):
+    plans = make_plans(5)
+    source.insert_many(plans)
+    path = str(tmp_path / name)
+    assert export_plans(source, path, batch_size=2)['exported'] == 5
+    stats = import_plans(target, path, batch_size=2)
+    assert (stats['inserted'], stats['skipped'], stats['failed']) == (5, 0, 0)
+    assert list(target.find().sort('_id', 1)) == list(source.find().sort('_id', 1))
+    # 重複導入時已存在的文檔被跳過
+    stats = import_plans(target, path, batch_size=2)
+    assert (stats['inserted'], stats['skipped']) == (0, 5)
+
+def test_resume_from_checkpoint(tmp_path, source, target):
+    source.insert_many(make_plans(5))
+    path, checkpoint = str(tmp_path / 'plans.ndjson'), str(tmp_path / 'checkpoint.json')
+    export_plans(source, path)
+
+    def interrupt(stats):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        import_plans(target, path, batch_size=2, checkpoint_path=checkpoint, progress=interrupt)
+    assert json.load(open(checkpoint))['lines_done'] == 2
+
+    stats = import_plans(target, path, batch_size=2, checkpoint_path=checkpoint)
+    assert (stats['resumed_from'], stats['inserted'], stats['skipped']) == (2, 3, 0)
+    assert target.count_documents({}) == 5
+
+def test_failed_lines_are_retried_on_resume(tmp_path, source, target):
+    source.insert_many(make_plans(5))
+    path, checkpoint = str(tmp_path / 'plans.ndjson'), str(tmp_path / 'checkpoint.json')
+    export_plans(source, path)
+    flaky = FlakyCollection(target)
+    flaky.reject = {'計劃 1', '計劃 4'}
+
+    stats = import_plans(flaky, path, batch_size=2, checkpoint_path=checkpoint)
+    assert (stats['inserted'], stats['failed'], stats['failed_lines']) == (3, 2, [2, 5])
+    assert json.load(open(checkpoint))['failed_lines'] == [2, 5]
+
+    # 修復原因後以同一檢查點重新執行，只重試失敗的行
+    flaky.reject = {'計劃 4'}
+    stats = import_plans(flaky, path, batch_size=2, checkpoint_path=checkpoint)
+    assert (stats['inserted'], stats['failed'], stats['failed_lines']) == (1, 1, [5])
+
+    flaky.reject = set()
+    stats = import_plans(flaky, path, batch_size=2, checkpoint_path=checkpoint)
+    assert (stats['inserted'], stats['failed_lines']) == (1, [])
+    assert json.load(open(checkpoint)) == {**json.load(open(checkpoint)), 'lines_done': 5, 'failed_lines': []}
+    assert target.count_documents({}) == 5
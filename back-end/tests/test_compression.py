@@ -0,0 +1,71 @@
+"""響應壓縮和壓縮後的條件請求"""
+import gzip
+import json
+
+import pytest
+from werkzeug.datastructures import Accept
+from werkzeug.http import parse_accept_header
+
+from app.utils import compression
+
+from conftest import build_days, insert_plan
+
+GZIP = {'Accept-Encoding': 'gzip'}
+
+def accept(value):
+    return parse_accept_header(value, Accept)
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip', 'gzip'),
+    ('gzip;q=0.5, identity', 'gzip'),
+    ('identity', None),
+    ('gzip;q=0', None),
+    ('*', 'br' if compression.brotli is not None else 'gzip'),
+])
+def test_negotiate_encoding(header, expected):
+    assert compression.negotiate_encoding(accept(header)) == expected
+
+@pytest.fixture
+def large_plan(auth_headers):
+    user_id, headers = auth_headers
+    return insert_plan(user_id, days=build_days(5, 6)), headers
+
+def test_detail_is_gzipped_with_encoding_specific_etag(client, large_plan):
+    plan, headers = large_plan
+    url = f"/api/travel-plans/{plan['_id']}"
+    plain = client.get(url, headers=headers)
+    compressed = client.get(url, headers={**headers, **GZIP})
+
+    assert 'Content-Encoding' not in plain.headers
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+    assert compressed.headers['ETag'] == plain.headers['ETag'][:-1] + '-gzip"'
+
+    # 壓縮後的 ETag 在條件請求中與原 ETag 等價
+    for etag in (compressed.headers['ETag'], plain.headers['ETag']):
+        response = client.get(url, headers={**headers, **GZIP, 'If-None-Match': etag})
+        assert response.status_code == 304
+
+def test_cached_public_detail_honours_compressed_etag(client, large_plan):
+    plan, _ = large_plan
+    url = f"/api/plans/public/{plan['_id']}"
+    first = client.get(url, headers=GZIP)
+    assert first.headers['Content-Encoding'] == 'gzip'
+    cached = client.get(url, headers=GZIP)
+    assert cached.headers['X-Cache'] == 'HIT'
+    assert cached.headers['ETag'] == first.headers['ETag']
+    assert gzip.decompress(cached.get_data()) == gzip.decompress(first.get_data())
+    assert client.get(url, headers={**GZIP, 'If-None-Match': first.headers['ETag']}).status_code == 304
+
+def test_streamed_list_is_gzipped(client, large_plan):
+    plan, headers = large_plan
+    plain = client.get('/api/travel-plans?include_activities=true', headers=headers)
+    compressed = client.get('/api/travel-plans?include_activities=true', headers={**headers, **GZIP})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in compressed.headers
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get('/', headers=GZIP)
+    assert 'Content-Encoding' not in response.headers
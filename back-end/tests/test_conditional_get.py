@@ -0,0 +1,39 @@
+"""計劃讀取端點的 ETag / Last-Modified 條件請求"""
+from conftest import insert_plan
+
+def test_detail_not_modified_until_plan_changes(client, auth_headers):
+    user_id, headers = auth_headers
+    plan = insert_plan(user_id)
+    url = f"/api/travel-plans/{plan['_id']}"
+
+    first = client.get(url, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Last-Modified']
+
+    cached = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.headers['ETag'] == etag
+    assert client.get(url, headers={**headers, 'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+    response = client.patch(url, headers=headers, json={'operations': [{'op': 'update_plan', 'fields': {'title': '新標題'}}]})
+    assert response.status_code == 200
+    changed = client.get(url, headers={**headers, 'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['plan']['title'] == '新標題'
+
+def test_etag_depends_on_requested_fields(client, auth_headers):
+    user_id, headers = auth_headers
+    plan = insert_plan(user_id)
+    url = f"/api/travel-plans/{plan['_id']}"
+    etag = client.get(url, headers=headers).headers['ETag']
+    assert client.get(f'{url}?fields=title', headers={**headers, 'If-None-Match': etag}).status_code == 200
+
+def test_user_list_not_modified(client, auth_headers):
+    user_id, headers = auth_headers
+    insert_plan(user_id)
+    etag = client.get('/api/travel-plans', headers=headers).headers['ETag']
+    assert client.get('/api/travel-plans', headers={**headers, 'If-None-Match': etag}).status_code == 304
+    insert_plan(user_id, title='第二個計劃')
+    assert client.get('/api/travel-plans', headers={**headers, 'If-None-Match': etag}).status_code == 200
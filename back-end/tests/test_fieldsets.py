@@ -0,0 +1,102 @@
+"""欄位選擇（fields / exclude）的解析、投影和響應裁剪"""
+import pytest
+from bson import ObjectId
+
+from app.utils.fieldsets import (
+    FieldsetError, build_projection, get_fieldset_args, parse_fields, prune_fields
+)
+
+from conftest import insert_plan
+
+def test_parse_fields_dedupes_and_collapses_child_paths():
+    assert parse_fields('title, days.activities.name,days,title') == ['title', 'days']
+    assert parse_fields(['summary.cover_image', 'title']) == ['summary.cover_image', 'title']
+    assert parse_fields(' , ') is None
+    assert parse_fields(None) is None
+
+@pytest.mark.parametrize('value', [
+    'search_tokens', 'title.length', 'days.$where', 'days..name', ['title', 3], {'title': 1}
+])
+def test_parse_fields_rejects_unsupported_paths(value):
+    with pytest.raises(FieldsetError):
+        parse_fields(value)
+
+def test_fields_and_exclude_are_mutually_exclusive():
+    with pytest.raises(FieldsetError):
+        get_fieldset_args({'fields': 'title', 'exclude': 'days'})
+
+def test_build_projection_reads_required_fields():
+    assert build_projection(['title', 'days.activities.name'], required=('updated_at', 'days')) == {
+        'title': 1, 'updated_at': 1, 'days': 1
+    }
+    # 排除模式不會排除服務端需要的欄位，並總是排除內部欄位
+    assert build_projection(exclude=['days', 'updated_at'], required=('updated_at',)) == {
+        'days': 0, 'search_tokens': 0
+    }
+    assert build_projection() is None
+
+def test_prune_fields_removes_only_unrequested_required_fields():
+    doc = {'_id': 1, 'title': 't', 'updated_at': 'u', 'is_public': True, 'search_tokens': ['t']}
+    assert prune_fields(dict(doc), ['title'], required=('updated_at', 'is_public')) == {'_id': 1, 'title': 't'}
+    assert prune_fields(dict(doc), ['title', 'is_public'], required=('updated_at', 'is_public')) == {
+        '_id': 1, 'title': 't', 'is_public': True
+    }
+    assert prune_fields(dict(doc), exclude=['updated_at'], required=('updated_at',)) == {
+        '_id': 1, 'title': 't', 'is_public': True
+    }
+
+def test_detail_returns_only_selected_fields(client, auth_headers):
+    user_id, headers = auth_headers
+    plan = insert_plan(user_id, is_public=False)
+    url = f"/api/travel-plans/{plan['_id']}"
+
+    response = client.get(f'{url}?fields=title,days.activities.name', headers=headers)
+    assert response.status_code == 200
+    assert response.headers['ETag']
+    selected = response.get_json()['plan']
+    assert set(selected) == {'plan_id', 'title', 'days'}
+    assert selected['days'][0]['activities'] == [{'name': '景點 1-1'}, {'name': '景點 1-2'}]
+
+    # 不同的欄位選擇使用不同的 ETag
+    full = client.get(url, headers=headers)
+    assert full.headers['ETag'] != response.headers['ETag']
+
+    excluded = client.get(f'{url}?exclude=days,updated_at', headers=headers).get_json()['plan']
+    assert 'days' not in excluded and 'updated_at' not in excluded and 'search_tokens' not in excluded
+    assert excluded['title'] == plan['title'] and excluded['is_public'] is False
+
+def test_projection_still_enforces_permissions(client, auth_headers):
+    _, headers = auth_headers
+    plan = insert_plan(ObjectId(), is_public=False)
+    response = client.get(f"/api/travel-plans/{plan['_id']}?fields=title", headers=headers)
+    assert response.status_code == 403
+
+def test_invalid_fieldset_is_rejected(client, auth_headers):
+    user_id, headers = auth_headers
+    plan = insert_plan(user_id)
+    for query in ('fields=password', 'exclude=search_tokens', 'fields=title&exclude=days'):
+        response = client.get(f"/api/travel-plans/{plan['_id']}?{query}", headers=headers)
+        assert response.status_code == 400
+        assert response.get_json()['success'] is False
+
+def test_lists_return_only_selected_fields(client, auth_headers):
+    user_id, headers = auth_headers
+    insert_plan(user_id)
+
+    own = client.get('/api/travel-plans?fields=title', headers=headers).get_json()
+    assert [set(plan) for plan in own] == [{'id', 'title'}]
+
+    public = client.get('/api/travel-plans/public?fields=destination').get_json()
+    assert [set(plan) for plan in public['plans']] == [{'id', 'plan_id', 'destination'}]
+
+def test_batch_prunes_permission_fields(client, auth_headers):
+    user_id, headers = auth_headers
+    own = insert_plan(user_id, is_public=False)
+    other = insert_plan(ObjectId(), is_public=False)
+
+    response = client.post('/api/travel-plans/batch', headers=headers, json={
+        'ids': [str(own['_id']), str(other['_id'])], 'fields': ['title']
+    })
+    body = response.get_json()
+    assert body['plans'] == {str(own['_id']): {'plan_id': str(own['_id']), 'title': own['title']}}
+    assert body['forbidden'] == [str(other['_id'])]
@@ -0,0 +1,92 @@
+"""gunicorn.conf.py 的 fork 後重置"""
+import os
+import importlib.util
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.db import Database
+from app.utils.response_cache import response_cache
+from app.utils.rate_limit import rate_limiter
+from app.utils.password_hasher import password_hasher
+from app.utils.places_disk_cache import places_disk_cache
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py')
+
+def load_config():
+    spec = importlib.util.spec_from_file_location('gunicorn_conf', CONFIG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def inherited_state():
+    """模擬主進程中已創建的客戶端、存儲和進程池（以佔位對象代替真實連接）"""
+    Database._client = object()
+    Database._db = object()
+    Database._pid = os.getpid()
+    response_cache._store = object()
+    rate_limiter._store = object()
+    password_hasher._executor = object()
+    password_hasher._slots = object()
+    places_disk_cache._local.connection = object()
+    places_disk_cache._local.pid = os.getpid()
+    places_disk_cache._compactor_pid = os.getpid()
+
+def leftover_state():
+    """返回 fork 後仍保留的狀態名稱"""
+    leftovers = {
+        'Database._client': Database._client,
+        'Database._db': Database._db,
+        'Database._pid': Database._pid,
+        'response_cache._store': response_cache._store,
+        'rate_limiter._store': rate_limiter._store,
+        'password_hasher._executor': password_hasher._executor,
+        'password_hasher._slots': password_hasher._slots,
+        'places_disk_cache.connection': getattr(places_disk_cache._local, 'connection', None),
+        'places_disk_cache._compactor_pid': places_disk_cache._compactor_pid,
+    }
+    return [name for name, value in leftovers.items() if value is not None]
+
+@pytest.fixture
+def restore_state():
+    yield
+    Database.reset_after_fork()
+    response_cache.reset()
+    rate_limiter.reset()
+    password_hasher.reset()
+    places_disk_cache.reset()
+
+def test_config_values():
+    config = load_config()
+    assert config.worker_class == 'gthread'
+    assert config.threads >= 1
+    assert config.workers >= 1
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='需要 os.fork')
+def test_post_fork_resets_inherited_state(restore_state):
+    config = load_config()
+    inherited_state()
+    read_fd, write_fd = os.pipe()
+
+    pid = os.fork()
+    if pid == 0:
+        # 子進程：執行 post_fork 後把未重置的狀態寫回父進程
+        try:
+            os.close(read_fd)
+            server = SimpleNamespace(log=SimpleNamespace(info=lambda *args, **kwargs: None))
+            config.post_fork(server, SimpleNamespace(pid=os.getpid()))
+            message = ','.join(leftover_state()) or 'ok'
+        except BaseException as e:
+            message = f'error: {e!r}'
+        os.write(write_fd, message.encode('utf-8'))
+        os.close(write_fd)
+        os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd, 'rb') as pipe:
+        message = pipe.read().decode('utf-8')
+    os.waitpid(pid, 0)
+
+    assert message == 'ok', f'fork 後未重置: {message}'
+    # 父進程（gunicorn 主進程）的狀態不受影響
+    assert Database._client is not None
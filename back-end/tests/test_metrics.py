@@ -0,0 +1,32 @@
+"""/metrics 端點的訪問控制"""
+import pytest
+
+from app.utils import metrics
+
+REMOTE = {'REMOTE_ADDR': '203.0.113.7'}
+
+@pytest.fixture
+def metrics_config(monkeypatch):
+    monkeypatch.setattr(metrics.config, 'METRICS_AUTH_TOKEN', '')
+    monkeypatch.setattr(metrics.config, 'METRICS_PUBLIC', False)
+    return metrics.config
+
+def test_local_scrape_allowed_without_token(client, metrics_config):
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+
+def test_remote_scrape_rejected_without_token(client, metrics_config):
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 404
+    # 經本機反向代理轉發的請求也不視為本機
+    assert client.get('/metrics', headers={'X-Forwarded-For': '203.0.113.7'}).status_code == 404
+
+def test_public_scrape_when_enabled(client, metrics_config, monkeypatch):
+    monkeypatch.setattr(metrics_config, 'METRICS_PUBLIC', True)
+    assert client.get('/metrics', environ_base=REMOTE).status_code == 200
+
+def test_token_required_when_set(client, metrics_config, monkeypatch):
+    monkeypatch.setattr(metrics_config, 'METRICS_AUTH_TOKEN', 'scrape-token')
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', environ_base=REMOTE, headers={'Authorization': 'Bearer scrape-token'})
+    assert response.status_code == 200
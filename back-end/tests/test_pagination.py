@@ -0,0 +1,69 @@
+"""游標分頁"""
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+from app.utils.pagination import (InvalidCursorError, MAX_PAGE_LIMIT, decode_cursor, encode_cursor,
+                                  get_pagination_args)
+
+from conftest import insert_plan
+
+def test_cursor_round_trip():
+    doc = {'created_at': datetime(2024, 6, 1, 12, 30, 5, 123000), '_id': ObjectId(), 'search_score': 3}
+    assert decode_cursor(encode_cursor(doc)) == {'created_at': doc['created_at'], '_id': doc['_id']}
+    assert decode_cursor(encode_cursor(doc, 'search_score'))['score'] == 3
+
+@pytest.mark.parametrize('token', ['', 'not-base64!', 'e30', encode_cursor({'created_at': datetime(2024, 1, 1), '_id': ObjectId()})[:-4]])
+def test_invalid_cursor(token):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token)
+
+def test_limit_is_clamped():
+    assert get_pagination_args({'limit': '1000'})['limit'] == MAX_PAGE_LIMIT
+    assert get_pagination_args({'limit': '0', 'page': '-3'}) == {'page': 1, 'limit': 1, 'skip': 0, 'cursor': None}
+
+def collect_pages(client, url, headers=None, limit=2):
+    """沿著下一頁游標（X-Next-Cursor 或 next_cursor 欄位）讀取所有頁，返回按順序的計劃ID"""
+    ids, cursor = [], None
+    while True:
+        query = f'{url}?limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(query, headers=headers)
+        assert response.status_code == 200
+        body = response.get_json()
+        # 用戶列表的主體是陣列，公開列表的計劃和游標在信封欄位中
+        if isinstance(body, list):
+            ids.extend(plan['id'] for plan in body)
+            cursor = response.headers.get('X-Next-Cursor')
+        else:
+            ids.extend(plan['id'] for plan in body['plans'])
+            cursor = body['next_cursor']
+        if not cursor:
+            return ids, response
+
+@pytest.fixture
+def user_plans(auth_headers):
+    """五個計劃，其中三個的 created_at 相同，排序只能依靠 _id"""
+    user_id, _ = auth_headers
+    tied = datetime(2024, 6, 1)
+    created = [tied + timedelta(hours=1), tied, tied, tied, tied - timedelta(hours=1)]
+    return [insert_plan(user_id, created_at) for created_at in created]
+
+def expected_order(plans):
+    return [str(plan['_id']) for plan in sorted(plans, key=lambda p: (p['created_at'], p['_id']), reverse=True)]
+
+def test_user_list_cursor_visits_each_plan_once(client, auth_headers, user_plans):
+    _, headers = auth_headers
+    ids, last = collect_pages(client, '/api/travel-plans', headers)
+    assert ids == expected_order(user_plans)
+    assert last.headers['X-Total-Count'] == '5'
+
+def test_public_list_cursor_visits_each_plan_once(client, database, user_plans):
+    ids, last = collect_pages(client, '/api/travel-plans/public', limit=1)
+    assert ids == expected_order(user_plans)
+    assert last.get_json()['has_more'] is False
+
+def test_invalid_cursor_is_rejected(client, auth_headers):
+    _, headers = auth_headers
+    response = client.get('/api/travel-plans?cursor=abc', headers=headers)
+    assert response.status_code == 400
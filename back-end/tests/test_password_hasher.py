@@ -0,0 +1,129 @@
+"""密碼哈希進程池的繁忙、超時和故障恢復"""
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+from werkzeug.security import generate_password_hash
+
+from app.models.user import User
+from app.utils import password_hasher as password_hasher_module
+from app.utils.password_hasher import PasswordHasherBusyError, password_hasher
+
+# 測試使用低成本的哈希方法
+TEST_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+class FakeExecutor:
+    """不創建子進程的執行器：submit 返回由測試控制的 Future"""
+
+    def __init__(self, future=None, submit_error=None):
+        self.future = future
+        self.submit_error = submit_error
+        self.submitted = []
+
+    def submit(self, fn, *args):
+        if self.submit_error:
+            raise self.submit_error
+        self.submitted.append((fn, args))
+        return self.future
+
+@pytest.fixture
+def hasher_config(monkeypatch):
+    config = password_hasher_module.config
+    monkeypatch.setattr(config, 'PASSWORD_HASH_METHOD', TEST_HASH_METHOD)
+    monkeypatch.setattr(config, 'PASSWORD_HASH_WORKERS', 1)
+    monkeypatch.setattr(config, 'PASSWORD_HASH_TIMEOUT_SECONDS', 0.01)
+    password_hasher.reset()
+    yield config
+    password_hasher.reset()
+
+def use_executor(executor, max_pending=1):
+    password_hasher._executor = executor
+    password_hasher._slots = threading.BoundedSemaphore(max_pending)
+    return password_hasher._slots
+
+def test_full_queue_is_rejected_without_submitting(hasher_config):
+    executor = FakeExecutor(Future())
+    slots = use_executor(executor)
+    slots.acquire()
+
+    with pytest.raises(PasswordHasherBusyError):
+        password_hasher.hash('password123')
+    assert executor.submitted == []
+
+def test_timeout_raises_busy_and_releases_slot(hasher_config):
+    future = Future()
+    slots = use_executor(FakeExecutor(future))
+
+    with pytest.raises(PasswordHasherBusyError):
+        password_hasher.verify('hash', 'password123')
+    assert future.cancelled()
+    assert slots.acquire(blocking=False)
+
+def test_completed_task_releases_slot(hasher_config):
+    future = Future()
+    future.set_result(True)
+    slots = use_executor(FakeExecutor(future))
+
+    assert password_hasher.verify('hash', 'password123') is True
+    assert slots.acquire(blocking=False)
+
+@pytest.mark.parametrize('executor', [
+    FakeExecutor(submit_error=BrokenProcessPool()),
+    FakeExecutor(submit_error=RuntimeError('cannot schedule new futures after shutdown')),
+])
+def test_unavailable_pool_falls_back_to_current_thread(hasher_config, executor):
+    use_executor(executor)
+    password_hash = password_hasher.hash('password123')
+    assert password_hash.startswith(TEST_HASH_METHOD)
+    # 進程池被丟棄，下次使用時重新創建
+    assert password_hasher._executor is None
+
+def test_crashed_worker_falls_back_to_current_thread(hasher_config):
+    future = Future()
+    future.set_exception(BrokenProcessPool())
+    use_executor(FakeExecutor(future))
+
+    password_hash = generate_password_hash('password123', method=TEST_HASH_METHOD)
+    assert password_hasher.verify(password_hash, 'password123') is True
+    assert password_hasher._executor is None
+
+@pytest.fixture
+def busy_hasher(hasher_config, monkeypatch):
+    """直接執行哈希，但可以切換為繁忙狀態（only 限定只有某個哈希函數繁忙）"""
+    monkeypatch.setattr(hasher_config, 'PASSWORD_HASH_WORKERS', 0)
+    state = {'busy': False, 'only': None}
+    run = password_hasher._run
+
+    def run_unless_busy(fn, *args):
+        if state['busy'] and state['only'] in (None, fn):
+            raise PasswordHasherBusyError('密碼哈希服務繁忙')
+        return run(fn, *args)
+
+    monkeypatch.setattr(password_hasher, '_run', run_unless_busy)
+    return state
+
+def test_auth_endpoints_return_503_when_busy(client, busy_hasher):
+    credentials = {'email': 'busy@example.com', 'password': 'password123'}
+    assert client.post('/api/auth/register', json=credentials).status_code == 201
+
+    busy_hasher['busy'] = True
+    for path, email in (('/api/auth/register', 'other@example.com'), ('/api/auth/login', credentials['email'])):
+        response = client.post(path, json={**credentials, 'email': email})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+    assert User.find_by_email('other@example.com') is None
+
+    busy_hasher['busy'] = False
+    assert client.post('/api/auth/login', json=credentials).status_code == 200
+
+def test_change_password_propagates_busy(app, busy_hasher):
+    user_id, error = User.create_user('change@example.com', 'password123')
+    assert error is None
+    password_hash = User.find_by_id(user_id)['password_hash']
+
+    # 當前密碼驗證通過後，計算新哈希時繁忙也不能被當作普通的更新失敗
+    busy_hasher.update(busy=True, only=generate_password_hash)
+    with pytest.raises(PasswordHasherBusyError):
+        User.change_password(user_id, 'password123', 'new-password123')
+    assert User.find_by_id(user_id)['password_hash'] == password_hash
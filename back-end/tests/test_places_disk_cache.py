@@ -0,0 +1,25 @@
+"""Places 磁盤緩存"""
+import pytest
+
+from app.utils.places_disk_cache import PlacesDiskCache, MISSING, SEARCH
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = PlacesDiskCache(str(tmp_path / 'places.sqlite3'), ttl=60, negative_ttl=10, max_entries=0,
+                            compact_interval=0, mmap_bytes=0)
+    yield cache
+    cache.reset()
+
+def test_round_trip(cache):
+    assert cache.get(SEARCH, 'tokyo') is MISSING
+    cache.set(SEARCH, 'tokyo', {'name': '東京塔'})
+    cache.set(SEARCH, 'nowhere', None)
+    assert cache.get(SEARCH, 'tokyo') == {'name': '東京塔'}
+    assert cache.get(SEARCH, 'nowhere') is None
+
+def test_corrupt_entry_is_a_miss(cache):
+    cache.set(SEARCH, 'tokyo', {'name': '東京塔'})
+    cache._connect().execute("UPDATE places SET value = ? WHERE key = 'tokyo'", ('{"name": "東',))
+    assert cache.get(SEARCH, 'tokyo') is MISSING
+    cache.set(SEARCH, 'tokyo', {'name': '東京塔'})
+    assert cache.get(SEARCH, 'tokyo') == {'name': '東京塔'}
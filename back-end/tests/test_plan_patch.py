@@ -0,0 +1,183 @@
+"""批量修改操作（plan_patch）和 PATCH /api/travel-plans/<id>"""
+import copy
+
+import pytest
+
+from app.models import travel_plan as travel_plan_module
+from app.models.travel_plan import TravelPlan
+from app.utils.plan_patch import PlanPatchError, apply_operations
+
+from conftest import build_days
+
+def activity_ids(days, day_index):
+    return [activity['id'] for activity in days[day_index]['activities']]
+
+def apply_invalid(days, operations):
+    """應用無效操作，返回錯誤並確認日程未被修改"""
+    original = copy.deepcopy(days)
+    with pytest.raises(PlanPatchError) as excinfo:
+        apply_operations(days, operations)
+    assert days == original
+    return excinfo.value
+
+def test_add_activity_generates_id():
+    days = build_days()
+    _, results = apply_operations(days, [
+        {'op': 'add_activity', 'day_index': 1, 'activity': {'id': 'undefined', 'name': '新景點'}, 'position': 0}
+    ])
+    assert days[1]['activities'][0]['name'] == '新景點'
+    assert days[1]['activities'][0]['id'] == results[0]['activity_id'] != 'undefined'
+
+def test_update_activity_keeps_id():
+    days = build_days()
+    activity_id = days[0]['activities'][0]['id']
+    apply_operations(days, [
+        {'op': 'update_activity', 'activity_id': activity_id, 'fields': {'id': 'other', 'time': '12:00'}}
+    ])
+    assert days[0]['activities'][0] == {**days[0]['activities'][0], 'id': activity_id, 'time': '12:00'}
+
+def test_move_activity():
+    days = build_days()
+    activity_id = days[0]['activities'][1]['id']
+    apply_operations(days, [{'op': 'move_activity', 'activity_id': activity_id, 'to_day_index': 1, 'position': 0}])
+    assert activity_id not in activity_ids(days, 0)
+    assert activity_ids(days, 1)[0] == activity_id
+
+def test_reorder_activities():
+    days = build_days()
+    order = list(reversed(activity_ids(days, 0)))
+    apply_operations(days, [{'op': 'reorder_activities', 'day_index': 0, 'order': order}])
+    assert activity_ids(days, 0) == order
+
+@pytest.mark.parametrize('order', [
+    'not-a-list',
+    [None, None],
+    [1, 2],
+    ['same', 'same'],
+])
+def test_reorder_activities_rejects_invalid_order(order):
+    days = build_days()
+    if order == ['same', 'same']:
+        order = [days[0]['activities'][0]['id']] * 2
+    error = apply_invalid(days, [{'op': 'update_plan', 'fields': {'title': 'x'}},
+                                 {'op': 'reorder_activities', 'day_index': 0, 'order': order}])
+    assert error.op_index == 1
+
+@pytest.mark.parametrize('ids', [['a', 'a'], [None, None], ['a', None]])
+def test_reorder_activities_rejects_day_without_unique_ids(ids):
+    days = build_days()
+    for activity, activity_id in zip(days[0]['activities'], ids):
+        activity['id'] = activity_id
+    # order 與現有ID一一對應時也不能重排，否則同ID的活動會被合併或找不到
+    error = apply_invalid(days, [{'op': 'reorder_activities', 'day_index': 0, 'order': [str(i) for i in ids]}])
+    assert error.op_index == 0
+
+def test_delete_activity():
+    days = build_days()
+    activity_id = days[1]['activities'][0]['id']
+    _, results = apply_operations(days, [{'op': 'delete_activity', 'activity_id': activity_id}])
+    assert activity_id not in activity_ids(days, 1)
+    assert results[0] == {'op': 'delete_activity', 'activity_id': activity_id, 'day_index': 1, 'activity_index': 0}
+
+def test_add_day_renumbers_and_copies_activities():
+    days = build_days()
+    activity = {'name': '新景點'}
+    _, results = apply_operations(days, [
+        {'op': 'add_day', 'day': {'date': '2024-07-00', 'activities': [activity]}, 'position': 0}
+    ])
+    assert results[0]['day_index'] == 0
+    assert [day['day'] for day in days] == [1, 2, 3]
+    assert days[0]['activities'][0]['id']
+    assert 'id' not in activity
+
+@pytest.mark.parametrize('day', [
+    'not-a-dict',
+    {'activities': 'abc'},
+    {'activities': [{'name': 'ok'}, 'abc']},
+    {'activities': [{'id': '0d4f5b4e-8f0c-4a56-9d2e-6a1b2c3d4e5f'}, {'id': '0d4f5b4e-8f0c-4a56-9d2e-6a1b2c3d4e5f'}]},
+])
+def test_add_day_rejects_invalid_day(day):
+    error = apply_invalid(build_days(), [{'op': 'add_day', 'day': day}])
+    assert error.op_index == 0
+
+def test_delete_day():
+    days = build_days(3)
+    remaining = [days[0]['date'], days[2]['date']]
+    apply_operations(days, [{'op': 'delete_day', 'day_index': 1}])
+    assert [day['date'] for day in days] == remaining
+    assert [day['day'] for day in days] == [1, 2]
+
+def test_reorder_days():
+    days = build_days(3)
+    dates = [day['date'] for day in days]
+    apply_operations(days, [{'op': 'reorder_days', 'order': [2, 0, 1]}])
+    assert [day['date'] for day in days] == [dates[2], dates[0], dates[1]]
+    assert [day['day'] for day in days] == [1, 2, 3]
+
+@pytest.mark.parametrize('order', [[0, '1'], [0, None], [True, False], [0, 0], [0], 'ab'])
+def test_reorder_days_rejects_invalid_order(order):
+    error = apply_invalid(build_days(), [{'op': 'reorder_days', 'order': order}])
+    assert error.op_index == 0
+
+def test_update_plan_rejects_unknown_fields():
+    fields, _ = apply_operations(build_days(), [{'op': 'update_plan', 'fields': {'title': '新標題'}}])
+    assert fields == {'title': '新標題'}
+    error = apply_invalid(build_days(), [{'op': 'update_plan', 'fields': {'user_id': 'x'}}])
+    assert error.op_index == 0
+
+def test_rejects_unknown_operation():
+    error = apply_invalid(build_days(), [{'op': 'update_plan', 'fields': {'title': 'x'}}, {'op': 'explode'}])
+    assert error.op_index == 1
+
+@pytest.fixture
+def plan(auth_headers):
+    user_id, _ = auth_headers
+    plan_id, error = TravelPlan.create_plan(user_id, {
+        'title': '東京兩日遊', 'destination': '東京', 'start_date': '2024-07-01', 'end_date': '2024-07-02',
+        'days': build_days()
+    })
+    assert error is None
+    return str(plan_id)
+
+def test_patch_endpoint_applies_operations(client, auth_headers, plan):
+    _, headers = auth_headers
+    days = TravelPlan.find_by_id(plan)['days']
+    order = list(reversed(activity_ids(days, 0)))
+    response = client.patch(f'/api/travel-plans/{plan}', headers=headers, json={'operations': [
+        {'op': 'reorder_activities', 'day_index': 0, 'order': order},
+        {'op': 'update_plan', 'fields': {'title': '新標題'}}
+    ]})
+    assert response.status_code == 200
+    stored = TravelPlan.find_by_id(plan)
+    assert stored['title'] == '新標題'
+    assert activity_ids(stored['days'], 0) == order
+
+def test_patch_endpoint_rejects_invalid_operation(client, auth_headers, plan):
+    _, headers = auth_headers
+    before = TravelPlan.find_by_id(plan)
+    response = client.patch(f'/api/travel-plans/{plan}', headers=headers, json={'operations': [
+        {'op': 'update_plan', 'fields': {'title': '新標題'}},
+        {'op': 'reorder_days', 'order': [0, '1']}
+    ]})
+    assert response.status_code == 400
+    assert response.get_json()['error_code'] == 'invalid_operation'
+    assert response.get_json()['op_index'] == 1
+    after = TravelPlan.find_by_id(plan)
+    assert (after['title'], after['days']) == (before['title'], before['days'])
+
+def test_patch_endpoint_reports_conflict(client, auth_headers, plan, monkeypatch):
+    _, headers = auth_headers
+    apply = travel_plan_module.apply_operations
+
+    def concurrent_update(days, operations):
+        # 讀取之後、寫入之前，另一個請求修改了計劃
+        TravelPlan.update_plan(plan, {'title': '其他請求的標題'})
+        return apply(days, operations)
+
+    monkeypatch.setattr(travel_plan_module, 'apply_operations', concurrent_update)
+    response = client.patch(f'/api/travel-plans/{plan}', headers=headers, json={'operations': [
+        {'op': 'update_plan', 'fields': {'title': '新標題'}}
+    ]})
+    assert response.status_code == 409
+    assert response.get_json()['error_code'] == 'conflict'
+    assert TravelPlan.find_by_id(plan)['title'] == '其他請求的標題'
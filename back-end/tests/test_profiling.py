@@ -0,0 +1,28 @@
+"""按需分析的令牌驗證"""
+import pytest
+from flask import Flask
+
+from app.utils import profiling
+
+@pytest.fixture
+def profiling_token(monkeypatch):
+    monkeypatch.setattr(profiling.config, 'PROFILING_TOKEN', 'profile-secret')
+    monkeypatch.setattr(profiling.config, 'PROFILING_MODE', profiling.MODE_SAMPLE)
+    return 'profile-secret'
+
+def requested_mode(path='/', headers=None):
+    with Flask(__name__).test_request_context(path, headers=headers or {}):
+        return profiling._requested_mode()
+
+def test_token_accepted_from_header(profiling_token):
+    headers = {'X-Profile': 'cprofile', 'X-Profile-Token': profiling_token}
+    assert requested_mode(headers=headers) == 'cprofile'
+    assert requested_mode('/?profile=sample', headers={'X-Profile-Token': profiling_token}) == 'sample'
+
+def test_token_rejected_from_query_string(profiling_token):
+    assert requested_mode(f'/?profile=sample&profile_token={profiling_token}') is None
+    assert requested_mode('/?profile_token=x', headers={'X-Profile': 'sample'}) is None
+
+def test_rejected_without_configured_token(monkeypatch):
+    monkeypatch.setattr(profiling.config, 'PROFILING_TOKEN', '')
+    assert requested_mode(headers={'X-Profile': 'sample', 'X-Profile-Token': ''}) is None
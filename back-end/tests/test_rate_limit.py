@@ -0,0 +1,94 @@
+"""限流設置的解析和共享存儲不可用時的處理"""
+import pytest
+
+from app.utils import rate_limit as rate_limit_module
+from app.utils.rate_limit import LocalRateLimitStore, parse_limit, rate_limiter
+
+@pytest.mark.parametrize('value, expected', [
+    ('10/hour', (10, 3600)),
+    ('5/minute', (5, 60)),
+    ('100/10minutes', (100, 600)),
+    (' 3 / 2 days ', (3, 172800)),
+])
+def test_parse_limit(value, expected):
+    assert parse_limit(value) == expected
+
+@pytest.mark.parametrize('value', ['0/minute', '5/0minutes', '-1/minute', '10/week', 'ten/hour', ''])
+def test_parse_limit_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_limit(value)
+
+class FlakyStore(LocalRateLimitStore):
+    """可以切換為不可用的共享存儲"""
+
+    backend = 'redis'
+
+    def __init__(self):
+        super().__init__(100)
+        self.available = True
+
+    def sliding_window(self, *args):
+        if not self.available:
+            raise ConnectionError('redis down')
+        return super().sliding_window(*args)
+
+@pytest.fixture
+def flaky_store(monkeypatch):
+    rate_limiter.reset()
+    store = FlakyStore()
+    monkeypatch.setattr(rate_limiter, '_store', store)
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(rate_limit_module.time, 'monotonic', lambda: clock['now'])
+    yield store, clock
+    rate_limiter.reset()
+
+def test_outage_fails_open_without_local_counting(flaky_store, monkeypatch):
+    store, clock = flaky_store
+    monkeypatch.setattr(rate_limit_module.config, 'RATE_LIMIT_FAIL_OPEN', True)
+    store.available = False
+
+    results = [rate_limiter.hit('login:ip:1', 1, 60) for _ in range(3)]
+    assert all(result.allowed and not result.available for result in results)
+    # 不會改用進程內存儲
+    assert rate_limiter._store is store
+    assert results[0].retry_after == 1
+
+    # 退避結束後重試共享存儲，恢復後重新計數
+    store.available = True
+    clock['now'] += 1
+    assert rate_limiter.hit('login:ip:1', 1, 60).available
+    assert not rate_limiter.hit('login:ip:1', 1, 60).allowed
+    assert rate_limiter._failures == 0
+
+def test_outage_fails_closed_when_configured(flaky_store, monkeypatch):
+    store, clock = flaky_store
+    monkeypatch.setattr(rate_limit_module.config, 'RATE_LIMIT_FAIL_OPEN', False)
+    store.available = False
+
+    result = rate_limiter.hit('login:ip:1', 10, 60)
+    assert not result.allowed and not result.available
+
+def test_retry_backoff_grows_exponentially(flaky_store):
+    store, clock = flaky_store
+    store.available = False
+    delays = []
+    for _ in range(7):
+        delays.append(rate_limiter.hit('login:ip:1', 10, 60).retry_after)
+        clock['now'] = rate_limiter._retry_at
+    assert delays == [1, 2, 4, 8, 16, 30, 30]
+
+def test_login_returns_503_when_failing_closed(client, flaky_store, monkeypatch):
+    store, _ = flaky_store
+    monkeypatch.setattr(rate_limit_module.config, 'RATE_LIMIT_ENABLED', True)
+    monkeypatch.setattr(rate_limit_module.config, 'RATE_LIMIT_FAIL_OPEN', False)
+    store.available = False
+
+    response = client.post('/api/auth/login', json={'email': 'a@example.com', 'password': 'password123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert 'RateLimit-Limit' not in response.headers
+
+    monkeypatch.setattr(rate_limit_module.config, 'RATE_LIMIT_FAIL_OPEN', True)
+    response = client.post('/api/auth/login', json={'email': 'a@example.com', 'password': 'password123'})
+    assert response.status_code == 401
+    assert 'RateLimit-Limit' not in response.headers
@@ -0,0 +1,126 @@
+"""公開計劃的響應緩存"""
+import pytest
+from mongomock.collection import Collection
+from pymongo.read_preferences import Primary
+
+from app.utils.response_cache import LocalCacheStore, GLOBAL_NAMESPACE, response_cache
+
+from conftest import insert_plan
+
+class FlakyStore(LocalCacheStore):
+    """可以切換為不可用的共享存儲"""
+
+    backend = 'redis'
+
+    def __init__(self):
+        super().__init__(100)
+        self.down = False
+        self.calls = 0
+
+    def __getattribute__(self, name):
+        if name in ('get', 'set', 'generations', 'bump_generation', 'incr_stat', 'stats'):
+            self.calls += 1
+            if self.down:
+                raise ConnectionError('connection refused')
+        return super().__getattribute__(name)
+
+@pytest.fixture
+def public_plan(auth_headers):
+    user_id, headers = auth_headers
+    plan = insert_plan(user_id)
+    return plan, headers
+
+def fetch(client, url):
+    """讀取完整響應（串流響應在完整發送後才寫入緩存）"""
+    response = client.get(url)
+    response.get_data()
+    return response
+
+def test_write_invalidates_cached_responses(client, public_plan):
+    plan, headers = public_plan
+    detail, listing = f"/api/plans/public/{plan['_id']}", '/api/travel-plans/public'
+    assert client.get(detail).headers['X-Cache'] == 'MISS'
+    assert fetch(client, listing).headers['X-Cache'] == 'MISS'
+    assert client.get(detail).headers['X-Cache'] == 'HIT'
+    assert client.get(listing).headers['X-Cache'] == 'HIT'
+
+    client.patch(f"/api/travel-plans/{plan['_id']}", headers=headers,
+                 json={'operations': [{'op': 'update_plan', 'fields': {'title': '新標題'}}]})
+    response = client.get(detail)
+    assert (response.headers['X-Cache'], response.get_json()['plan']['title']) == ('MISS', '新標題')
+    assert client.get(listing).get_json()['plans'][0]['title'] == '新標題'
+
+    # 改為私人後不能再從緩存讀到
+    client.patch(f"/api/travel-plans/{plan['_id']}", headers=headers,
+                 json={'operations': [{'op': 'update_plan', 'fields': {'is_public': False}}]})
+    assert client.get(detail).status_code == 403
+    assert client.get(listing).get_json()['plans'] == []
+
+def test_cache_fill_reads_from_primary(client, public_plan, monkeypatch):
+    plan, _ = public_plan
+    read_preferences = []
+    with_options = Collection.with_options
+
+    def record(self, **kwargs):
+        read_preferences.append(kwargs.get('read_preference'))
+        return with_options(self, **kwargs)
+
+    monkeypatch.setattr(Collection, 'with_options', record)
+    assert client.get(f"/api/plans/public/{plan['_id']}").headers['X-Cache'] == 'MISS'
+    assert client.get('/api/travel-plans/public').headers['X-Cache'] == 'MISS'
+    assert read_preferences and all(isinstance(preference, Primary) for preference in read_preferences)
+
+    # 不經過緩存時公開讀取仍然可以使用副本
+    read_preferences.clear()
+    monkeypatch.setattr(response_cache.__class__, 'build_key', lambda self, *args: None)
+    client.get('/api/travel-plans/public')
+    assert any(not isinstance(preference, Primary) for preference in read_preferences)
+
+def test_shared_store_outage_bypasses_cache_and_recovers(client, public_plan, monkeypatch):
+    plan, _ = public_plan
+    url = f"/api/plans/public/{plan['_id']}"
+    store = FlakyStore()
+    monkeypatch.setattr(response_cache, '_store', store)
+    assert client.get(url).headers['X-Cache'] == 'MISS'
+
+    store.down = True
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'X-Cache' not in response.headers
+    assert response_cache._failures == 1
+
+    # 退避期間不再訪問共享存儲，也沒有改用進程內副本
+    calls = store.calls
+    assert 'X-Cache' not in client.get(url).headers
+    assert store.calls == calls
+    assert response_cache.store is store
+
+    # 恢復後先整體失效，不可用期間錯過的失效不會留下舊條目
+    store.down = False
+    monkeypatch.setattr(response_cache, '_retry_at', 0.0)
+    global_generation = store.generations(GLOBAL_NAMESPACE)[0]
+    assert client.get(url).headers['X-Cache'] == 'MISS'
+    assert store.generations(GLOBAL_NAMESPACE)[0] == global_generation + 1
+    assert response_cache._failures == 0
+    assert client.get(url).headers['X-Cache'] == 'HIT'
+
+def test_backoff_grows_exponentially(monkeypatch):
+    from app.utils import response_cache as module
+    monkeypatch.setattr(module.time, 'monotonic', lambda: 1000.0)
+    delays = []
+    try:
+        for _ in range(7):
+            response_cache._mark_unavailable(ConnectionError())
+            delays.append(response_cache._retry_at - 1000.0)
+    finally:
+        response_cache.reset()
+    assert delays == [1, 2, 4, 8, 16, 30, 30]
+
+def test_stats_endpoint_requires_metrics_access(client, monkeypatch):
+    from app.utils import metrics
+    monkeypatch.setattr(metrics.config, 'METRICS_AUTH_TOKEN', '')
+    monkeypatch.setattr(metrics.config, 'METRICS_PUBLIC', False)
+    assert client.get('/api/cache/stats', environ_base={'REMOTE_ADDR': '203.0.113.7'}).status_code == 404
+    response = client.get('/api/cache/stats')
+    assert response.status_code == 200
+    assert response.get_json()['stats']['available'] is True
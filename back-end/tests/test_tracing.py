@@ -0,0 +1,32 @@
+"""traced 裝飾器"""
+from app.utils import tracing
+
+def test_traced_skips_span_when_disabled(monkeypatch):
+    monkeypatch.setattr(tracing.tracer, 'processor', None)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('追蹤未啟用時不應創建 span')
+
+    monkeypatch.setattr(tracing.tracer, 'span', fail)
+    monkeypatch.setattr(tracing.os, 'urandom', fail)
+
+    @tracing.traced()
+    def add(a, b=0):
+        return a + b
+
+    assert add(1, b=2) == 3
+    assert add.__name__ == 'add'
+
+def test_traced_records_span_when_enabled(monkeypatch):
+    ended = []
+    monkeypatch.setattr(tracing.tracer, 'processor', object())
+    monkeypatch.setattr(tracing.Span, 'end', lambda span: ended.append(span))
+
+    @tracing.traced('custom.name')
+    def work():
+        return tracing.current_span()
+
+    span = work()
+    assert ended == [span]
+    assert span.name == 'custom.name'
+    assert tracing.current_span() is None